@@ -0,0 +1,121 @@
+"""
+Ограниченная история снапшотов AsyncStateStore (кольцевой буфер).
+Поиск по версии — O(1) через словарь версия -> слот, по времени ts_mono/ts_wall — O(log n)
+бинарным поиском по моментам вступления в силу.
+
+Метки времени снапшотов в порядке записи могут убывать (явный ts в set(), шаг системных часов
+назад) или опережать часы (ts из будущего). Поэтому для поиска хранится момент вступления в силу:
+ts снапшота, ограниченный сверху текущим временем на момент append и снизу моментом предыдущего.
+Снапшот с меткой старше предшественника действует с момента, когда он его заменил; метка
+из будущего не сдвигает моменты последующих снапшотов дальше момента их записи.
+"""
+import time
+from typing import Dict, List, Optional
+
+from .types import FsmSnapshotDTO
+
+
+CLOCK_MONO = "mono"
+CLOCK_WALL = "wall"
+
+DEFAULT_HISTORY_SIZE = 1024
+
+
+class SnapshotHistory:
+    """Последние capacity снапшотов; самые старые вытесняются."""
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_SIZE):
+        if capacity <= 0:
+            raise ValueError(f"capacity должен быть > 0, получено {capacity}")
+        self.capacity = capacity
+        self._slots: List[Optional[FsmSnapshotDTO]] = [None] * capacity
+        # Ключи поиска по слотам: версия и неубывающие моменты вступления в силу
+        self._versions: List[int] = [0] * capacity
+        self._mono: List[float] = [0.0] * capacity
+        self._wall: List[float] = [0.0] * capacity
+        self._start = 0  # слот самого старого снапшота
+        self._size = 0
+        self._slot_by_version: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, snap: FsmSnapshotDTO, ts_mono: Optional[float] = None):
+        """
+        Добавляет снапшот как самый новый. ts_mono — момент вступления в силу по монотонным часам,
+        если он отличается от snap.ts_mono (восстановленный снапшот прошлого запуска).
+        """
+        mono = min(snap.ts_mono if ts_mono is None else ts_mono, time.monotonic())
+        wall = min(snap.ts_wall, time.time())
+        if self._size:
+            last = (self._start + self._size - 1) % self.capacity
+            mono = max(mono, self._mono[last])
+            wall = max(wall, self._wall[last])
+        slot = (self._start + self._size) % self.capacity
+        if self._size == self.capacity:
+            evicted = self._slots[slot]
+            del self._slot_by_version[evicted.version]
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._size += 1
+        self._slots[slot] = snap
+        self._versions[slot] = snap.version
+        self._mono[slot] = mono
+        self._wall[slot] = wall
+        self._slot_by_version[snap.version] = slot
+
+    def _at(self, index: int) -> FsmSnapshotDTO:
+        """Снапшот по логическому индексу (0 — самый старый)."""
+        return self._slots[(self._start + index) % self.capacity]
+
+    @property
+    def oldest(self) -> Optional[FsmSnapshotDTO]:
+        return self._at(0) if self._size else None
+
+    @property
+    def newest(self) -> Optional[FsmSnapshotDTO]:
+        return self._at(self._size - 1) if self._size else None
+
+    def get_version(self, version: int) -> Optional[FsmSnapshotDTO]:
+        """Снапшот с данной версией или None, если он вытеснен или не существовал."""
+        slot = self._slot_by_version.get(version)
+        return self._slots[slot] if slot is not None else None
+
+    def get_at(self, ts: float, clock: str = CLOCK_MONO) -> Optional[FsmSnapshotDTO]:
+        """
+        Снапшот, действовавший в момент ts: последний, вступивший в силу не позже ts.
+        Момент вступления в силу — ts снапшота, прижатый к [момент предыдущего, время append],
+        а не сама метка: снапшот с меткой из будущего находится уже с момента записи,
+        с меткой из прошлого — лишь с момента, когда он заменил предыдущий.
+        None, если ts раньше самого старого снапшота в истории.
+        """
+        if clock == CLOCK_MONO:
+            keys = self._mono
+        elif clock == CLOCK_WALL:
+            keys = self._wall
+        else:
+            raise ValueError(f"Неизвестные часы: {clock}")
+        index = self._upper_bound(ts, keys) - 1
+        return self._at(index) if index >= 0 else None
+
+    def range(self, v1: int, v2: int) -> List[FsmSnapshotDTO]:
+        """Снапшоты с версиями v1 <= version <= v2 из истории, по возрастанию версии."""
+        result = []
+        for index in range(self._upper_bound(v1 - 1, self._versions), self._size):
+            snap = self._at(index)
+            if snap.version > v2:
+                break
+            result.append(snap)
+        return result
+
+    def _upper_bound(self, value: float, keys: List) -> int:
+        """Первый логический индекс, у которого ключ слота в keys > value."""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[(self._start + mid) % self.capacity] <= value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
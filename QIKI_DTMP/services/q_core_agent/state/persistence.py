@@ -0,0 +1,431 @@
+"""
+Персистентность AsyncStateStore: write-ahead log снапшотов и периодические checkpoint.
+
+Формат:
+- снапшот кодируется компактно (struct + varint-строки), см. encode_snapshot/decode_snapshot;
+- WAL (state.wal) — последовательность кадров [u32 длина][u32 crc32][снапшот];
+- checkpoint (state.ckpt) — один кадр с последним снапшотом, пишется через tmp + rename,
+  после чего WAL обрезается: всё, что в нём было, покрыто checkpoint.
+
+Записи копятся в памяти и сбрасываются группой: один write + fsync на все снапшоты,
+пришедшие за commit_interval_s (или max_batch штук); при wait_durable — на все, пришедшие
+за время предыдущего fsync. Файловые операции выполняются
+в отдельном потоке, event loop не блокируется.
+
+Сбой записи: недописанная группа отрезается (WAL возвращается к последнему закоммиченному
+смещению) и пишется повторно следующим commit; ожидающие её fsync получают PersistenceError сразу.
+"""
+import asyncio
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .types import FsmSnapshotDTO, FsmState, TransitionDTO, TransitionStatus
+
+
+logger = logging.getLogger(__name__)
+
+WAL_FILE = "state.wal"
+CHECKPOINT_FILE = "state.ckpt"
+
+# version, state, prev_state (_NO_STATE = None), ts_mono, ts_wall, attempt_count
+_HEADER = struct.Struct("<qBBddI")
+# from_state, to_state, status, ts_mono, ts_wall
+_TRANSITION = struct.Struct("<BBBdd")
+# длина payload, crc32 payload
+_FRAME = struct.Struct("<II")
+_NO_STATE = 0xFF
+
+
+class PersistenceError(Exception):
+    """Ошибка записи или чтения WAL/checkpoint"""
+    pass
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_str(out: bytearray, value: str):
+    data = value.encode("utf-8")
+    _write_varint(out, len(data))
+    out += data
+
+
+def _read_str(buf: memoryview, pos: int) -> Tuple[str, int]:
+    length, pos = _read_varint(buf, pos)
+    return str(buf[pos:pos + length], "utf-8"), pos + length
+
+
+def _write_map(out: bytearray, mapping: Dict[str, str]):
+    _write_varint(out, len(mapping))
+    for key, value in mapping.items():
+        _write_str(out, str(key))
+        _write_str(out, str(value))
+
+
+def _read_map(buf: memoryview, pos: int) -> Tuple[Dict[str, str], int]:
+    count, pos = _read_varint(buf, pos)
+    mapping = {}
+    for _ in range(count):
+        key, pos = _read_str(buf, pos)
+        mapping[key], pos = _read_str(buf, pos)
+    return mapping, pos
+
+
+def encode_snapshot(snap: FsmSnapshotDTO) -> bytes:
+    """Компактное бинарное представление FsmSnapshotDTO (все поля, включая историю)."""
+    out = bytearray(_HEADER.pack(
+        snap.version, int(snap.state), _NO_STATE if snap.prev_state is None else int(snap.prev_state),
+        snap.ts_mono, snap.ts_wall, snap.attempt_count
+    ))
+    for value in (snap.reason, snap.snapshot_id, snap.fsm_instance_id, snap.source_module):
+        _write_str(out, value)
+    _write_varint(out, len(snap.history))
+    for t in snap.history:
+        out += _TRANSITION.pack(int(t.from_state), int(t.to_state), int(t.status), t.ts_mono, t.ts_wall)
+        _write_str(out, t.trigger_event)
+        _write_str(out, t.error_message)
+    _write_map(out, snap.context_data)
+    _write_map(out, snap.state_metadata)
+    return bytes(out)
+
+
+def decode_snapshot(data: bytes) -> FsmSnapshotDTO:
+    buf = memoryview(data)
+    version, state, prev_state, ts_mono, ts_wall, attempt_count = _HEADER.unpack_from(buf, 0)
+    pos = _HEADER.size
+    reason, pos = _read_str(buf, pos)
+    snapshot_id, pos = _read_str(buf, pos)
+    fsm_instance_id, pos = _read_str(buf, pos)
+    source_module, pos = _read_str(buf, pos)
+    count, pos = _read_varint(buf, pos)
+    history = []
+    for _ in range(count):
+        from_state, to_state, status, t_mono, t_wall = _TRANSITION.unpack_from(buf, pos)
+        pos += _TRANSITION.size
+        trigger, pos = _read_str(buf, pos)
+        error, pos = _read_str(buf, pos)
+        history.append(TransitionDTO(
+            FsmState(from_state), FsmState(to_state), trigger, TransitionStatus(status), error, t_mono, t_wall
+        ))
+    context_data, pos = _read_map(buf, pos)
+    state_metadata, pos = _read_map(buf, pos)
+    return FsmSnapshotDTO(
+        version=version,
+        state=FsmState(state),
+        reason=reason,
+        ts_mono=ts_mono,
+        ts_wall=ts_wall,
+        snapshot_id=snapshot_id,
+        prev_state=None if prev_state == _NO_STATE else FsmState(prev_state),
+        fsm_instance_id=fsm_instance_id,
+        source_module=source_module,
+        attempt_count=attempt_count,
+        history=tuple(history),
+        context_data=context_data,
+        state_metadata=state_metadata
+    )
+
+
+def frame(payload: bytes) -> bytes:
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(data: bytes) -> Tuple[List[bytes], int]:
+    """
+    Кадры из буфера до первого повреждённого или неполного.
+    Возвращает (payloads, длина корректного префикса) — хвост после неё оборван при сбое записи.
+    """
+    payloads = []
+    pos = 0
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        end = pos + _FRAME.size + length
+        if end > len(data):
+            break
+        payload = data[pos + _FRAME.size:end]
+        if zlib.crc32(payload) != crc:
+            break
+        payloads.append(payload)
+        pos = end
+    return payloads, pos
+
+
+class StateWAL:
+    """
+    Write-ahead log снапшотов AsyncStateStore с group commit и checkpoint.
+
+    Args:
+        directory: Каталог с state.wal и state.ckpt
+        commit_interval_s: Окно группировки без wait_durable: записи за окно сбрасываются одним fsync
+        max_batch: Группа сбрасывается сразу, набрав столько записей
+        checkpoint_every: Checkpoint и обрезка WAL после стольких записей (0 — не делать)
+        wait_durable: set() ждёт fsync своей группы; иначе возможна потеря последних commit_interval_s
+        fsync: False — только write (для тестов и бенчмарков без диска)
+    """
+
+    def __init__(self, directory: str, commit_interval_s: float = 0.005, max_batch: int = 256,
+                 checkpoint_every: int = 1000, wait_durable: bool = False, fsync: bool = True):
+        self.directory = directory
+        self.wal_path = os.path.join(directory, WAL_FILE)
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        self.commit_interval_s = commit_interval_s
+        self.max_batch = max_batch
+        self.checkpoint_every = checkpoint_every
+        self.wait_durable = wait_durable
+        self.fsync = fsync
+        self._file = None
+        self._committed: Optional[int] = None  # длина WAL после последнего успешного commit
+        self._pending: List[bytes] = []
+        self._waiters: List[asyncio.Future] = []
+        self._last_snap: Optional[FsmSnapshotDTO] = None
+        self._since_checkpoint = 0
+        self._wakeup = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+        self._commit_task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-wal")
+        self._closed = False
+        self.metrics: Dict[str, Any] = {
+            'appended': 0,
+            'commits': 0,
+            'bytes_written': 0,
+            'checkpoints': 0,
+            'write_errors': 0,
+            'last_commit_ms': 0.0,
+        }
+
+    def recover(self) -> Tuple[Optional[FsmSnapshotDTO], Dict[str, Any]]:
+        """
+        Восстановление: checkpoint + replay WAL записей новее него. Оборванный хвост WAL отрезается.
+        Возвращает (последний снапшот или None, статистика восстановления).
+        """
+        start = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        snap = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "rb") as f:
+                payloads, _ = read_frames(f.read())
+            if not payloads:
+                raise PersistenceError(f"Повреждён checkpoint {self.checkpoint_path}")
+            snap = decode_snapshot(payloads[0])
+        checkpoint_version = snap.version if snap is not None else -1
+
+        replayed = 0
+        truncated = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, "rb") as f:
+                data = f.read()
+            payloads, valid = read_frames(data)
+            truncated = len(data) - valid
+            for payload in payloads:
+                candidate = decode_snapshot(payload)
+                # Записи до checkpoint остаются, если сбой пришёлся между rename и обрезкой WAL
+                if candidate.version > checkpoint_version:
+                    snap = candidate
+                    replayed += 1
+            if truncated:
+                logger.warning(f"WAL {self.wal_path}: отрезан повреждённый хвост {truncated} байт")
+                with open(self.wal_path, "r+b") as f:
+                    f.truncate(valid)
+            self._since_checkpoint = len(payloads)
+
+        self._open()
+        self._last_snap = snap
+        stats = {
+            'recovered_version': snap.version if snap is not None else -1,
+            'checkpoint_version': checkpoint_version,
+            'replayed_records': replayed,
+            'truncated_bytes': truncated,
+            'recovery_ms': (time.perf_counter() - start) * 1000,
+        }
+        return snap, stats
+
+    def append(self, snap: FsmSnapshotDTO) -> Optional[asyncio.Future]:
+        """
+        Ставит снапшот в текущую группу (без IO). При wait_durable возвращает Future,
+        завершающийся после fsync группы (или PersistenceError, если запись группы не удалась).
+        """
+        if self._closed:
+            raise PersistenceError("WAL закрыт")
+        if self._commit_task is None:
+            self._commit_task = asyncio.get_running_loop().create_task(self._commit_loop())
+        record = frame(encode_snapshot(snap))
+        self._pending.append(record)
+        self._last_snap = snap
+        self.metrics['appended'] += 1
+        self._wakeup.set()
+        if self.wait_durable:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            return future
+        return None
+
+    async def commit(self):
+        """Сбрасывает текущую группу: один write + fsync (и checkpoint, если пора)."""
+        async with self._commit_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            waiters, self._waiters = self._waiters, []
+            self._since_checkpoint += len(batch)
+            checkpoint = None
+            if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+                checkpoint = self._last_snap
+            data = b"".join(batch)
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write, data)
+            except Exception as e:
+                logger.error(f"WAL commit failed: {e}")
+                self.metrics['write_errors'] += 1
+                # Группа возвращается в начало очереди и будет записана следующим commit,
+                # но ожидающие не ждут повторов: сбой долговечности сообщается сразу
+                self._pending[:0] = batch
+                self._since_checkpoint -= len(batch)
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(PersistenceError(f"WAL commit failed: {e}"))
+                raise PersistenceError(str(e)) from e
+            self.metrics['commits'] += 1
+            self.metrics['bytes_written'] += len(data)
+            self.metrics['last_commit_ms'] = (time.perf_counter() - start) * 1000
+            # Группа уже долговечна: ожидающие не зависят от исхода checkpoint
+            for future in waiters:
+                if not future.done():
+                    future.set_result(None)
+            if checkpoint is not None:
+                try:
+                    await loop.run_in_executor(self._executor, self._write_checkpoint, checkpoint)
+                except Exception as e:
+                    # WAL не обрезан и остаётся полным; checkpoint повторится следующим commit
+                    logger.error(f"WAL checkpoint failed: {e}")
+                    self.metrics['write_errors'] += 1
+                    return
+                self._since_checkpoint = 0
+                self.metrics['checkpoints'] += 1
+
+    async def checkpoint(self):
+        """Принудительный checkpoint последнего снапшота с обрезкой WAL."""
+        await self.commit()
+        if self._last_snap is not None:
+            async with self._commit_lock:
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self._executor, self._write_checkpoint, self._last_snap
+                    )
+                except Exception as e:
+                    self.metrics['write_errors'] += 1
+                    raise PersistenceError(f"WAL checkpoint failed: {e}") from e
+                self._since_checkpoint = 0
+                self.metrics['checkpoints'] += 1
+
+    async def close(self):
+        if self._closed:
+            return
+        if self._commit_task is not None:
+            self._commit_task.cancel()
+            try:
+                await self._commit_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.commit()
+        finally:
+            # Даже если последняя группа не записалась, поток WAL и файл освобождаются
+            self._closed = True
+            self._executor.shutdown(wait=True)
+            if self._file is not None:
+                self._discard_file()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.wal_path, "ab")
+            self._committed = self._file.tell()
+
+    def _reopen(self):
+        """Открывает WAL после сбоя записи, отрезав недописанный кадр за последним commit."""
+        if self._committed is not None and os.path.exists(self.wal_path) \
+                and os.path.getsize(self.wal_path) > self._committed:
+            os.truncate(self.wal_path, self._committed)
+        self._open()
+
+    def _discard_file(self):
+        # В буфере файла может остаться часть группы: он закрывается без flush-гарантий,
+        # а обрезка до закоммиченного смещения выполняется перед следующей записью
+        try:
+            self._file.close()
+        except Exception:
+            pass
+        self._file = None
+
+    async def _commit_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.wait_durable and len(self._pending) < self.max_batch:
+                # Окно группировки: всё, что придёт за него, уйдёт тем же fsync
+                await asyncio.sleep(self.commit_interval_s)
+            # При wait_durable группа не ждёт окна: пишется сразу, а записи, пришедшие
+            # за время fsync, образуют следующую группу. shield: close() отменяет цикл, но начатый
+            # commit доходит до конца (иначе ещё не начатая запись в потоке WAL отменялась бы вместе с группой)
+            try:
+                await asyncio.shield(self.commit())
+            except PersistenceError:
+                await asyncio.sleep(self.commit_interval_s)
+                self._wakeup.set()
+
+    def _write(self, data: bytes):
+        """Дописывает группу в WAL (выполняется в потоке WAL)."""
+        if self._file is None:
+            self._reopen()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception:
+            self._discard_file()
+            raise
+        self._committed += len(data)
+
+    def _write_checkpoint(self, checkpoint: FsmSnapshotDTO):
+        """Checkpoint через tmp + rename и обрезка WAL (выполняется в потоке WAL)."""
+        if self._file is None:
+            self._reopen()
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(frame(encode_snapshot(checkpoint)))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        if self.fsync:
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        # Всё записанное в WAL покрыто checkpoint
+        self._file.truncate(0)
+        self._committed = 0
@@ -3,12 +3,14 @@ AsyncStateStore - потокобезопасное хранилище FSM сос
 Single Source of Truth (SSOT) для FSM состояния в Q-Core процессе.
 """
 import asyncio
-from typing import Optional, List, Callable, Any, Dict, Set
+from typing import Optional, List, Callable, Any, Dict, Set, Tuple, Union, FrozenSet, Iterable
 import logging
 import time
-from dataclasses import replace
+from dataclasses import dataclass, replace
 
-from .types import FsmSnapshotDTO, initial_snapshot
+from .history import SnapshotHistory, CLOCK_MONO, DEFAULT_HISTORY_SIZE
+from .persistence import StateWAL
+from .types import FsmSnapshotDTO, FsmState, initial_snapshot
 
 
 logger = logging.getLogger(__name__)
@@ -24,26 +26,132 @@ class StateVersionError(StateStoreError):
     pass
 
 
+# Режимы подписки: queue — каждый переход через asyncio.Queue, latest — только последний снапшот
+SUBSCRIPTION_QUEUE = "queue"
+SUBSCRIPTION_LATEST = "latest"
+
+
+class LatestValueSubscription:
+    """
+    Conflating подписка: хранит только последний недоставленный снапшот и число снапшотов,
+    вытесненных до доставки. Медленный потребитель не отключается, а сразу догоняет
+    новейшее состояние; память O(1) независимо от отставания.
+    Интерфейс чтения совместим с asyncio.Queue (get, get_nowait, empty, qsize).
+    """
+
+    def __init__(self, subscriber_id: str = "unknown"):
+        self.subscriber_id = subscriber_id
+        self._snap: Optional[FsmSnapshotDTO] = None
+        self._pending_skipped = 0
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.skipped = 0  # всего вытеснено недоставленных снапшотов
+
+    def put_nowait(self, snap: FsmSnapshotDTO):
+        """Заменяет недоставленный снапшот новым (никогда не переполняется)."""
+        if self._snap is not None:
+            self._pending_skipped += 1
+            self.skipped += 1
+        self._snap = snap
+        self._ready.set()
+
+    def empty(self) -> bool:
+        return self._snap is None
+
+    def qsize(self) -> int:
+        return 0 if self._snap is None else 1
+
+    def get_nowait(self) -> FsmSnapshotDTO:
+        return self.get_with_skipped_nowait()[0]
+
+    def get_with_skipped_nowait(self) -> Tuple[FsmSnapshotDTO, int]:
+        """(последний снапшот, сколько снапшотов пропущено перед ним); пусто — asyncio.QueueEmpty."""
+        if self._snap is None:
+            raise asyncio.QueueEmpty
+        snap, skipped = self._snap, self._pending_skipped
+        self._snap = None
+        self._pending_skipped = 0
+        self._ready.clear()
+        self.delivered += 1
+        return snap, skipped
+
+    async def get(self) -> FsmSnapshotDTO:
+        return (await self.get_with_skipped())[0]
+
+    async def get_with_skipped(self) -> Tuple[FsmSnapshotDTO, int]:
+        while self._snap is None:
+            await self._ready.wait()
+        return self.get_with_skipped_nowait()
+
+
+Subscription = Union[asyncio.Queue, LatestValueSubscription]
+
+
+@dataclass(frozen=True)
+class SubscriptionFilter:
+    """
+    Декларативный фильтр подписки; пустые поля не ограничивают.
+    states — целевые состояния, state_change_only — только смена состояния относительно
+    предыдущего снапшота store, source_module — точное совпадение, reason_prefix — префикс reason.
+    """
+    states: FrozenSet[FsmState] = frozenset()
+    state_change_only: bool = False
+    source_module: Optional[str] = None
+    reason_prefix: str = ""
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.states or self.state_change_only or self.source_module is not None or self.reason_prefix)
+
+    def matches(self, snap: FsmSnapshotDTO, prev_state: Optional[FsmState]) -> bool:
+        if self.states and snap.state not in self.states:
+            return False
+        if self.state_change_only and snap.state == prev_state:
+            return False
+        if self.source_module is not None and snap.source_module != self.source_module:
+            return False
+        return not self.reason_prefix or snap.reason.startswith(self.reason_prefix)
+
+
 class AsyncStateStore:
     """
     Async-only StateStore для FSM состояния.
     
     Ключевые принципы:
     - Только один писатель (FSMHandler)
-    - Множественные читатели (логи, gRPC, CLI)
-    - Pub/Sub через asyncio.Queue для подписчиков
+    - Множественные читатели (логи, gRPC, CLI) читают без lock
+    - Pub/Sub через asyncio.Queue (каждый переход) или LatestValueSubscription (последний снапшот)
     - Версионирование и защита от дублирования
     - Иммутабельные DTO снапшоты
+    - Опционально: WAL (StateWAL) для восстановления после рестарта
+    - История последних history_size версий: get_version, get_at, range (0 — без истории)
     """
     
-    def __init__(self, initial_state: Optional[FsmSnapshotDTO] = None):
+    def __init__(self, initial_state: Optional[FsmSnapshotDTO] = None, wal: Optional[StateWAL] = None,
+                 history_size: int = DEFAULT_HISTORY_SIZE):
         self._lock = asyncio.Lock()
         self._snap: Optional[FsmSnapshotDTO] = initial_state
-        self._subscribers: List[asyncio.Queue] = []
+        self._wal = wal
+        self._history = SnapshotHistory(history_size) if history_size > 0 else None
+        if self._history is not None and initial_state is not None:
+            # ts_mono восстановленного из WAL снапшота — часы прошлого запуска, здесь они
+            # ничего не значат: по монотонным часам он действует с момента создания store
+            self._history.append(initial_state, ts_mono=time.monotonic())
+        self.recovery_stats: Optional[Dict[str, Any]] = None
+        self._subscribers: List[Subscription] = []
         self._subscriber_ids: Dict[int, str] = {}  # для отладки
+        # Индекс подписчиков по ключу фильтра: set() обходит только подходящие корзины.
+        # Подписчик лежит в корзинах одного вида: без фильтра, по целевым состояниям, по source_module
+        # или в _scan_subscribers (только state_change_only / reason_prefix)
+        self._filters: Dict[int, SubscriptionFilter] = {}
+        self._unfiltered: Set[Subscription] = set()
+        self._by_state: Dict[FsmState, Set[Subscription]] = {}
+        self._by_source: Dict[str, Set[Subscription]] = {}
+        self._scan_subscribers: Set[Subscription] = set()
+        # Счётчик чтений вне _metrics и вне lock: get() не конкурирует с писателем
+        self._total_gets = 0
         self._metrics: Dict[str, Any] = {
             'total_sets': 0,
-            'total_gets': 0,
             'version_conflicts': 0,
             'subscriber_count': 0,
             'last_update_ts': 0.0,
@@ -55,17 +163,48 @@ class AsyncStateStore:
         Получить текущий снапшот состояния.
         Возвращает immutable DTO или None если состояние не инициализировано.
         """
-        async with self._lock:
-            self._metrics['total_gets'] += 1
-            # DTO уже immutable, можно возвращать как есть
-            return self._snap
+        return self.get_nowait()
+
+    def get_nowait(self) -> Optional[FsmSnapshotDTO]:
+        """
+        Текущий снапшот без lock (и без await).
+        DTO frozen, а присваивание self._snap атомарно: читатель видит старый или новый снапшот целиком.
+        """
+        self._total_gets += 1
+        return self._snap
+    
+    def get_version(self, version: int) -> Optional[FsmSnapshotDTO]:
+        """
+        Снапшот конкретной версии из истории (O(1), без lock).
+        None — версия вытеснена из истории, ещё не записана или история отключена.
+        """
+        self._total_gets += 1
+        return self._history.get_version(version) if self._history is not None else None
+
+    def get_at(self, ts: float, clock: str = CLOCK_MONO) -> Optional[FsmSnapshotDTO]:
+        """
+        Снапшот, действовавший в момент ts по часам clock ("mono" — ts_mono, "wall" — ts_wall),
+        O(log n) по истории. Метки прижимаются к [момент предыдущей версии, время записи]
+        (см. SnapshotHistory.get_at); начальный снапшот по "mono" действует с создания store.
+        None, если ts раньше самой старой версии в истории.
+        """
+        self._total_gets += 1
+        return self._history.get_at(ts, clock) if self._history is not None else None
+
+    def range(self, v1: int, v2: int) -> List[FsmSnapshotDTO]:
+        """
+        Снапшоты версий v1..v2 включительно, что ещё есть в истории. Подписчик, пропустивший
+        версии (LatestValueSubscription.skipped), может дочитать их отсюда.
+        """
+        self._total_gets += 1
+        return self._history.range(v1, v2) if self._history is not None else []
     
     async def get_with_meta(self) -> tuple[Optional[FsmSnapshotDTO], Dict[str, Any]]:
         """Получить состояние с метаинформацией"""
         async with self._lock:
-            self._metrics['total_gets'] += 1
+            self._total_gets += 1
             meta = {
-                'store_metrics': dict(self._metrics),
+                'store_metrics': {**self._metrics, 'total_gets': self._total_gets},
                 'subscriber_count': len(self._subscribers),
                 'has_state': self._snap is not None,
                 'current_version': self._snap.version if self._snap else -1
@@ -110,13 +249,18 @@ class AsyncStateStore:
                     new_version = new_snap.version
 
             new_snap = replace(new_snap, version=new_version)
+            prev_state = self._snap.state if self._snap is not None else None
 
             self._snap = new_snap
+            if self._history is not None:
+                self._history.append(new_snap)
             self._metrics['total_sets'] += 1
             self._metrics['last_update_ts'] = time.time()
+            # В WAL — только постановка в группу; fsync выполняет фоновый commit
+            durable = self._wal.append(new_snap) if self._wal is not None else None
             
             # Уведомляем подписчиков
-            await self._notify_subscribers(new_snap)
+            await self._notify_subscribers(new_snap, prev_state)
             
             state_name = getattr(new_snap.state, 'name', str(new_snap.state))
             logger.debug(
@@ -124,25 +268,51 @@ class AsyncStateStore:
                 f"state={state_name}, reason='{new_snap.reason}'"
             )
             
-            return self._snap
+        # fsync группы ждём вне lock: следующие set попадают в ту же группу
+        if durable is not None:
+            await durable
+        return new_snap
     
-    async def subscribe(self, subscriber_id: str = "unknown") -> asyncio.Queue:
+    async def subscribe(self, subscriber_id: str = "unknown", mode: str = SUBSCRIPTION_QUEUE,
+                        states: Optional[Iterable[FsmState]] = None, state_change_only: bool = False,
+                        source_module: Optional[str] = None, reason_prefix: str = "") -> Subscription:
         """
         Подписаться на изменения состояния.
         
+        Args:
+            subscriber_id: Имя подписчика для логов
+            mode: SUBSCRIPTION_QUEUE — все переходы (при переполнении очереди подписчик удаляется),
+                SUBSCRIPTION_LATEST — только последний снапшот со счётчиком пропущенных
+            states: Доставлять только снапшоты с этими состояниями
+            state_change_only: Доставлять только при смене состояния
+            source_module: Доставлять только снапшоты этого модуля
+            reason_prefix: Доставлять только снапшоты с reason, начинающимся с префикса
+        
         Returns:
-            asyncio.Queue с FsmSnapshotDTO объектами при изменениях
+            asyncio.Queue или LatestValueSubscription с FsmSnapshotDTO объектами при изменениях
         """
-        queue = asyncio.Queue(maxsize=64)
+        if mode == SUBSCRIPTION_QUEUE:
+            queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        elif mode == SUBSCRIPTION_LATEST:
+            queue = LatestValueSubscription(subscriber_id)
+        else:
+            raise StateStoreError(f"Неизвестный режим подписки: {mode}")
+        subscription_filter = SubscriptionFilter(
+            frozenset(states or ()), state_change_only, source_module, reason_prefix
+        )
         
         async with self._lock:
             self._subscribers.append(queue)
             queue_id = id(queue)
             self._subscriber_ids[queue_id] = subscriber_id
+            self._filters[queue_id] = subscription_filter
+            for bucket in self._index_buckets(subscription_filter):
+                bucket.add(queue)
             self._metrics['subscriber_count'] = len(self._subscribers)
             
-            # Отправляем текущее состояние новому подписчику
-            if self._snap is not None:
+            # Отправляем текущее состояние новому подписчику, если оно проходит фильтр
+            # (для state_change_only текущее состояние для нового подписчика — смена)
+            if self._snap is not None and subscription_filter.matches(self._snap, None):
                 try:
                     queue.put_nowait(self._snap)
                 except asyncio.QueueFull:
@@ -152,55 +322,85 @@ class AsyncStateStore:
             
         return queue
         
-    async def unsubscribe(self, queue: asyncio.Queue):
+    async def unsubscribe(self, queue: Subscription):
         """Отписаться от уведомлений"""
         async with self._lock:
             if queue in self._subscribers:
-                self._subscribers.remove(queue)
-                queue_id = id(queue)
-                subscriber_id = self._subscriber_ids.pop(queue_id, "unknown")
-                self._metrics['subscriber_count'] = len(self._subscribers)
+                subscriber_id = self._remove_subscriber(queue)
                 logger.debug(f"Unsubscribed: {subscriber_id}, remaining: {len(self._subscribers)}")
+
+    def _index_buckets(self, subscription_filter: SubscriptionFilter) -> List[Set[Subscription]]:
+        """
+        Корзины индекса для фильтра. Фильтр по состояниям лежит в корзине каждого своего состояния:
+        у снапшота одно состояние, поэтому подписчик всё равно получает его не больше одного раза.
+        """
+        if subscription_filter.is_empty:
+            return [self._unfiltered]
+        if subscription_filter.states:
+            return [self._by_state.setdefault(state, set()) for state in subscription_filter.states]
+        if subscription_filter.source_module is not None:
+            return [self._by_source.setdefault(subscription_filter.source_module, set())]
+        return [self._scan_subscribers]
+
+    def _remove_subscriber(self, queue: Subscription) -> str:
+        """Удаляет подписчика из списка и индекса (вызывается под lock)."""
+        self._subscribers.remove(queue)
+        queue_id = id(queue)
+        subscriber_id = self._subscriber_ids.pop(queue_id, "unknown")
+        for bucket in self._index_buckets(self._filters.pop(queue_id)):
+            bucket.discard(queue)
+        # Пустые корзины убираем, чтобы индекс не рос от временных подписчиков
+        for index in (self._by_state, self._by_source):
+            for key in [key for key, bucket in index.items() if not bucket]:
+                del index[key]
+        self._metrics['subscriber_count'] = len(self._subscribers)
+        return subscriber_id
                 
-    async def _notify_subscribers(self, snap: FsmSnapshotDTO):
-        """Уведомить всех подписчиков о новом состоянии"""
+    async def _notify_subscribers(self, snap: FsmSnapshotDTO, prev_state: Optional[FsmState] = None):
+        """Уведомить подписчиков, чей фильтр пропускает снапшот (через индекс фильтров)"""
         dead_queues = []
+        filters = self._filters
         
-        for queue in self._subscribers:
-            try:
-                queue.put_nowait(snap)
-            except asyncio.QueueFull:
-                # Очередь переполнена - считаем подписчика неактивным
-                queue_id = id(queue)
-                subscriber_id = self._subscriber_ids.get(queue_id, "unknown")
-                logger.warning(f"Subscriber {subscriber_id} queue full, removing")
-                dead_queues.append(queue)
-            except Exception as e:
-                # Очередь мертва - помечаем для удаления
-                queue_id = id(queue)
-                subscriber_id = self._subscriber_ids.get(queue_id, "unknown")
-                logger.warning(f"Dead subscriber {subscriber_id}: {e}")
-                dead_queues.append(queue)
+        for bucket, filtered in (
+            (self._unfiltered, False),
+            (self._by_state.get(snap.state, ()), True),
+            (self._by_source.get(snap.source_module, ()), True),
+            (self._scan_subscribers, True),
+        ):
+            for queue in bucket:
+                if filtered and not filters[id(queue)].matches(snap, prev_state):
+                    continue
+                try:
+                    queue.put_nowait(snap)
+                except asyncio.QueueFull:
+                    # Очередь переполнена - считаем подписчика неактивным
+                    queue_id = id(queue)
+                    subscriber_id = self._subscriber_ids.get(queue_id, "unknown")
+                    logger.warning(f"Subscriber {subscriber_id} queue full, removing")
+                    dead_queues.append(queue)
+                except Exception as e:
+                    # Очередь мертва - помечаем для удаления
+                    queue_id = id(queue)
+                    subscriber_id = self._subscriber_ids.get(queue_id, "unknown")
+                    logger.warning(f"Dead subscriber {subscriber_id}: {e}")
+                    dead_queues.append(queue)
                 
         # Удаляем мертвые очереди
         for dead_queue in dead_queues:
-            try:
-                self._subscribers.remove(dead_queue)
-                queue_id = id(dead_queue)
-                self._subscriber_ids.pop(queue_id, None)
-            except ValueError:
-                pass  # Уже удалена
-                
-        if dead_queues:
-            self._metrics['subscriber_count'] = len(self._subscribers)
+            if dead_queue in self._subscribers:
+                self._remove_subscriber(dead_queue)
             
     async def initialize_if_empty(self) -> FsmSnapshotDTO:
         """Инициализировать начальным состоянием если пусто"""
         async with self._lock:
             if self._snap is None:
                 self._snap = initial_snapshot()
+                if self._history is not None:
+                    self._history.append(self._snap)
                 self._metrics['total_sets'] += 1
                 self._metrics['last_update_ts'] = time.time()
+                if self._wal is not None:
+                    self._wal.append(self._snap)
                 
                 # Уведомляем подписчиков
                 await self._notify_subscribers(self._snap)
@@ -212,16 +412,26 @@ class AsyncStateStore:
     async def get_metrics(self) -> Dict[str, Any]:
         """Получить метрики работы StateStore"""
         async with self._lock:
-            self._metrics['total_gets'] += 1
+            self._total_gets += 1
             uptime = time.time() - self._metrics['creation_ts']
             current_state_name = self._snap.state.name if self._snap else "UNINITIALIZED"
             return {
                 **self._metrics,
+                'total_gets': self._total_gets,
                 'uptime_seconds': uptime,
                 'current_version': self._snap.version if self._snap else -1,
                 'current_state': current_state_name,
-                'active_subscribers': len(self._subscribers)
+                'active_subscribers': len(self._subscribers),
+                'history_size': len(self._history) if self._history is not None else 0,
+                'oldest_version': self._history.oldest.version if self._history else -1,
+                'wal': dict(self._wal.metrics) if self._wal is not None else None,
+                'recovery': self.recovery_stats
             }
+
+    async def close(self):
+        """Дописать и закрыть WAL (для store без персистентности ничего не делает)"""
+        if self._wal is not None:
+            await self._wal.close()
             
     async def health_check(self) -> Dict[str, Any]:
         """Проверка здоровья StateStore"""
@@ -254,9 +464,25 @@ def create_store(initial_state: Optional[FsmSnapshotDTO] = None) -> AsyncStateSt
     return AsyncStateStore(initial_state)
 
 
-def create_initialized_store() -> AsyncStateStore:
-    """Создать StateStore с начальным состоянием COLD_START"""
-    return AsyncStateStore(initial_snapshot())
+def create_initialized_store(wal_dir: Optional[str] = None, history_size: int = DEFAULT_HISTORY_SIZE,
+                             **wal_options) -> AsyncStateStore:
+    """
+    Создать StateStore с начальным состоянием COLD_START.
+    С wal_dir состояние восстанавливается из checkpoint и WAL (COLD_START, только если их нет),
+    статистика восстановления — в store.recovery_stats; wal_options передаются в StateWAL.
+    """
+    if wal_dir is None:
+        return AsyncStateStore(initial_snapshot(), history_size=history_size)
+    wal = StateWAL(wal_dir, **wal_options)
+    snap, stats = wal.recover()
+    store = AsyncStateStore(snap or initial_snapshot(), wal=wal, history_size=history_size)
+    store.recovery_stats = stats
+    if snap is not None:
+        logger.info(
+            f"StateStore recovered: version={snap.version}, state={snap.state.name}, "
+            f"replayed={stats['replayed_records']}, {stats['recovery_ms']:.2f} ms"
+        )
+    return store
 
 
 # Константы для тестирования
@@ -0,0 +1,214 @@
+"""
+Бенчмарки AsyncStateStore:
+- чтение: пропускная способность get() при 1/10/100 конкурентных читателях, пока писатель
+  обновляет состояние с частотой тика;
+- fan-out: стоимость set() при множестве подписчиков, из которых снапшот нужен немногим;
+- запись: латентность set() с частотой тика без WAL, с WAL (group commit) и с ожиданием fsync,
+  плюс время восстановления из получившегося WAL.
+
+Запуск из корня QIKI_DTMP:
+    python -m services.q_core_agent.state.store_benchmark --readers 1 10 100 --tick-hz 100
+    python -m services.q_core_agent.state.store_benchmark --fanout 1000 --interested 10
+    python -m services.q_core_agent.state.store_benchmark --wal --ticks 500
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import Dict, Iterable, Optional
+
+from .store import AsyncStateStore, SUBSCRIPTION_LATEST, create_initialized_store
+from .types import FsmState, FsmSnapshotDTO, initial_snapshot, next_snapshot
+
+
+# Режимы чтения: get() без lock, get_nowait() без корутины и прежний путь через lock
+READ_MODES = ("lock_free", "nowait", "locked")
+
+_STATES = (FsmState.IDLE, FsmState.ACTIVE)
+
+
+async def locked_get(store: AsyncStateStore) -> Optional[FsmSnapshotDTO]:
+    """Прежний get(): lock ради счётчика чтений — базовая линия для сравнения."""
+    async with store._lock:
+        store._total_gets += 1
+        return store._snap
+
+
+async def _writer(store: AsyncStateStore, tick_hz: float, stop: asyncio.Event) -> int:
+    period = 1.0 / tick_hz
+    snap = store.get_nowait()
+    writes = 0
+    next_tick = time.perf_counter()
+    while not stop.is_set():
+        snap = await store.set(next_snapshot(snap, _STATES[writes % 2], "bench_tick"))
+        writes += 1
+        next_tick += period
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+    return writes
+
+
+async def _reader(store: AsyncStateStore, mode: str, stop: asyncio.Event) -> int:
+    reads = 0
+    if mode == "nowait":
+        while not stop.is_set():
+            store.get_nowait()
+            reads += 1
+            # Уступаем loop, как реальный читатель между запросами
+            await asyncio.sleep(0)
+    elif mode == "lock_free":
+        while not stop.is_set():
+            await store.get()
+            reads += 1
+            await asyncio.sleep(0)
+    else:
+        while not stop.is_set():
+            await locked_get(store)
+            reads += 1
+            await asyncio.sleep(0)
+    return reads
+
+
+async def run_case(readers: int, mode: str, tick_hz: float = 100.0, duration_s: float = 1.0) -> Dict[str, float]:
+    """Один прогон: readers читателей в режиме mode и писатель с частотой tick_hz в течение duration_s."""
+    store = AsyncStateStore(initial_snapshot())
+    stop = asyncio.Event()
+    writer = asyncio.create_task(_writer(store, tick_hz, stop))
+    tasks = [asyncio.create_task(_reader(store, mode, stop)) for _ in range(readers)]
+    start = time.perf_counter()
+    await asyncio.sleep(duration_s)
+    stop.set()
+    reads = sum(await asyncio.gather(*tasks))
+    elapsed = time.perf_counter() - start
+    writes = await writer
+    return {
+        "reads_per_s": reads / elapsed,
+        "reads_per_s_per_reader": reads / elapsed / readers,
+        "writes_per_s": writes / elapsed,
+        "total_gets": store._total_gets,
+    }
+
+
+def benchmark_store_reads(readers: Iterable[int] = (1, 10, 100), modes: Iterable[str] = READ_MODES,
+                          tick_hz: float = 100.0, duration_s: float = 1.0):
+    """Возвращает {(mode, readers): stats} и печатает таблицу."""
+    results = {}
+    for n in readers:
+        for mode in modes:
+            r = asyncio.run(run_case(n, mode, tick_hz, duration_s))
+            results[(mode, n)] = r
+            print(f"readers={n:4d}  {mode:9s}  {r['reads_per_s']:12.0f} reads/s  "
+                  f"{r['reads_per_s_per_reader']:10.0f} per reader  writes={r['writes_per_s']:6.1f}/s")
+    return results
+
+
+async def run_fanout_case(subscribers: int, interested: int, filtered: bool, sets: int = 2000) -> Dict[str, float]:
+    """
+    set() при subscribers latest-подписчиках, из которых interested следят за ERROR_STATE.
+    filtered=False — все без фильтра (каждый фильтрует у себя), True — фильтры в store.
+    """
+    store = AsyncStateStore(initial_snapshot())
+    for i in range(subscribers):
+        if not filtered:
+            await store.subscribe(f"sub_{i}", mode=SUBSCRIPTION_LATEST)
+        elif i < interested:
+            await store.subscribe(f"sub_{i}", mode=SUBSCRIPTION_LATEST, states=[FsmState.ERROR_STATE])
+        else:
+            await store.subscribe(f"sub_{i}", mode=SUBSCRIPTION_LATEST, source_module=f"module_{i}")
+    snap = store.get_nowait()
+    start = time.perf_counter()
+    for i in range(sets):
+        snap = await store.set(next_snapshot(snap, _STATES[i % 2], "bench_tick"))
+    elapsed = time.perf_counter() - start
+    return {"set_us": elapsed / sets * 1e6}
+
+
+def benchmark_fanout(subscribers: Iterable[int] = (10, 100, 1000), interested: int = 10, sets: int = 2000):
+    """Возвращает {(subscribers, filtered): stats} и печатает таблицу."""
+    results = {}
+    for n in subscribers:
+        for filtered in (False, True):
+            r = asyncio.run(run_fanout_case(n, min(interested, n), filtered, sets))
+            results[(n, filtered)] = r
+            label = "indexed" if filtered else "all"
+            print(f"subscribers={n:5d}  {label:8s}  set {r['set_us']:8.2f} us")
+    return results
+
+
+# Режимы записи: без WAL, WAL с фоновым group commit, WAL с ожиданием fsync в set()
+WRITE_MODES = ("memory", "wal", "wal_durable")
+
+
+async def run_write_case(mode: str, ticks: int = 500, tick_hz: float = 100.0, directory: Optional[str] = None,
+                         checkpoint_every: int = 1000) -> Dict[str, float]:
+    """Латентность set() (мкс) при записи с частотой tick_hz; для WAL — и время восстановления."""
+    with tempfile.TemporaryDirectory() as tmp:
+        wal_dir = None if mode == "memory" else (directory or tmp)
+        store = create_initialized_store(wal_dir, wait_durable=(mode == "wal_durable"),
+                                         checkpoint_every=checkpoint_every)
+        snap = store.get_nowait()
+        period = 1.0 / tick_hz
+        samples = []
+        next_tick = time.perf_counter()
+        for i in range(ticks):
+            start = time.perf_counter()
+            snap = await store.set(next_snapshot(snap, _STATES[i % 2], "bench_tick"))
+            samples.append((time.perf_counter() - start) * 1e6)
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        metrics = await store.get_metrics()
+        await store.close()
+        samples.sort()
+        result = {
+            "p50_us": statistics.median(samples),
+            "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            "max_us": samples[-1],
+        }
+        if wal_dir is not None:
+            wal_metrics = metrics['wal']
+            recovered = create_initialized_store(wal_dir)
+            assert recovered.get_nowait().version == snap.version
+            result.update(
+                commits=wal_metrics['commits'],
+                records_per_commit=wal_metrics['appended'] / max(wal_metrics['commits'], 1),
+                bytes_per_record=wal_metrics['bytes_written'] / max(wal_metrics['appended'], 1),
+                recovery_ms=recovered.recovery_stats['recovery_ms'],
+                replayed=recovered.recovery_stats['replayed_records'],
+            )
+            await recovered.close()
+        return result
+
+
+def benchmark_writes(modes: Iterable[str] = WRITE_MODES, ticks: int = 500, tick_hz: float = 100.0,
+                     directory: Optional[str] = None):
+    """Возвращает {mode: stats} и печатает таблицу."""
+    results = {}
+    for mode in modes:
+        r = asyncio.run(run_write_case(mode, ticks, tick_hz, directory))
+        results[mode] = r
+        line = f"{mode:11s}  set p50={r['p50_us']:8.1f} p99={r['p99_us']:8.1f} max={r['max_us']:8.1f} us"
+        if "commits" in r:
+            line += (f"  commits={r['commits']:4d}  {r['bytes_per_record']:.0f} B/record  "
+                     f"recovery={r['recovery_ms']:.2f} ms ({r['replayed']} replayed)")
+        print(line)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AsyncStateStore read, fan-out and write-path benchmarks")
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--modes", nargs="+", choices=READ_MODES, default=list(READ_MODES))
+    parser.add_argument("--tick-hz", type=float, default=100.0)
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--fanout", type=int, nargs="+", help="Бенчмарк fan-out для этих чисел подписчиков")
+    parser.add_argument("--interested", type=int, default=10)
+    parser.add_argument("--wal", action="store_true", help="Бенчмарк пути записи: память vs WAL")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--wal-dir", help="Каталог WAL (по умолчанию временный)")
+    args = parser.parse_args()
+    if args.wal:
+        benchmark_writes(ticks=args.ticks, tick_hz=args.tick_hz, directory=args.wal_dir)
+    elif args.fanout:
+        benchmark_fanout(args.fanout, args.interested)
+    else:
+        benchmark_store_reads(args.readers, args.modes, args.tick_hz, args.duration)
@@ -0,0 +1,145 @@
+"""
+Тесты истории снапшотов: кольцевой буфер, поиск по версии и времени, диапазоны.
+"""
+import time
+
+import pytest
+
+from ..history import SnapshotHistory, CLOCK_WALL
+from ..store import AsyncStateStore, SUBSCRIPTION_LATEST, create_initialized_store
+from ..types import FsmSnapshotDTO, FsmState, initial_snapshot
+
+
+def snapshot(version, ts):
+    return FsmSnapshotDTO(version=version, state=FsmState.ACTIVE, reason=f"v{version}",
+                          ts_mono=ts, ts_wall=1000.0 + ts)
+
+
+@pytest.fixture
+def history():
+    h = SnapshotHistory(capacity=4)
+    for version in range(1, 7):
+        h.append(snapshot(version, float(version)))
+    return h
+
+
+class TestSnapshotHistory:
+    """Кольцевой буфер SnapshotHistory"""
+
+    def test_bounded(self, history):
+        assert len(history) == 4
+        assert history.oldest.version == 3
+        assert history.newest.version == 6
+
+    def test_get_version(self, history):
+        assert history.get_version(5).reason == "v5"
+        assert history.get_version(2) is None  # вытеснена
+        assert history.get_version(7) is None
+
+    def test_get_at(self, history):
+        assert history.get_at(4.0).version == 4
+        assert history.get_at(4.5).version == 4
+        assert history.get_at(100.0).version == 6
+        assert history.get_at(2.5) is None  # раньше самой старой версии
+        assert history.get_at(1004.2, clock=CLOCK_WALL).version == 4
+        with pytest.raises(ValueError):
+            history.get_at(1.0, clock="utc")
+
+    def test_range(self, history):
+        assert [s.version for s in history.range(4, 5)] == [4, 5]
+        assert [s.version for s in history.range(1, 100)] == [3, 4, 5, 6]
+        assert history.range(7, 9) == []
+
+    def test_version_gaps(self):
+        h = SnapshotHistory(capacity=8)
+        for version in (1, 2, 10, 11):
+            h.append(snapshot(version, float(version)))
+        assert [s.version for s in h.range(2, 10)] == [2, 10]
+        assert h.get_version(5) is None
+
+    def test_get_at_with_out_of_order_timestamps(self):
+        h = SnapshotHistory(capacity=8)
+        # ts_mono +10, +5, +20 относительно v1
+        for version, ts in ((1, 1.0), (2, 11.0), (3, 6.0), (4, 21.0)):
+            h.append(snapshot(version, ts))
+        # v3 с меткой старше v2 действует с момента, когда заменила v2
+        assert [h.get_at(ts).version for ts in (1.0, 5.0, 7.0, 10.9)] == [1, 1, 1, 1]
+        assert [h.get_at(ts).version for ts in (11.0, 15.0, 20.9)] == [3, 3, 3]
+        assert h.get_at(25.0).version == 4
+        assert h.get_at(1008.0, clock=CLOCK_WALL).version == 1
+        assert h.get_at(1013.0, clock=CLOCK_WALL).version == 3
+
+    def test_get_at_with_future_timestamp(self):
+        h = SnapshotHistory(capacity=8)
+        now = time.monotonic()
+        h.append(snapshot(1, now - 10.0))
+        # Метка из будущего прижимается к времени записи и не закрепляет последующие версии
+        h.append(snapshot(2, now + 1e6))
+        h.append(snapshot(3, time.monotonic()))
+        assert h.get_at(now - 5.0).version == 1
+        assert h.get_at(time.monotonic()).version == 3
+
+    def test_get_at_after_wrap_with_clock_step_back(self):
+        h = SnapshotHistory(capacity=3)
+        for version, ts in ((1, 1.0), (2, 2.0), (3, 3.0), (4, 1.5), (5, 4.0)):
+            h.append(snapshot(version, ts))
+        assert h.get_at(2.5) is None  # v3 — самая старая в истории, действует с 3.0
+        assert h.get_at(3.5).version == 4
+        assert h.get_at(4.0).version == 5
+
+    def test_invalid_capacity(self):
+        with pytest.raises(ValueError):
+            SnapshotHistory(capacity=0)
+
+
+class TestStoreHistory:
+    """История в AsyncStateStore"""
+
+    @pytest.mark.asyncio
+    async def test_versions_kept_after_set(self):
+        store = AsyncStateStore(initial_snapshot(), history_size=16)
+        first = await store.set(FsmSnapshotDTO(version=0, state=FsmState.IDLE, reason="first"))
+        await store.set(FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason="second"))
+        assert store.get_version(first.version) is first
+        assert store.get_version(0).reason == "COLD_START"
+        assert store.get_at(first.ts_mono) is first
+        assert [s.reason for s in store.range(1, 2)] == ["first", "second"]
+        metrics = await store.get_metrics()
+        assert metrics['history_size'] == 3
+        assert metrics['oldest_version'] == 0
+
+    @pytest.mark.asyncio
+    async def test_subscriber_catch_up(self):
+        store = create_initialized_store(history_size=64)
+        sub = await store.subscribe("dashboard", mode=SUBSCRIPTION_LATEST)
+        seen, _ = sub.get_with_skipped_nowait()
+        for i in range(5):
+            await store.set(FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason=f"t{i}"))
+        latest, skipped = sub.get_with_skipped_nowait()
+        missed = store.range(seen.version + 1, latest.version - 1)
+        assert len(missed) == skipped == 4
+        assert [s.reason for s in missed] == ["t0", "t1", "t2", "t3"]
+
+    @pytest.mark.asyncio
+    async def test_get_at_after_recovery_from_previous_boot(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), fsync=False)
+        # Монотонное время прошлого запуска больше текущего (перезагрузка машины)
+        await store.set(FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason="before_reboot",
+                                       ts_mono=time.monotonic() + 1e6))
+        await store.close()
+
+        recovered = create_initialized_store(str(tmp_path), fsync=False)
+        started = time.monotonic()
+        for i in range(3):
+            await recovered.set(FsmSnapshotDTO(version=0, state=FsmState.IDLE, reason=f"t{i}"))
+        assert recovered.get_at(started).reason == "before_reboot"
+        assert recovered.get_at(time.monotonic()).reason == "t2"
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_history_disabled(self):
+        store = AsyncStateStore(initial_snapshot(), history_size=0)
+        await store.set(FsmSnapshotDTO(version=0, state=FsmState.IDLE))
+        assert store.get_version(1) is None
+        assert store.get_at(0.0) is None
+        assert store.range(0, 10) == []
@@ -0,0 +1,268 @@
+"""
+Тесты персистентности StateStore: бинарный кодек, WAL с group commit, checkpoint, восстановление.
+"""
+import asyncio
+import os
+import pytest
+
+from ..persistence import (
+    StateWAL, PersistenceError, encode_snapshot, decode_snapshot, frame, read_frames,
+    WAL_FILE, CHECKPOINT_FILE
+)
+from ..store import create_initialized_store
+from ..store_benchmark import run_write_case
+from ..types import FsmSnapshotDTO, FsmState, TransitionStatus, create_transition, initial_snapshot, next_snapshot
+
+
+@pytest.fixture
+def rich_snapshot():
+    snap = FsmSnapshotDTO(
+        version=42,
+        state=FsmState.ERROR_STATE,
+        prev_state=FsmState.ACTIVE,
+        reason="BIOS_FAULT: перегрев",
+        source_module="bios_handler",
+        attempt_count=3,
+        context_data={"sensor": "thermal_0", "value": "97.5"},
+        state_metadata={"severity": "high"},
+    )
+    return snap.add_transition(
+        create_transition(FsmState.ACTIVE, FsmState.ERROR_STATE, "BIOS_FAULT", TransitionStatus.FAILED, "overheat")
+    )
+
+
+async def set_states(store, count):
+    snap = store.get_nowait()
+    for i in range(count):
+        snap = await store.set(next_snapshot(snap, (FsmState.IDLE, FsmState.ACTIVE)[i % 2], f"tick_{i}"))
+    return snap
+
+
+class TestSnapshotCodec:
+    """Бинарное кодирование FsmSnapshotDTO"""
+
+    def test_roundtrip(self, rich_snapshot):
+        decoded = decode_snapshot(encode_snapshot(rich_snapshot))
+        assert decoded == rich_snapshot
+
+    def test_roundtrip_initial(self):
+        snap = initial_snapshot()
+        assert decode_snapshot(encode_snapshot(snap)) == snap
+
+    def test_compact(self, rich_snapshot):
+        assert len(encode_snapshot(rich_snapshot)) < len(repr(rich_snapshot)) / 2
+
+    def test_torn_tail_ignored(self, rich_snapshot):
+        data = frame(encode_snapshot(rich_snapshot)) * 2
+        payloads, valid = read_frames(data + data[:10])
+        assert len(payloads) == 2
+        assert valid == len(data)
+
+    def test_corrupted_frame_stops_replay(self, rich_snapshot):
+        record = bytearray(frame(encode_snapshot(rich_snapshot)))
+        record[-1] ^= 0xFF
+        payloads, valid = read_frames(frame(b"ok") + bytes(record))
+        assert payloads == [b"ok"]
+
+
+class TornFile:
+    """Файл WAL, у которого первые failures записей обрываются на середине (как при ENOSPC)."""
+
+    def __init__(self, real, failures=1):
+        self.real = real
+        self.failures = failures
+
+    def write(self, data):
+        if self.failures:
+            self.failures -= 1
+            self.real.write(data[:len(data) // 2])
+            self.real.flush()
+            raise OSError(28, "No space left on device")
+        return self.real.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+class TestStateWAL:
+    """WAL, group commit и checkpoint"""
+
+    @pytest.mark.asyncio
+    async def test_recover_latest_version(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), fsync=False)
+        last = await set_states(store, 10)
+        await store.close()
+
+        recovered = create_initialized_store(str(tmp_path), fsync=False)
+        assert recovered.get_nowait() == last
+        assert recovered.recovery_stats['replayed_records'] == 10
+        assert recovered.recovery_stats['recovery_ms'] >= 0.0
+        # Версии продолжаются с восстановленной
+        snap = await recovered.set(next_snapshot(last, FsmState.SHUTDOWN, "stop"))
+        assert snap.version == last.version + 1
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_empty_dir_starts_cold(self, tmp_path):
+        store = create_initialized_store(str(tmp_path / "fresh"))
+        assert store.get_nowait().reason == "COLD_START"
+        assert store.recovery_stats['recovered_version'] == -1
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_group_commit(self, tmp_path):
+        wal = StateWAL(str(tmp_path), commit_interval_s=0.05, fsync=False)
+        wal.recover()
+        snap = initial_snapshot()
+        for i in range(20):
+            snap = next_snapshot(snap, FsmState.ACTIVE if i % 2 else FsmState.IDLE, f"t{i}")
+            wal.append(snap)
+        await asyncio.sleep(0.1)
+        assert wal.metrics['appended'] == 20
+        assert wal.metrics['commits'] == 1
+        await wal.close()
+
+    @pytest.mark.asyncio
+    async def test_wait_durable_groups_concurrent_writers(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), wait_durable=True)
+        base = store.get_nowait()
+        await asyncio.gather(*[
+            store.set(FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason=f"w{i}")) for i in range(10)
+        ])
+        metrics = (await store.get_metrics())['wal']
+        assert metrics['appended'] == 10
+        # Пишущие во время fsync первой группы уходят одной следующей группой
+        assert metrics['commits'] < 10
+        await store.close()
+        recovered = create_initialized_store(str(tmp_path))
+        assert recovered.get_nowait().version == base.version + 10
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_truncates_wal(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), checkpoint_every=5, max_batch=1, fsync=False)
+        last = await set_states(store, 12)
+        await store.close()
+        assert os.path.exists(tmp_path / CHECKPOINT_FILE)
+
+        recovered = create_initialized_store(str(tmp_path))
+        stats = recovered.recovery_stats
+        assert recovered.get_nowait() == last
+        assert stats['checkpoint_version'] >= 5
+        assert stats['replayed_records'] == last.version - stats['checkpoint_version']
+        assert stats['replayed_records'] < 5
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_torn_wal_tail_truncated_on_recovery(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), fsync=False)
+        last = await set_states(store, 3)
+        await store.close()
+        with open(tmp_path / WAL_FILE, "ab") as f:
+            f.write(b"\x40\x00\x00\x00partial")
+
+        recovered = create_initialized_store(str(tmp_path))
+        assert recovered.get_nowait() == last
+        assert recovered.recovery_stats['truncated_bytes'] == 11
+        await set_states(recovered, 1)
+        await recovered.close()
+        again = create_initialized_store(str(tmp_path))
+        assert again.get_nowait().version == last.version + 1
+        await again.close()
+
+    @pytest.mark.asyncio
+    async def test_partial_write_truncated_before_retry(self, tmp_path):
+        store = create_initialized_store(str(tmp_path), commit_interval_s=0.001, fsync=False)
+        await set_states(store, 3)
+        await store._wal.commit()
+        store._wal._file = TornFile(store._wal._file)
+        await set_states(store, 2)
+        await asyncio.sleep(0.05)
+        last = await set_states(store, 2)
+        await store.close()
+        assert store._wal.metrics['write_errors'] == 1
+
+        recovered = create_initialized_store(str(tmp_path))
+        assert recovered.get_nowait() == last
+        assert recovered.recovery_stats['truncated_bytes'] == 0
+        assert recovered.recovery_stats['replayed_records'] == last.version
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_wait_durable_fails_on_write_error(self, tmp_path, monkeypatch):
+        store = create_initialized_store(str(tmp_path), wait_durable=True, fsync=False)
+        await set_states(store, 1)
+        write = store._wal._write
+
+        def failing_write(data):
+            raise OSError(5, "Input/output error")
+        monkeypatch.setattr(store._wal, "_write", failing_write)
+        with pytest.raises(PersistenceError):
+            await asyncio.wait_for(set_states(store, 1), timeout=1.0)
+
+        # После устранения сбоя группа дописывается повторным commit, состояние не теряется
+        monkeypatch.setattr(store._wal, "_write", write)
+        last = await set_states(store, 1)
+        await store.close()
+        recovered = create_initialized_store(str(tmp_path))
+        assert recovered.get_nowait() == last
+        assert recovered.recovery_stats['replayed_records'] == last.version
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_failure_keeps_durable_batch(self, tmp_path, monkeypatch):
+        store = create_initialized_store(str(tmp_path), checkpoint_every=2, max_batch=1,
+                                         wait_durable=True, fsync=False)
+        write_checkpoint = store._wal._write_checkpoint
+
+        def failing_checkpoint(checkpoint):
+            raise OSError(28, "No space left on device")
+        monkeypatch.setattr(store._wal, "_write_checkpoint", failing_checkpoint)
+        # Группы уже в WAL: set() не падает, хотя checkpoint не удался
+        await asyncio.wait_for(set_states(store, 3), timeout=1.0)
+        assert store._wal.metrics['write_errors'] > 0
+        assert store._wal.metrics['checkpoints'] == 0
+        assert not os.path.exists(tmp_path / CHECKPOINT_FILE)
+
+        # Повторяется только checkpoint, группы не дописываются повторно
+        monkeypatch.setattr(store._wal, "_write_checkpoint", write_checkpoint)
+        last = await set_states(store, 1)
+        await store.close()
+        assert store._wal.metrics['checkpoints'] == 1
+        assert os.path.exists(tmp_path / CHECKPOINT_FILE)
+        recovered = create_initialized_store(str(tmp_path))
+        assert recovered.get_nowait() == last
+        assert recovered.recovery_stats['replayed_records'] == 0
+        await recovered.close()
+
+    @pytest.mark.asyncio
+    async def test_close_releases_resources_on_write_error(self, tmp_path, monkeypatch):
+        wal = StateWAL(str(tmp_path), commit_interval_s=60.0, fsync=False)
+        wal.append(initial_snapshot())
+
+        def failing_write(data):
+            raise OSError(5, "Input/output error")
+        monkeypatch.setattr(wal, "_write", failing_write)
+        with pytest.raises(PersistenceError):
+            await wal.close()
+        assert wal._closed
+        assert wal._file is None
+
+    @pytest.mark.asyncio
+    async def test_append_after_close(self, tmp_path):
+        wal = StateWAL(str(tmp_path))
+        await wal.close()
+        with pytest.raises(PersistenceError):
+            wal.append(initial_snapshot())
+
+
+class TestWriteBenchmark:
+    """Смоук бенчмарка пути записи"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["memory", "wal", "wal_durable"])
+    async def test_run_write_case(self, mode):
+        result = await run_write_case(mode, ticks=20, tick_hz=1000.0)
+        assert result['p50_us'] > 0
+        if mode != "memory":
+            assert result['replayed'] == 20
@@ -0,0 +1,238 @@
+"""
+Unit тесты AsyncStateStore: чтение, запись, метрики.
+"""
+import asyncio
+import pytest
+
+from ..store import (
+    AsyncStateStore, LatestValueSubscription, StateStoreError, create_initialized_store,
+    SUBSCRIPTION_LATEST, MAX_QUEUE_SIZE
+)
+from ..store_benchmark import run_case, run_fanout_case
+from ..types import FsmSnapshotDTO, FsmState, initial_snapshot
+
+
+@pytest.fixture
+def empty_store():
+    return AsyncStateStore()
+
+
+@pytest.fixture
+def initialized_store():
+    return AsyncStateStore(initial_snapshot())
+
+
+@pytest.fixture
+def sample_snapshot():
+    return FsmSnapshotDTO(version=1, state=FsmState.IDLE, reason="test")
+
+
+class TestAsyncStateStoreLockFreeReads:
+    """get() не берёт lock и не ждёт писателя"""
+
+    @pytest.mark.asyncio
+    async def test_get_empty(self, empty_store):
+        assert await empty_store.get() is None
+        assert empty_store.get_nowait() is None
+
+    @pytest.mark.asyncio
+    async def test_get_returns_same_reference(self, empty_store, sample_snapshot):
+        stored = await empty_store.set(sample_snapshot)
+        assert await empty_store.get() is stored
+        assert empty_store.get_nowait() is stored
+
+    @pytest.mark.asyncio
+    async def test_get_does_not_wait_for_lock(self, initialized_store):
+        async with initialized_store._lock:
+            snap = await asyncio.wait_for(initialized_store.get(), timeout=0.1)
+        assert snap.state == FsmState.BOOTING
+
+    @pytest.mark.asyncio
+    async def test_gets_counted(self, initialized_store):
+        for _ in range(5):
+            await initialized_store.get()
+        initialized_store.get_nowait()
+        metrics = await initialized_store.get_metrics()
+        # get_metrics сам тоже считается чтением
+        assert metrics['total_gets'] == 7
+        _, meta = await initialized_store.get_with_meta()
+        assert meta['store_metrics']['total_gets'] == 8
+
+    @pytest.mark.asyncio
+    async def test_readers_see_whole_snapshots(self, initialized_store):
+        stop = asyncio.Event()
+        seen = []
+
+        async def reader():
+            while not stop.is_set():
+                snap = await initialized_store.get()
+                seen.append((snap.version, snap.reason))
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(reader()) for _ in range(10)]
+        snap = initialized_store.get_nowait()
+        for i in range(20):
+            snap = await initialized_store.set(FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason=f"v{i}"))
+            await asyncio.sleep(0)
+        stop.set()
+        await asyncio.gather(*tasks)
+        assert all(reason == f"v{version - 1}" for version, reason in seen if version > 0)
+        assert snap.version == 20
+
+    @pytest.mark.asyncio
+    async def test_create_initialized_store(self):
+        store = create_initialized_store()
+        assert store.get_nowait().reason == "COLD_START"
+
+
+async def set_states(store, count, state=FsmState.ACTIVE):
+    for i in range(count):
+        await store.set(FsmSnapshotDTO(version=0, state=state, reason=f"tick_{i}"))
+
+
+class TestAsyncStateStoreLatestSubscription:
+    """Conflating подписка: последний снапшот и счётчик пропущенных"""
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_catches_up_to_latest(self, initialized_store):
+        sub = await initialized_store.subscribe("dashboard", mode=SUBSCRIPTION_LATEST)
+        assert isinstance(sub, LatestValueSubscription)
+        await set_states(initialized_store, 3 * MAX_QUEUE_SIZE)
+
+        snap, skipped = await sub.get_with_skipped()
+        assert snap is initialized_store.get_nowait()
+        # Текущее состояние при подписке и все обновления, кроме последнего, вытеснены
+        assert skipped == 3 * MAX_QUEUE_SIZE
+        assert sub.qsize() == 0
+        assert sub in initialized_store._subscribers
+
+    @pytest.mark.asyncio
+    async def test_queue_subscriber_still_removed_on_overflow(self, initialized_store):
+        queue = await initialized_store.subscribe("strict")
+        latest = await initialized_store.subscribe("latest", mode=SUBSCRIPTION_LATEST)
+        await set_states(initialized_store, MAX_QUEUE_SIZE)
+        assert queue not in initialized_store._subscribers
+        assert latest in initialized_store._subscribers
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_update(self, initialized_store):
+        sub = await initialized_store.subscribe("waiter", mode=SUBSCRIPTION_LATEST)
+        sub.get_nowait()
+        with pytest.raises(asyncio.QueueEmpty):
+            sub.get_nowait()
+
+        waiter = asyncio.create_task(sub.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await set_states(initialized_store, 1, FsmState.IDLE)
+        snap = await asyncio.wait_for(waiter, timeout=1.0)
+        assert snap.state == FsmState.IDLE
+        assert sub.delivered == 2
+        assert sub.skipped == 0
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe(self, initialized_store):
+        sub = await initialized_store.subscribe("temp", mode=SUBSCRIPTION_LATEST)
+        await initialized_store.unsubscribe(sub)
+        assert sub not in initialized_store._subscribers
+        assert (await initialized_store.get_metrics())['subscriber_count'] == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_mode(self, initialized_store):
+        with pytest.raises(StateStoreError):
+            await initialized_store.subscribe("bad", mode="ring")
+
+
+async def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+class TestAsyncStateStoreFilteredSubscriptions:
+    """Фильтры подписки и индекс подписчиков"""
+
+    @pytest.mark.asyncio
+    async def test_target_states(self, initialized_store):
+        queue = await initialized_store.subscribe("alarms", states=[FsmState.ERROR_STATE, FsmState.SHUTDOWN])
+        assert queue.empty()  # текущее BOOTING не проходит фильтр
+        for state in (FsmState.IDLE, FsmState.ERROR_STATE, FsmState.ACTIVE, FsmState.SHUTDOWN):
+            await initialized_store.set(FsmSnapshotDTO(version=0, state=state, reason="t"))
+        assert [snap.state for snap in await drain(queue)] == [FsmState.ERROR_STATE, FsmState.SHUTDOWN]
+
+    @pytest.mark.asyncio
+    async def test_state_change_only(self, initialized_store):
+        queue = await initialized_store.subscribe("changes", state_change_only=True)
+        for state in (FsmState.BOOTING, FsmState.IDLE, FsmState.IDLE, FsmState.ACTIVE):
+            await initialized_store.set(FsmSnapshotDTO(version=0, state=state, reason="t"))
+        states = [snap.state for snap in await drain(queue)]
+        assert states == [FsmState.BOOTING, FsmState.IDLE, FsmState.ACTIVE]
+
+    @pytest.mark.asyncio
+    async def test_source_module_and_reason_prefix(self, initialized_store):
+        by_source = await initialized_store.subscribe("bios", source_module="bios_handler")
+        by_reason = await initialized_store.subscribe("faults", reason_prefix="FAULT_")
+        combined = await initialized_store.subscribe(
+            "bios_faults", source_module="bios_handler", reason_prefix="FAULT_"
+        )
+        for source, reason in (("fsm_handler", "FAULT_X"), ("bios_handler", "OK"), ("bios_handler", "FAULT_Y")):
+            await initialized_store.set(
+                FsmSnapshotDTO(version=0, state=FsmState.ACTIVE, reason=reason, source_module=source)
+            )
+        assert [s.reason for s in await drain(by_source)] == ["OK", "FAULT_Y"]
+        assert [s.reason for s in await drain(by_reason)] == ["FAULT_X", "FAULT_Y"]
+        assert [s.reason for s in await drain(combined)] == ["FAULT_Y"]
+
+    @pytest.mark.asyncio
+    async def test_filtered_latest_subscription(self, initialized_store):
+        sub = await initialized_store.subscribe("errors", mode=SUBSCRIPTION_LATEST, states=[FsmState.ERROR_STATE])
+        await set_states(initialized_store, 5, FsmState.ACTIVE)
+        assert sub.empty()
+        await set_states(initialized_store, 3, FsmState.ERROR_STATE)
+        snap, skipped = sub.get_with_skipped_nowait()
+        assert snap.reason == "tick_2"
+        assert skipped == 2
+
+    @pytest.mark.asyncio
+    async def test_set_touches_only_matching_buckets(self, initialized_store):
+        await initialized_store.subscribe("errors", states=[FsmState.ERROR_STATE])
+        await initialized_store.subscribe("nav", source_module="navigation")
+        assert set(initialized_store._by_state) == {FsmState.ERROR_STATE}
+        assert set(initialized_store._by_source) == {"navigation"}
+        assert not initialized_store._unfiltered and not initialized_store._scan_subscribers
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_cleans_index(self, initialized_store):
+        queue = await initialized_store.subscribe("alarms", states=[FsmState.ERROR_STATE, FsmState.SHUTDOWN])
+        other = await initialized_store.subscribe("nav", source_module="navigation")
+        await initialized_store.unsubscribe(queue)
+        await initialized_store.unsubscribe(other)
+        assert initialized_store._by_state == {}
+        assert initialized_store._by_source == {}
+        assert initialized_store._filters == {}
+
+    @pytest.mark.asyncio
+    async def test_overflowed_filtered_queue_removed_from_index(self, initialized_store):
+        await initialized_store.subscribe("active", states=[FsmState.ACTIVE])
+        await set_states(initialized_store, MAX_QUEUE_SIZE + 1, FsmState.ACTIVE)
+        assert initialized_store._subscribers == []
+        assert initialized_store._by_state == {}
+
+
+class TestStoreBenchmark:
+    """Смоук бенчмарка чтения"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["lock_free", "nowait", "locked"])
+    async def test_run_case(self, mode):
+        result = await run_case(readers=10, mode=mode, tick_hz=100.0, duration_s=0.05)
+        assert result['reads_per_s'] > 0
+        assert result['writes_per_s'] > 0
+        assert result['total_gets'] > 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("filtered", [False, True])
+    async def test_run_fanout_case(self, filtered):
+        result = await run_fanout_case(subscribers=50, interested=5, filtered=filtered, sets=20)
+        assert result['set_us'] > 0
@@ -1,17 +1,116 @@
-from flask import Flask, jsonify
-import torch
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+import yaml
+from flask import Flask, Response, jsonify
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from core.metrics_recorder import NULL
+from core.neural_engine_impl import NeuralEngineV1
 
-app = Flask(__name__)
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "..", "configs", "config.example.yaml")
+PROBE_AGENT_ID = "__ready_probe__"
+
+
+@dataclass
+class ProbeBiosStatus:
+    ok: bool = True
+    temperature: float = 50.0
+    power_draw: float = 50.0
+    utilization: float = 50.0
+
+
+@dataclass
+class ProbeContext:
+    """Фиксированный контекст пробы; отдельный agent_id не трогает per-agent состояние реальных агентов."""
+    bios_status: ProbeBiosStatus = field(default_factory=ProbeBiosStatus)
+    fsm_state: str = "IDLE"
+    sensor_data: dict = field(default_factory=dict)
+    agent_id: str = PROBE_AGENT_ID
+
+
+def load_config(path: str = None):
+    with open(path or os.environ.get("NE_CONFIG", DEFAULT_CONFIG)) as f:
+        return yaml.safe_load(f)
+
+
+class ReadinessProbe:
+    """
+    Readiness через настоящий engine: engine создаётся при первой пробе, проба — один проход инференса.
+    Результат кэшируется на ttl_s, так что частые опросы не нагружают worker инференса;
+    конкурентные запросы ждут одну пробу под lock.
+    """
+
+    def __init__(self, engine_factory, ttl_s: float = 5.0, timeout_s: float = 1.0):
+        self.engine_factory = engine_factory
+        self.ttl_s = ttl_s
+        self.timeout_s = timeout_s
+        self.engine = None
+        self.context = ProbeContext()
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires = 0.0
+
+    def check(self):
+        """Возвращает (тело ответа, HTTP-статус); в пределах TTL — из кэша с cached=True."""
+        with self._lock:
+            now = time.monotonic()
+            if self._result is not None and now < self._expires:
+                body, status = self._result
+                return dict(body, cached=True), status
+            self._result = self._run()
+            self._expires = time.monotonic() + self.ttl_s
+            body, status = self._result
+            return dict(body, cached=False), status
+
+    def _run(self):
+        try:
+            if self.engine is None:
+                self.engine = self.engine_factory()
+            probe_ms = self.engine.probe(self.context, self.timeout_s)
+        except Exception as e:
+            return {"status": "not_ready", "details": str(e) or type(e).__name__}, 503
+        engine = self.engine
+        return {
+            "status": "ready",
+            "backend": engine.active_backend,
+            "model_version": engine.model_version,
+            "probe_latency_ms": probe_ms,
+            "last_inference_ms": engine.last_inference_ms,
+            "time_budget_ms": engine.config['time_budget_ms'],
+        }, 200
+
+
+def create_app(engine_factory=None, config=None, registry=REGISTRY):
+    """
+    Flask-приложение: /health — liveness процесса, /ready — проба инференса (config['health']),
+    /metrics — реестр prometheus_client (scrape target qiki-ne:5000 в monitoring/prometheus.yml).
+    """
+    if engine_factory is None:
+        config = config or load_config()
+        # Engine только для проб: его проходы не должны попадать в экспортируемые метрики
+        engine_factory = lambda: NeuralEngineV1(config, recorder=NULL)
+    health_cfg = (config or {}).get('health', {})
+    probe = ReadinessProbe(engine_factory, health_cfg.get('ready_ttl_s', 5.0),
+                           health_cfg.get('probe_timeout_ms', 1000) / 1000.0)
+    app = Flask(__name__)
+    app.config['READINESS_PROBE'] = probe
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        return jsonify({"status": "ok"}), 200
+
+    @app.route("/ready", methods=["GET"])
+    def ready():
+        body, status = probe.check()
+        return jsonify(body), status
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+    return app
 
-@app.route("/health", methods=["GET"])
-def health():
-    try:
-        # Проверка доступности модели
-        x = torch.randn(1, 16, 32)
-        mask = torch.ones(1, 6).bool()
-        return jsonify({"status": "ok", "model": "loaded"}), 200
-    except Exception as e:
-        return jsonify({"status": "error", "details": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    create_app().run(host="0.0.0.0", port=5000)
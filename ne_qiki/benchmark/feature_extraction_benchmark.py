@@ -0,0 +1,80 @@
+import time
+import random
+from dataclasses import dataclass, field
+from typing import Optional
+from core.feature_extractor import FeatureExtractor
+
+
+@dataclass
+class BenchBiosStatus:
+    ok: bool = True
+    temperature: float = 50.0
+    power_draw: float = 50.0
+    utilization: float = 50.0
+
+
+@dataclass
+class BenchContext:
+    bios_status: BenchBiosStatus
+    fsm_state: str
+    sensor_data: dict = field(default_factory=dict)
+    agent_id: Optional[str] = None
+
+
+def make_contexts(batch_size: int):
+    states = ["BOOTING", "IDLE", "ACTIVE", "ERROR_STATE"]
+    return [
+        BenchContext(
+            bios_status=BenchBiosStatus(
+                temperature=random.uniform(0, 120),
+                power_draw=random.uniform(0, 120),
+                utilization=random.uniform(0, 120)
+            ),
+            fsm_state=random.choice(states),
+            sensor_data={
+                "distance": random.uniform(0, 15),
+                "velocity": random.uniform(-8, 8),
+                "azimuth": random.uniform(-4, 4),
+                "hazard_score": random.random(),
+                "action_history": [random.randint(0, 12) for _ in range(random.randint(0, 7))]
+            },
+            agent_id=f"agent_{i}"
+        )
+        for i in range(batch_size)
+    ]
+
+
+def benchmark_feature_extraction(batch_sizes=(1, 4, 16, 64, 256, 1024), iterations: int = 50,
+                                 window: int = 16, in_dim: int = 32):
+    """Сравнивает последовательный extract и extract_batch; возвращает {B: (scalar_ms, batch_ms)}."""
+    results = {}
+    for batch_size in batch_sizes:
+        contexts = make_contexts(batch_size)
+        scalar = FeatureExtractor(window, in_dim)
+        batched = FeatureExtractor(window, in_dim)
+
+        # Warmup (заодно создаёт окна агентов)
+        for _ in range(3):
+            for context in contexts:
+                scalar.extract(context)
+            batched.extract_batch(contexts)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for context in contexts:
+                scalar.extract(context)
+        scalar_ms = (time.perf_counter() - start) / iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            batched.extract_batch(contexts)
+        batch_ms = (time.perf_counter() - start) / iterations * 1000
+
+        results[batch_size] = (scalar_ms, batch_ms)
+        print(f"B={batch_size:5d}  extract x B: {scalar_ms:8.3f} ms  extract_batch: {batch_ms:8.3f} ms  "
+              f"speedup: {scalar_ms / batch_ms:5.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_feature_extraction()
@@ -0,0 +1,162 @@
+import os
+import json
+import argparse
+import tempfile
+import time
+import numpy as np
+import torch
+from models.ne_v1 import NE_v1
+from core.inference_backend import (
+    OnnxBackend, TorchBackend, compile_model, export_onnx,
+    BACKEND_ONNX_FP32, BACKEND_ONNX_INT8, COMPILE_TORCHSCRIPT
+)
+
+RUNTIME_EAGER = "torch"
+RUNTIME_TORCHSCRIPT = "torchscript"
+RUNTIMES = (RUNTIME_EAGER, RUNTIME_TORCHSCRIPT, BACKEND_ONNX_FP32, BACKEND_ONNX_INT8)
+
+# Метрики латентности в каждой строке результата (мс)
+METRICS = ("p50", "p95", "p99", "max", "mean")
+
+
+def build_runner(runtime: str, model, window: int, in_dim: int, num_classes: int, threads: int, workdir: str):
+    """Возвращает backend с методом run(x, mask) для одной точки матрицы."""
+    if runtime == RUNTIME_EAGER:
+        return TorchBackend(model, runtime)
+    if runtime == RUNTIME_TORCHSCRIPT:
+        return TorchBackend(compile_model(model, COMPILE_TORCHSCRIPT, window, in_dim, num_classes), runtime)
+    if runtime in (BACKEND_ONNX_FP32, BACKEND_ONNX_INT8):
+        fp32_path = os.path.join(workdir, f"ne_v1_h{model.gru.hidden_size}.onnx")
+        if not os.path.exists(fp32_path):
+            export_onnx(model, fp32_path, window, in_dim, num_classes)
+        path = fp32_path
+        if runtime == BACKEND_ONNX_INT8:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            path = fp32_path.replace(".onnx", "_int8.onnx")
+            if not os.path.exists(path):
+                quantize_dynamic(fp32_path, path, weight_type=QuantType.QUInt8)
+        return OnnxBackend(path, runtime, intra_op_num_threads=threads, inter_op_num_threads=1)
+    raise ValueError(f"Unknown benchmark runtime: {runtime}")
+
+
+def measure(runner, x, mask, iterations: int, warmup: int):
+    """Латентность runner.run в мс по perf_counter_ns: p50/p95/p99/max/mean."""
+    for _ in range(warmup):
+        runner.run(x, mask)
+    samples = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        runner.run(x, mask)
+        samples[i] = (time.perf_counter_ns() - start) / 1e6
+    return latency_stats(samples)
+
+
+def latency_stats(samples):
+    """p50/p95/p99/max/mean по выборке латентностей (мс)."""
+    samples = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(samples.max()), "mean": float(samples.mean())}
+
+
+def result_key(row):
+    return (row["runtime"], row["batch_size"], row["window"], row["hidden_size"], row["threads"])
+
+
+def run_matrix(runtimes=RUNTIMES, batch_sizes=(1, 8, 64), windows=(16,), hidden_sizes=(64,),
+               threads=(1,), iterations: int = 200, warmup: int = 20, in_dim: int = 32,
+               num_classes: int = 6, param_dim: int = 4, seed: int = 0):
+    """
+    Прогоняет матрицу runtime x batch x window x hidden x threads на случайно инициализированной NE_v1.
+    Runtime, которые недоступны в окружении (нет onnxruntime), пропускаются с сообщением.
+    """
+    torch.manual_seed(seed)
+    previous_threads = torch.get_num_threads()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for hidden_size in hidden_sizes:
+            model = NE_v1(in_dim, hidden_size, num_classes, param_dim).eval()
+            for window in windows:
+                for runtime in runtimes:
+                    for n_threads in threads:
+                        torch.set_num_threads(n_threads)
+                        # ONNX экспортируется один раз на hidden_size (ось time динамическая), сессия — на точку
+                        try:
+                            runner = build_runner(runtime, model, window, in_dim, num_classes, n_threads, workdir)
+                        except ImportError as e:
+                            print(f"Skipping {runtime}: {e}")
+                            break
+                        for batch_size in batch_sizes:
+                            x = torch.randn(batch_size, window, in_dim)
+                            mask = torch.ones(batch_size, num_classes, dtype=torch.bool)
+                            row = {"runtime": runtime, "batch_size": batch_size, "window": window,
+                                   "hidden_size": hidden_size, "threads": n_threads}
+                            row.update(measure(runner, x, mask, iterations, warmup))
+                            results.append(row)
+                            print(f"{runtime:12s} B={batch_size:4d} T={window:3d} H={hidden_size:4d} "
+                                  f"threads={n_threads:2d}  p50={row['p50']:7.3f}  p95={row['p95']:7.3f}  "
+                                  f"p99={row['p99']:7.3f}  max={row['max']:7.3f} ms")
+    torch.set_num_threads(previous_threads)
+    return results
+
+
+def compare_to_baseline(results, baseline, max_regression: float = 0.10, metric: str = "p95"):
+    """
+    Сравнивает результаты с базовыми по ключу (runtime, batch, window, hidden, threads).
+    Возвращает список регрессий: metric вырос больше чем на max_regression (доля) относительно базы.
+    Точки без пары в базе не сравниваются.
+    """
+    base = {result_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        ref = base.get(result_key(row))
+        if ref is None or ref[metric] <= 0:
+            continue
+        ratio = row[metric] / ref[metric] - 1.0
+        if ratio > max_regression:
+            regressions.append({"key": list(result_key(row)), "metric": metric,
+                                "baseline_ms": ref[metric], "current_ms": row[metric], "regression": ratio})
+    return regressions
+
+
+def _ints(value: str):
+    return tuple(int(v) for v in value.split(","))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NE_v1 inference latency matrix (eager/TorchScript/ONNX fp32/int8)")
+    parser.add_argument("--runtimes", default=",".join(RUNTIMES))
+    parser.add_argument("--batch-sizes", default="1,8,64")
+    parser.add_argument("--windows", default="16")
+    parser.add_argument("--hidden-sizes", default="64")
+    parser.add_argument("--threads", default="1")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default="inference_benchmark.json", help="JSON с результатами")
+    parser.add_argument("--baseline", default=None, help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="допустимый рост метрики (доля)")
+    parser.add_argument("--metric", default="p95", choices=METRICS)
+    args = parser.parse_args()
+
+    results = run_matrix(
+        runtimes=tuple(args.runtimes.split(",")),
+        batch_sizes=_ints(args.batch_sizes),
+        windows=_ints(args.windows),
+        hidden_sizes=_ints(args.hidden_sizes),
+        threads=_ints(args.threads),
+        iterations=args.iterations,
+        warmup=args.warmup,
+    )
+    with open(args.output, "w") as f:
+        json.dump({"results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.max_regression, args.metric)
+        for r in regressions:
+            print(f"REGRESSION {r['key']}: {r['metric']} {r['baseline_ms']:.3f} -> {r['current_ms']:.3f} ms "
+                  f"(+{r['regression'] * 100:.1f}%)")
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import argparse
+import numpy as np
+from core import inproc_nats
+from core.nats_logger import NATSLogger
+from benchmark.proposal_codec_benchmark import make_records
+from benchmark.inference_benchmark import latency_stats
+
+
+async def _run(batch_size: int, encoding: str, records, publish_latency_s: float, failure_rate: float,
+               max_buffer: int, consumer_delay_s: float):
+    name = f"bench_{batch_size}_{encoding}"
+    inproc_nats.remove_broker(name)
+    broker = inproc_nats.get_broker(name, publish_latency_s=publish_latency_s, publish_failure_rate=failure_rate)
+    url = inproc_nats.INPROC_SCHEME + name
+    consumer = await inproc_nats.connect(url)
+
+    async def consume(msg):
+        pass
+
+    sub = await consumer.subscribe("qiki.neural.proposals", cb=consume, max_pending=1024,
+                                   processing_delay_s=consumer_delay_s)
+    logger = NATSLogger(url, encoding=encoding, batch_size=batch_size, max_buffer=max_buffer, flush_interval_s=0.01)
+    await logger.connect()
+
+    samples = np.empty(len(records))
+    start = time.perf_counter()
+    for i, record in enumerate(records):
+        t = time.perf_counter_ns()
+        await logger.log_proposal(record)
+        samples[i] = (time.perf_counter_ns() - t) / 1e6
+    await logger.flush()
+    elapsed = time.perf_counter() - start
+    await logger.close()
+    await consumer.close()
+    inproc_nats.remove_broker(name)
+    return dict(latency_stats(samples), records_per_s=len(records) / elapsed, messages=broker.published,
+                bytes=broker.published_bytes, consumer_dropped=sub.dropped, **logger.stats())
+
+
+def benchmark_nats_logger(batch_sizes=(1, 8, 64), encodings=("json", "protobuf"), count: int = 20000,
+                          publish_latency_s: float = 0.0, failure_rate: float = 0.0, max_buffer: int = 10000,
+                          consumer_delay_s: float = 0.0):
+    """
+    Пропускная способность NATSLogger на брокере inproc: записей/с, латентность log_proposal (мс),
+    сообщения и байты на брокере, потери в буфере логгера и у медленного потребителя.
+    """
+    records = make_records(count)
+    results = {}
+    for encoding in encodings:
+        for batch_size in batch_sizes:
+            r = asyncio.run(_run(batch_size, encoding, records, publish_latency_s, failure_rate,
+                                 max_buffer, consumer_delay_s))
+            results[(encoding, batch_size)] = r
+            print(f"{encoding:9s} batch={batch_size:4d}  {r['records_per_s']:10.0f} rec/s  "
+                  f"log p50={r['p50']:.4f} p99={r['p99']:.4f} ms  messages={r['messages']:6d}  "
+                  f"bytes={r['bytes']:9d}  dropped={r['dropped']}  consumer_dropped={r['consumer_dropped']}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NATSLogger throughput on the in-process broker")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--publish-latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--consumer-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    benchmark_nats_logger(count=args.count, publish_latency_s=args.publish_latency_ms / 1000,
+                          failure_rate=args.failure_rate, consumer_delay_s=args.consumer_delay_ms / 1000)
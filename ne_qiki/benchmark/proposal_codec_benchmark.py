@@ -0,0 +1,52 @@
+import time
+import random
+from core.proposal_codec import ENCODERS, decode_payload
+from core.proposal_log_writer import proposal_record
+from shared.models import Proposal, ActuatorCommand
+
+ACTIONS = ("HOLD_POSITION", "COOLING_BOOST", "THROTTLE_DOWN", "THROTTLE_UP", "ROTATE_LEFT", "ROTATE_RIGHT")
+
+
+def make_records(count: int, seed: int = 0):
+    """Записи лога как у engine: 0..3 предложения с confidence/priority из softmax и sigmoid."""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        proposals = [
+            Proposal(f"ne_{idx}", "NeuralEngineV1", rng.uniform(0.55, 1.0), rng.random(),
+                     f"Predicted by NE_v1 for {ACTIONS[idx]}", [ActuatorCommand(ACTIONS[idx], {})])
+            for idx in rng.sample(range(len(ACTIONS)), rng.randint(0, 3))
+        ]
+        records.append(proposal_record(time.time(), rng.choice(("IDLE", "ACTIVE")), rng.random() > 0.02, proposals))
+    return records
+
+
+def benchmark_proposal_codec(count: int = 10000, iterations: int = 5):
+    """Размер и время кодирования/декодирования записи: json vs protobuf; возвращает {encoding: stats}."""
+    records = make_records(count)
+    results = {}
+    for encoding, encode in ENCODERS.items():
+        payloads = [encode(record) for record in records]
+        best_encode = best_decode = float("inf")
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            for record in records:
+                encode(record)
+            best_encode = min(best_encode, time.perf_counter_ns() - start)
+            start = time.perf_counter_ns()
+            for payload in payloads:
+                decode_payload(payload, encoding)
+            best_decode = min(best_decode, time.perf_counter_ns() - start)
+        results[encoding] = {
+            "bytes_per_record": sum(len(p) for p in payloads) / count,
+            "encode_us_per_record": best_encode / count / 1000,
+            "decode_us_per_record": best_decode / count / 1000,
+        }
+        r = results[encoding]
+        print(f"{encoding:9s} {r['bytes_per_record']:7.1f} B/record  encode {r['encode_us_per_record']:6.2f} us  "
+              f"decode {r['decode_us_per_record']:6.2f} us")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_proposal_codec()
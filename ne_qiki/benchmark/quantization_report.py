@@ -0,0 +1,89 @@
+import argparse
+import time
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from models.ne_v1 import NE_v1
+from datasets.jsonl_dataset import JSONLDataset
+from core.inference_backend import quantize_model
+
+
+def _latency_ms(model, x, mask, iterations: int):
+    samples = []
+    with torch.inference_mode():
+        for _ in range(10):
+            model(x, mask)
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            model(x, mask)
+            samples.append((time.perf_counter_ns() - start) / 1e6)
+    return {"p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95))}
+
+
+def quantization_report(dataset_path: str, model_path: str = None, window: int = 16, in_dim: int = 32,
+                        num_classes: int = 6, param_dim: int = 4, batch_size: int = 64,
+                        latency_iterations: int = 200):
+    """
+    Дрейф точности dynamic INT8 (quantize_model) относительно fp32 NE_v1 на отложенном JSONL-датасете
+    и сравнение латентности одного тика (batch 1). Плоские признаки (in_dim) повторяются на всё окно.
+    """
+    model = NE_v1(in_dim, 64, num_classes, param_dim)
+    if model_path:
+        model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    model.eval()
+    qmodel = quantize_model(model)
+
+    total = agree = fp32_correct = int8_correct = 0
+    prob_diff_sum = prob_diff_max = priority_diff_sum = params_diff_sum = 0.0
+    loader = DataLoader(JSONLDataset(dataset_path), batch_size=batch_size)
+    with torch.inference_mode():
+        for features, label, priority, params, mask in loader:
+            x = features if features.dim() == 3 else features.unsqueeze(1).repeat(1, window, 1)
+            fp_logits, fp_priority, fp_params = model(x, mask)
+            q_logits, q_priority, q_params = qmodel(x, mask)
+            fp_probs = torch.softmax(fp_logits, dim=-1)
+            q_probs = torch.softmax(q_logits, dim=-1)
+
+            total += x.size(0)
+            agree += (fp_probs.argmax(-1) == q_probs.argmax(-1)).sum().item()
+            fp32_correct += (fp_probs.argmax(-1) == label).sum().item()
+            int8_correct += (q_probs.argmax(-1) == label).sum().item()
+            prob_diff = (fp_probs - q_probs).abs()
+            prob_diff_sum += prob_diff.sum().item()
+            prob_diff_max = max(prob_diff_max, prob_diff.max().item())
+            priority_diff_sum += (fp_priority - q_priority).abs().sum().item()
+            params_diff_sum += (fp_params - q_params).abs().mean(-1).sum().item()
+
+    x = torch.zeros(1, window, in_dim)
+    mask = torch.ones(1, num_classes, dtype=torch.bool)
+    report = {
+        "samples": total,
+        "top1_agreement": agree / total,
+        "fp32_accuracy": fp32_correct / total,
+        "int8_accuracy": int8_correct / total,
+        "prob_mean_abs_diff": prob_diff_sum / (total * num_classes),
+        "prob_max_abs_diff": prob_diff_max,
+        "priority_mean_abs_diff": priority_diff_sum / total,
+        "params_mean_abs_diff": params_diff_sum / total,
+        "fp32_latency_ms": _latency_ms(model, x, mask, latency_iterations),
+        "int8_latency_ms": _latency_ms(qmodel, x, mask, latency_iterations),
+    }
+
+    print(f"Samples: {total}")
+    print(f"Top-1 agreement INT8 vs fp32: {report['top1_agreement']:.4f}")
+    print(f"Accuracy fp32 / INT8: {report['fp32_accuracy']:.4f} / {report['int8_accuracy']:.4f}")
+    print(f"Prob abs diff mean / max: {report['prob_mean_abs_diff']:.6f} / {report['prob_max_abs_diff']:.6f}")
+    print(f"Priority / params mean abs diff: {report['priority_mean_abs_diff']:.6f} / "
+          f"{report['params_mean_abs_diff']:.6f}")
+    for name in ("fp32", "int8"):
+        latency = report[f"{name}_latency_ms"]
+        print(f"{name} latency p50 / p95: {latency['p50']:.3f} / {latency['p95']:.3f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NE_v1 dynamic INT8 vs fp32 drift and latency report")
+    parser.add_argument("dataset", help="held-out JSONL dataset (tools/generate_dataset.py format)")
+    parser.add_argument("--model-path", default=None, help="fp32 weights (ne_v1.pt)")
+    args = parser.parse_args()
+    quantization_report(args.dataset, args.model_path)
@@ -0,0 +1,191 @@
+import os
+import json
+import random
+import argparse
+import contextlib
+import time
+import tracemalloc
+import yaml
+import numpy as np
+from core.metrics import STAGE_HISTOGRAMS
+from core.metrics_recorder import MetricsRecorder
+from core.neural_engine_impl import NeuralEngineV1
+from benchmark.feature_extraction_benchmark import BenchBiosStatus, BenchContext
+from benchmark.inference_benchmark import latency_stats
+
+# Стадии, которые generate_proposals_batch пишет в STAGE_HISTOGRAMS, в порядке выполнения;
+# other — остаток тика: построение предложений, передача в worker-поток и ожидание результата
+ENGINE_STAGES = ("extract", "forward", "calibrate", "topk", "log", "safety")
+STAGES = ENGINE_STAGES + ("other",)
+STATES = ("IDLE", "ACTIVE", "ACTIVE", "ACTIVE", "BOOTING", "ERROR_STATE")
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "..", "configs", "config.example.yaml")
+
+
+class StageRecorder(MetricsRecorder):
+    """
+    Direct recorder, который дополнительно суммирует время стадий текущего тика: разбивка берётся
+    из настоящего пути generate_proposals_batch (включая worker-поток), а не из его копии.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._stage_of = {id(histogram): stage for stage, histogram in STAGE_HISTOGRAMS.items()}
+        self._tick = {}
+
+    def observe(self, histogram, value: float):
+        stage = self._stage_of.get(id(histogram))
+        if stage is not None:
+            self._tick[stage] = self._tick.get(stage, 0.0) + value
+        super().observe(histogram, value)
+
+    def take(self):
+        """Время стадий (с) с предыдущего вызова. При пропуске дедлайна стадии позднего job попадут в следующий тик."""
+        tick, self._tick = self._tick, {}
+        return tick
+
+
+def load_config(path: str = DEFAULT_CONFIG):
+    """config.example.yaml (model_path в нём не задан — случайные веса) без hot reload."""
+    with open(path) as f:
+        config = yaml.safe_load(f)
+    config['hot_reload'] = dict(config.get('hot_reload', {}), watch=False)
+    return config
+
+
+def make_streams(n_agents: int, ticks: int, seed: int = 0):
+    """
+    Синтетические потоки AgentContext по agent_context.schema.json (agent_id, bios_status.ok, fsm_state, sensor_data):
+    сенсоры агента меняются случайным блужданием, FSM редко переключается, BIOS изредка падает.
+    Возвращает список тиков, каждый тик — список контекстов всех агентов.
+    """
+    rng = random.Random(seed)
+    agents = [{
+        "fsm_state": "ACTIVE",
+        "distance": rng.uniform(0, 15),
+        "velocity": rng.uniform(-8, 8),
+        "azimuth": rng.uniform(-3, 3),
+        "temperature": rng.uniform(30, 80),
+        "history": []
+    } for _ in range(n_agents)]
+    streams = []
+    for _ in range(ticks):
+        tick = []
+        for i, agent in enumerate(agents):
+            if rng.random() < 0.05:
+                agent["fsm_state"] = rng.choice(STATES)
+            agent["distance"] = min(max(agent["distance"] + rng.gauss(0, 0.3), 0.0), 15.0)
+            agent["velocity"] = min(max(agent["velocity"] + rng.gauss(0, 0.2), -8.0), 8.0)
+            agent["azimuth"] = min(max(agent["azimuth"] + rng.gauss(0, 0.05), -3.14), 3.14)
+            agent["temperature"] = min(max(agent["temperature"] + rng.gauss(0, 0.5), 0.0), 120.0)
+            agent["history"] = (agent["history"] + [rng.randint(0, 12)])[-8:]
+            tick.append(BenchContext(
+                bios_status=BenchBiosStatus(
+                    ok=rng.random() > 0.02,
+                    temperature=agent["temperature"],
+                    power_draw=rng.uniform(20, 90),
+                    utilization=rng.uniform(10, 100)
+                ),
+                fsm_state=agent["fsm_state"],
+                sensor_data={
+                    "distance": agent["distance"],
+                    "velocity": agent["velocity"],
+                    "azimuth": agent["azimuth"],
+                    "hazard_score": rng.random(),
+                    "action_history": list(agent["history"])
+                },
+                agent_id=f"agent_{i}"
+            ))
+        streams.append(tick)
+    return streams
+
+
+def benchmark_tick(config=None, n_agents: int = 1, ticks: int = 500, warmup: int = 20,
+                   alloc_ticks: int = 100, seed: int = 0, quiet_stdout: bool = True):
+    """
+    Латентность тика generate_proposals_batch end-to-end с разбивкой по стадиям (мс) из recorder движка,
+    доля тиков сверх time_budget_ms и аллокации на тик по tracemalloc (отдельный проход: трассировка
+    искажает время). alloc_peak_kb_per_tick — пик временных аллокаций тика, alloc_retained_kb_per_tick —
+    прирост удерживаемой памяти. tracemalloc видит аллокации Python и numpy всех потоков; память тензоров torch (c10 allocator)
+    в отчёт не попадает.
+    """
+    config = config or load_config()
+    recorder = StageRecorder()
+    engine = NeuralEngineV1(config, recorder=recorder)
+    if engine.streaming or engine.cache is not None:
+        engine.close()
+        raise ValueError("Tick benchmark covers the windowed path: disable streaming and cache")
+    budget_ms = config['time_budget_ms']
+    # Каждый тик потока проходит через engine ровно один раз
+    streams = make_streams(n_agents, warmup + ticks + alloc_ticks, seed)
+    samples = {stage: np.empty(ticks) for stage in STAGES}
+    totals = np.empty(ticks)
+    alloc_peak = 0
+    alloc_retained = 0
+
+    # Лог предложений пишется в stdout; по умолчанию — в /dev/null, чтобы не мерить терминал
+    with open(os.devnull, "w") as devnull, \
+            (contextlib.redirect_stdout(devnull) if quiet_stdout else contextlib.nullcontext()):
+        for contexts in streams[:warmup]:
+            engine.generate_proposals_batch(contexts)
+        recorder.take()
+
+        for i, contexts in enumerate(streams[warmup:warmup + ticks]):
+            start = time.perf_counter_ns()
+            engine.generate_proposals_batch(contexts)
+            totals[i] = (time.perf_counter_ns() - start) / 1e6
+            stage_s = recorder.take()
+            for stage in ENGINE_STAGES:
+                samples[stage][i] = stage_s.get(stage, 0.0) * 1e3
+            samples["other"][i] = totals[i] - sum(samples[stage][i] for stage in ENGINE_STAGES)
+
+        tracemalloc.start()
+        for contexts in streams[warmup + ticks:]:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            engine.generate_proposals_batch(contexts)
+            current, peak = tracemalloc.get_traced_memory()
+            alloc_peak += peak - base
+            alloc_retained += current - base
+        tracemalloc.stop()
+        engine.close()
+
+    n_alloc = max(alloc_ticks, 1)
+    report = {
+        "agents": n_agents,
+        "ticks": ticks,
+        "backend": engine.active_backend,
+        "time_budget_ms": budget_ms,
+        "stages": {stage: latency_stats(samples[stage]) for stage in STAGES},
+        "total": latency_stats(totals),
+        "over_budget": float((totals > budget_ms).mean()),
+        "alloc_peak_kb_per_tick": alloc_peak / n_alloc / 1024,
+        "alloc_retained_kb_per_tick": alloc_retained / n_alloc / 1024,
+    }
+
+    print(f"Agents: {n_agents}  ticks: {ticks}  backend: {report['backend']}  budget: {budget_ms} ms")
+    for stage in STAGES:
+        s = report["stages"][stage]
+        print(f"{stage:10s} p50={s['p50']:7.3f}  p95={s['p95']:7.3f}  p99={s['p99']:7.3f}  max={s['max']:7.3f} ms  "
+              f"share={s['mean'] / report['total']['mean'] * 100:5.1f}%")
+    s = report["total"]
+    print(f"{'total':10s} p50={s['p50']:7.3f}  p95={s['p95']:7.3f}  p99={s['p99']:7.3f}  max={s['max']:7.3f} ms")
+    print(f"Over budget: {report['over_budget'] * 100:.2f}% of ticks")
+    print(f"Alloc per tick: peak={report['alloc_peak_kb_per_tick']:.1f} KB "
+          f"retained={report['alloc_retained_kb_per_tick']:.1f} KB")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NE_v1 end-to-end tick latency with per-stage breakdown")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--agents", type=int, default=1, help="контекстов в тике (batch)")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--alloc-ticks", type=int, default=100)
+    parser.add_argument("--stdout", action="store_true", help="не подавлять JSON-лог предложений")
+    parser.add_argument("--output", default=None, help="JSON с отчётом")
+    args = parser.parse_args()
+    result = benchmark_tick(load_config(args.config), n_agents=args.agents, ticks=args.ticks,
+                            alloc_ticks=args.alloc_ticks, quiet_stdout=not args.stdout)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
@@ -1,56 +1,166 @@
 import torch
 import numpy as np
-from typing import Tuple
+from typing import Optional, Tuple
+
+
+def agent_id_of(context) -> Optional[str]:
+    """Ключ агента для per-agent состояния; None — анонимный контекст без состояния между тиками."""
+    return getattr(context, 'agent_id', None) or None
+
+
+# FSM one-hot (предполагаем 4 состояния)
+FSM_INDEX = {"BOOTING": 0, "IDLE": 1, "ACTIVE": 2, "ERROR_STATE": 3}
+# 4 FSM + 3 BIOS + 4 сенсора + 5 истории действий; остальное до in_dim — паддинг нулями
+BASE_FEATURES = 16
+
+# Нормализация признаков 4..10 (BIOS + сенсоры) для extract_batch: делитель и границы клиппинга
+_SCALE = np.array([100.0, 100.0, 100.0, 10.0, 5.0, 3.14, 1.0])
+_LOW = np.array([0.0, 0.0, 0.0, 0.0, -1.0, -1.0, 0.0])
+_HIGH = np.ones(7)
+
 
 class FeatureExtractor:
+    """
+    Векторизация AgentContext с per-agent скользящим окном.
+
+    Окно агента хранится в преаллоцированном float32 кольцевом буфере: каждый тик пишет одну
+    строку признаков (плюс её зеркальную копию), а окно отдаётся в torch через
+    torch.from_numpy без копирования. Буфер удвоенной длины (2 * window, in_dim) позволяет
+    всегда отдавать окно как непрерывный хронологический срез. Первый тик агента заполняет
+    всё окно текущими признаками.
+
+    Контексты без agent_id не получают своего буфера: их окно — текущие признаки, повторённые
+    window раз (в общем scratch-буфере, перезаписываемом следующим анонимным вызовом).
+
+    Возвращаемые тензоры разделяют память с буфером и валидны до следующего тика агента.
+    """
+
     def __init__(self, window: int = 16, in_dim: int = 32):
         self.window = window
         self.in_dim = in_dim
+        self._buffers = {}
+        self._positions = {}
+        self._scratch = np.zeros(max(in_dim, BASE_FEATURES), dtype=np.float32)
+        self._stateless = np.empty((window, in_dim), dtype=np.float32)
+        # Пример маски (допустим, первые 4 действия разрешены)
+        self._mask = torch.tensor([True, True, True, True, False, False], dtype=torch.bool).unsqueeze(0)
 
     def extract(self, context) -> Tuple[torch.Tensor, torch.Tensor]:
         """
-        Извлекает признаки из AgentContext и возвращает тензор и маску действий.
+        Извлекает признаки из AgentContext и возвращает окно (1, window, in_dim) и маску действий.
         """
-        features = []
+        self._fill(context, self._scratch)
+        window = self._window_of(agent_id_of(context), self._scratch[:self.in_dim])
+        return torch.from_numpy(window).unsqueeze(0), self._mask
 
-        # FSM one-hot (предполагаем 4 состояния)
-        fsm_map = {"BOOTING": 0, "IDLE": 1, "ACTIVE": 2, "ERROR_STATE": 3}
-        fsm_vec = np.zeros(4)
-        fsm_vec[fsm_map.get(context.fsm_state, 3)] = 1.0
-        features.extend(fsm_vec)
+    def extract_step(self, context) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Один таймстеп (1, 1, in_dim) для потокового инференса и маска действий.
+        """
+        agent_id = agent_id_of(context)
+        self._fill(context, self._scratch)
+        if agent_id is None:
+            return torch.from_numpy(self._scratch[:self.in_dim]).view(1, 1, -1), self._mask
+        buf, pos = self._push_row(agent_id, self._scratch[:self.in_dim])
+        return torch.from_numpy(buf[pos + self.window:pos + self.window + 1]).unsqueeze(0), self._mask
+
+    def extract_batch(self, contexts) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Векторизованный extract для многих контекстов: окна (B, window, in_dim) и маска (B, num_actions).
+        Поля контекстов собираются в колоночные массивы и нормализуются одним np.clip;
+        результат совпадает с последовательными вызовами extract в том же порядке.
+        При B == 1 окно агента отдаётся без копирования (валидно до его следующего тика).
+        """
+        n = len(contexts)
+        fsm = np.empty(n, dtype=np.intp)
+        raw = np.zeros((n, 7))
+        hist = np.zeros((n, 5))
+        for b, context in enumerate(contexts):
+            fsm[b] = FSM_INDEX.get(context.fsm_state, 3)
+            bios = context.bios_status
+            sensor = context.sensor_data or {}
+            raw[b] = (
+                getattr(bios, 'temperature', 0),
+                getattr(bios, 'power_draw', 0),
+                getattr(bios, 'utilization', 0),
+                sensor.get("distance", 0.0),
+                sensor.get("velocity", 0.0),
+                sensor.get("azimuth", 0.0),
+                sensor.get("hazard_score", 0.0),
+            )
+            tail = sensor.get("action_history", [])[-5:]
+            hist[b, :len(tail)] = tail
+
+        rows = np.zeros((n, max(self.in_dim, BASE_FEATURES)))
+        rows[np.arange(n), fsm] = 1.0
+        rows[:, 4:11] = np.clip(raw / _SCALE, _LOW, _HIGH)
+        rows[:, 11:16] = np.clip(hist / 10.0, 0.0, 1.0)
+        rows = rows[:, :self.in_dim].astype(np.float32)
+
+        if n == 1:
+            return torch.from_numpy(self._window_of(agent_id_of(contexts[0]), rows[0])).unsqueeze(0), self._mask
+
+        windows = np.empty((n, self.window, self.in_dim), dtype=np.float32)
+        for b, context in enumerate(contexts):
+            agent_id = agent_id_of(context)
+            if agent_id is None:
+                windows[b] = rows[b]
+            else:
+                buf, pos = self._push_row(agent_id, rows[b])
+                windows[b] = buf[pos + 1:pos + 1 + self.window]
+        return torch.from_numpy(windows), self._mask.repeat(n, 1)
+
+    def reset(self, agent_id: str = None):
+        """Забывает окно одного агента или всех агентов."""
+        if agent_id is None:
+            self._buffers.clear()
+            self._positions.clear()
+        else:
+            self._buffers.pop(agent_id, None)
+            self._positions.pop(agent_id, None)
+
+    def _window_of(self, agent_id: Optional[str], row: np.ndarray):
+        """Окно (window, in_dim) для строки признаков: из буфера агента или повтор строки для анонимного."""
+        if agent_id is None:
+            self._stateless[:] = row
+            return self._stateless
+        buf, pos = self._push_row(agent_id, row)
+        return buf[pos + 1:pos + 1 + self.window]
+
+    def _push_row(self, agent_id: str, row: np.ndarray):
+        buf = self._buffers.get(agent_id)
+        if buf is None:
+            buf = np.empty((2 * self.window, self.in_dim), dtype=np.float32)
+            buf[:] = row
+            self._buffers[agent_id] = buf
+            pos = self.window - 1
+        else:
+            pos = (self._positions[agent_id] + 1) % self.window
+            buf[pos] = row
+            buf[pos + self.window] = row
+        self._positions[agent_id] = pos
+        return buf, pos
+
+    def _fill(self, context, out: np.ndarray):
+        out[:] = 0.0
+
+        # FSM one-hot
+        out[FSM_INDEX.get(context.fsm_state, 3)] = 1.0
 
         # BIOS статусы: температура, питание, utilization
         bios = context.bios_status
-        features.extend([
-            min(1.0, max(0.0, getattr(bios, 'temperature', 0) / 100.0)),
-            min(1.0, max(0.0, getattr(bios, 'power_draw', 0) / 100.0)),
-            min(1.0, max(0.0, getattr(bios, 'utilization', 0) / 100.0))
-        ])
+        out[4] = min(1.0, max(0.0, getattr(bios, 'temperature', 0) / 100.0))
+        out[5] = min(1.0, max(0.0, getattr(bios, 'power_draw', 0) / 100.0))
+        out[6] = min(1.0, max(0.0, getattr(bios, 'utilization', 0) / 100.0))
 
         # Sensor data
         sensor = context.sensor_data or {}
-        features.extend([
-            min(1.0, max(0.0, sensor.get("distance", 0.0) / 10.0)),
-            min(1.0, max(-1.0, sensor.get("velocity", 0.0) / 5.0)),
-            min(1.0, max(-1.0, sensor.get("azimuth", 0.0) / 3.14)),
-            min(1.0, max(0.0, sensor.get("hazard_score", 0.0)))
-        ])
+        out[7] = min(1.0, max(0.0, sensor.get("distance", 0.0) / 10.0))
+        out[8] = min(1.0, max(-1.0, sensor.get("velocity", 0.0) / 5.0))
+        out[9] = min(1.0, max(-1.0, sensor.get("azimuth", 0.0) / 3.14))
+        out[10] = min(1.0, max(0.0, sensor.get("hazard_score", 0.0)))
 
         # Action history
         hist = sensor.get("action_history", [])
-        hist_vec = np.zeros(5)
         for i, act in enumerate(hist[-5:]):
-            hist_vec[i] = min(1.0, max(0.0, act / 10.0))
-        features.extend(hist_vec)
-
-        # Паддинг до in_dim
-        while len(features) < self.in_dim:
-            features.append(0.0)
-
-        # Тензор окна (T, in_dim)
-        tensor = torch.tensor(features[:self.in_dim], dtype=torch.float32).unsqueeze(0).repeat(self.window, 1).unsqueeze(0)
-
-        # Пример маски (допустим, первые 4 действия разрешены)
-        mask = torch.tensor([True, True, True, True, False, False], dtype=torch.bool).unsqueeze(0)
-
-        return tensor, mask
+            out[11 + i] = min(1.0, max(0.0, act / 10.0))
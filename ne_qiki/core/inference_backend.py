@@ -0,0 +1,124 @@
+import torch
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch_int8"
+BACKEND_ONNX_FP32 = "onnx_fp32"
+BACKEND_ONNX_INT8 = "onnx_int8"
+
+# Пути по умолчанию совпадают с артефактами train_bc.py
+DEFAULT_ONNX_PATHS = {
+    BACKEND_ONNX_FP32: "ne_v1.onnx",
+    BACKEND_ONNX_INT8: "ne_v1_int8.onnx",
+}
+
+
+COMPILE_NONE = "none"
+COMPILE_TORCHSCRIPT = "torchscript"
+COMPILE_TORCH_COMPILE = "torch_compile"
+
+
+class TorchBackend:
+    """PyTorch NE_v1 (fp32 или dynamic INT8), eager или скомпилированная; инференс в torch.inference_mode()."""
+
+    def __init__(self, model, name: str = BACKEND_TORCH):
+        self.model = model
+        self.name = name
+
+    def run(self, tensor: torch.Tensor, mask: torch.Tensor):
+        with torch.inference_mode():
+            return self.model(tensor, mask)
+
+    def run_step(self, tensor: torch.Tensor, mask: torch.Tensor, hidden: torch.Tensor):
+        # Без графа autograd: hidden переживает тик и не должен тянуть за собой историю вычислений
+        with torch.inference_mode():
+            return self.model.forward_step(tensor, mask, hidden)
+
+
+def quantize_model(model):
+    """Динамическая INT8-квантизация PyTorch: GRU и головы class/priority/param (веса qint8)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.GRU, torch.nn.Linear}, dtype=torch.qint8)
+
+
+def compile_model(model, mode: str, window: int, in_dim: int, num_classes: int):
+    """Компилирует NE_v1 (forward и forward_step) через TorchScript или torch.compile."""
+    if mode in (None, COMPILE_NONE):
+        return model
+    if mode == COMPILE_TORCHSCRIPT:
+        mask = torch.ones(1, num_classes, dtype=torch.bool)
+        hidden = torch.zeros(model.gru.num_layers, 1, model.gru.hidden_size)
+        with torch.no_grad():
+            return torch.jit.trace_module(model, {
+                'forward': (torch.zeros(1, window, in_dim), mask),
+                'forward_step': (torch.zeros(1, 1, in_dim), mask, hidden),
+            })
+    if mode == COMPILE_TORCH_COMPILE:
+        compiled = torch.compile(model)
+        compiled.forward_step = torch.compile(model.forward_step)
+        return compiled
+    raise ValueError(f"Unknown compile mode: {mode}")
+
+
+class OnnxBackend:
+    """NE_v1, экспортированная в ONNX, через onnxruntime.InferenceSession (сессия создаётся один раз)."""
+
+    def __init__(self, model_path: str, name: str, intra_op_num_threads: int = 1, inter_op_num_threads: int = 1):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_num_threads
+        options.inter_op_num_threads = inter_op_num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.model_path = model_path
+        self.name = name
+
+    def run(self, tensor: torch.Tensor, mask: torch.Tensor):
+        logits, priority, params = self.session.run(
+            None, {"input": tensor.numpy(), "mask": mask.numpy()}
+        )
+        return torch.from_numpy(logits), torch.from_numpy(priority), torch.from_numpy(params)
+
+
+def export_onnx(model, path: str, window: int, in_dim: int, num_classes: int, opset_version: int = 11):
+    """Экспорт NE_v1 в ONNX с теми же именами входов/выходов и динамическими осями, что и train_bc.py."""
+    args = (torch.zeros(1, window, in_dim), torch.ones(1, num_classes, dtype=torch.bool))
+    kwargs = dict(
+        export_params=True,
+        opset_version=opset_version,
+        do_constant_folding=True,
+        input_names=["input", "mask"],
+        output_names=["logits", "priority", "params"],
+        dynamic_axes={
+            "input": {0: "batch", 1: "time"},
+            "mask": {0: "batch"},
+            "logits": {0: "batch"},
+            "priority": {0: "batch"},
+            "params": {0: "batch"}
+        }
+    )
+    model.eval()
+    try:
+        # Новые версии torch по умолчанию используют dynamo-экспортёр; нужен TorchScript-экспорт
+        torch.onnx.export(model, args, path, dynamo=False, **kwargs)
+    except TypeError:
+        torch.onnx.export(model, args, path, **kwargs)
+
+
+def create_backend(config, model):
+    """Создаёт backend инференса по ключу `backend` конфигурации (по умолчанию — torch)."""
+    name = config.get('backend', BACKEND_TORCH)
+    if name in (BACKEND_TORCH, BACKEND_TORCH_INT8):
+        if name == BACKEND_TORCH_INT8:
+            model = quantize_model(model)
+        compiled = compile_model(model, config.get('compile', COMPILE_NONE),
+                                 config['window'], config['in_dim'], config['num_classes'])
+        return TorchBackend(compiled, name)
+    if name in DEFAULT_ONNX_PATHS:
+        onnx_cfg = config.get('onnx', {})
+        path_key = 'fp32_path' if name == BACKEND_ONNX_FP32 else 'int8_path'
+        return OnnxBackend(
+            onnx_cfg.get(path_key, DEFAULT_ONNX_PATHS[name]),
+            name,
+            intra_op_num_threads=onnx_cfg.get('intra_op_num_threads', 1),
+            inter_op_num_threads=onnx_cfg.get('inter_op_num_threads', 1),
+        )
+    raise ValueError(f"Unknown inference backend: {name}")
@@ -0,0 +1,196 @@
+import asyncio
+import random
+from dataclasses import dataclass
+
+INPROC_SCHEME = "inproc://"
+
+_BROKERS = {}
+
+
+class BrokerError(ConnectionError):
+    """Брокер недоступен, соединение закрыто или внедрён сбой publish."""
+
+
+@dataclass
+class Msg:
+    subject: str
+    data: bytes
+
+
+def _matches(pattern: str, subject: str) -> bool:
+    """Сопоставление subject NATS: `*` — один токен, `>` — один и более токенов в конце."""
+    p_tokens = pattern.split(".")
+    s_tokens = subject.split(".")
+    for i, token in enumerate(p_tokens):
+        if token == ">":
+            return len(s_tokens) > i
+        if i >= len(s_tokens) or (token != "*" and token != s_tokens[i]):
+            return False
+    return len(p_tokens) == len(s_tokens)
+
+
+class Subscription:
+    """
+    Подписка с ограниченной очередью (max_pending). Переполнение — как slow consumer в NATS:
+    новое сообщение отбрасывается и считается в dropped. С cb сообщения обрабатываются фоновой
+    задачей с задержкой processing_delay_s на сообщение; без cb — читаются через next_msg().
+    """
+
+    def __init__(self, client, subject: str, cb=None, max_pending: int = 65536, processing_delay_s: float = 0.0):
+        self.client = client
+        self.subject = subject
+        self.processing_delay_s = processing_delay_s
+        self.received = 0
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._task = asyncio.get_running_loop().create_task(self._dispatch(cb)) if cb is not None else None
+
+    def _deliver(self, msg: Msg):
+        try:
+            self._queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def next_msg(self, timeout: float = 1.0) -> Msg:
+        msg = await asyncio.wait_for(self._queue.get(), timeout)
+        self.received += 1
+        return msg
+
+    async def _dispatch(self, cb):
+        while True:
+            msg = await self._queue.get()
+            self.received += 1
+            if self.processing_delay_s:
+                await asyncio.sleep(self.processing_delay_s)
+            await cb(msg)
+
+    async def unsubscribe(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.client.broker._subscriptions.remove(self)
+
+
+class Client:
+    """Клиент с поверхностью nats-py, которой пользуется NATSLogger: publish, subscribe, flush, close."""
+
+    def __init__(self, broker, closed_cb=None):
+        self.broker = broker
+        self._closed_cb = closed_cb
+        self._connected = True
+        self._closed = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected and not self._closed
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    async def publish(self, subject: str, payload: bytes = b""):
+        await self.broker._publish(self, subject, payload)
+
+    async def subscribe(self, subject: str, cb=None, max_pending: int = 65536, processing_delay_s: float = 0.0):
+        sub = Subscription(self, subject, cb, max_pending, processing_delay_s)
+        self.broker._subscriptions.append(sub)
+        return sub
+
+    async def flush(self, timeout: float = 1.0):
+        if not self.is_connected:
+            raise BrokerError("connection closed")
+
+    async def drain(self):
+        await self.close()
+
+    async def close(self):
+        await self._shutdown()
+
+    async def _shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._connected = False
+        self.broker._clients.discard(self)
+        for sub in [s for s in self.broker._subscriptions if s.client is self]:
+            await sub.unsubscribe()
+        if self._closed_cb is not None:
+            await self._closed_cb()
+
+
+class InProcessBroker:
+    """
+    Брокер NATS в памяти процесса для тестов и нагрузочных прогонов NATSLogger без сервера.
+    Внедряемые сбои: publish_latency_s (задержка каждого publish), publish_failure_rate (доля
+    publish, завершающихся ошибкой), fail_connects (столько следующих connect отклоняются),
+    down (брокер недоступен: connect и publish падают), disconnect_all() — разрыв всех клиентов.
+    """
+
+    def __init__(self, name: str = "default", publish_latency_s: float = 0.0, publish_failure_rate: float = 0.0,
+                 seed: int = 0):
+        self.name = name
+        self.publish_latency_s = publish_latency_s
+        self.publish_failure_rate = publish_failure_rate
+        self.fail_connects = 0
+        self.down = False
+        self.connects = 0
+        self.published = 0
+        self.published_bytes = 0
+        self.failed_publishes = 0
+        self._rng = random.Random(seed)
+        self._clients = set()
+        self._subscriptions = []
+
+    async def connect(self, url: str = None, closed_cb=None, **kwargs) -> Client:
+        if self.down or self.fail_connects > 0:
+            self.fail_connects = max(self.fail_connects - 1, 0)
+            raise BrokerError(f"inproc broker {self.name} unavailable")
+        self.connects += 1
+        client = Client(self, closed_cb)
+        self._clients.add(client)
+        return client
+
+    async def disconnect_all(self, keep=()):
+        """
+        Обрыв соединений (кроме клиентов из keep): клиенты закрываются, их closed_cb вызываются —
+        как после исчерпания собственных попыток переподключения nats-py.
+        """
+        for client in list(self._clients):
+            if client not in keep:
+                await client._shutdown()
+
+    async def _publish(self, client: Client, subject: str, payload: bytes):
+        if self.publish_latency_s:
+            await asyncio.sleep(self.publish_latency_s)
+        if self.down or not client.is_connected:
+            self.failed_publishes += 1
+            raise BrokerError("connection closed")
+        if self.publish_failure_rate and self._rng.random() < self.publish_failure_rate:
+            self.failed_publishes += 1
+            raise BrokerError("injected publish failure")
+        self.published += 1
+        self.published_bytes += len(payload)
+        msg = Msg(subject, payload)
+        for sub in self._subscriptions:
+            if _matches(sub.subject, subject):
+                sub._deliver(msg)
+
+
+def get_broker(name: str = "default", **options) -> InProcessBroker:
+    """Брокер по имени (inproc://<name>); создаётся при первом обращении с заданными опциями."""
+    broker = _BROKERS.get(name)
+    if broker is None:
+        broker = _BROKERS[name] = InProcessBroker(name, **options)
+    return broker
+
+
+def remove_broker(name: str = "default"):
+    _BROKERS.pop(name, None)
+
+
+async def connect(url: str, closed_cb=None, **kwargs) -> Client:
+    """Аналог nats.connect для адресов inproc://<name>."""
+    return await get_broker(url[len(INPROC_SCHEME):] or "default").connect(url, closed_cb=closed_cb, **kwargs)
@@ -6,3 +6,56 @@ ACTIVE_PROPOSALS = Gauge('ne_active_proposals', 'Number of active proposals gene
 AVG_CONFIDENCE = Gauge('ne_avg_confidence', 'Average confidence of proposals')
 SAFETY_BLOCKS = Counter('ne_safety_blocks_total', 'Total safety blocks')
 DEGRADATIONS = Counter('ne_degradation_to_rule', 'Total degradations to rule engine')
+
+# Латентность стадий тика; бакеты рассчитаны на работу в пределах бюджета 8-10 мс
+STAGES = ("extract", "forward", "calibrate", "topk", "safety", "log")
+STAGE_LATENCY = Histogram(
+    'ne_stage_duration_seconds', 'Latency of one generate_proposals stage', ['stage'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.004, 0.006, 0.008, 0.01, 0.025)
+)
+# Дочерние серии по стадиям создаются один раз: labels() на каждом тике — лишний lookup под lock
+STAGE_HISTOGRAMS = {stage: STAGE_LATENCY.labels(stage=stage) for stage in STAGES}
+
+# Request coalescer: размер собранного батча и ожидание запроса в очереди до forward
+COALESCER_BATCH_SIZE = Histogram(
+    'ne_coalescer_batch_size', 'Number of requests coalesced into one batched forward',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+COALESCER_QUEUE_WAIT = Histogram(
+    'ne_coalescer_queue_wait_seconds', 'Time a request waits in the coalescer before its batch runs',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025)
+)
+
+# Кэш результатов инференса (InferenceCache)
+CACHE_HITS = Counter('ne_cache_hits_total', 'Inference cache hits')
+CACHE_MISSES = Counter('ne_cache_misses_total', 'Inference cache misses')
+CACHE_EVICTIONS = Counter('ne_cache_evictions_total', 'Inference cache evictions', ['reason'])
+CACHE_EVICTION_COUNTERS = {reason: CACHE_EVICTIONS.labels(reason=reason) for reason in ("ttl", "size")}
+
+# Hot reload модели: результат, загрузка+прогрев в фоне и пауза на подмену между тиками
+MODEL_RELOADS = Counter('ne_model_reloads_total', 'Model hot reloads', ['result'])
+MODEL_RELOAD_DURATION = Histogram('ne_model_reload_duration_seconds', 'Background load, warmup and smoke check time')
+MODEL_SWAP_DURATION = Histogram(
+    'ne_model_swap_duration_seconds', 'Time the inference worker is paused to swap in a reloaded model',
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+)
+
+# Фоновый writer лога предложений (ProposalLogWriter)
+PROPOSAL_LOG_WRITTEN = Counter('ne_proposal_log_written_total', 'Proposal log records written to sinks')
+PROPOSAL_LOG_DROPPED = Counter(
+    'ne_proposal_log_dropped_total', 'Proposal log records dropped because the queue was full', ['policy']
+)
+PROPOSAL_LOG_FLUSH_DURATION = Histogram(
+    'ne_proposal_log_flush_duration_seconds', 'Serialization and sink write time per proposal log batch',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+
+# NATSLogger: опубликованные записи, буфер на время разрыва, потери и время публикации пачки
+NATS_PUBLISHED = Counter('ne_nats_published_total', 'Proposal log records published to NATS')
+NATS_BUFFERED = Gauge('ne_nats_buffered', 'Proposal log records buffered in NATSLogger awaiting publish')
+NATS_DROPPED = Counter('ne_nats_dropped_total', 'Proposal log records dropped because the NATS buffer was full')
+NATS_FLUSH_DURATION = Histogram(
+    'ne_nats_flush_duration_seconds', 'Time to publish one NATS message (single record or batch)',
+    buckets=(0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+)
+NATS_RECONNECTS = Counter('ne_nats_reconnects_total', 'Successful NATSLogger reconnects after an outage')
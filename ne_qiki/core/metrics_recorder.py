@@ -0,0 +1,107 @@
+import threading
+from collections import deque
+
+MODE_DIRECT = "direct"
+MODE_ACCUMULATE = "accumulate"
+
+_OBSERVE = 0
+_INC = 1
+_SET = 2
+
+
+class MetricsRecorder:
+    """
+    Обновления Prometheus-метрик из горячего пути. direct — сразу в метрику (lock внутри prometheus_client).
+    accumulate — в deque своего потока (append без блокировок); фоновый поток раз в flush_interval_s
+    переносит накопленное в метрики, так что тик не платит за lock и обновление бакетов.
+    """
+
+    def __init__(self, mode: str = MODE_DIRECT, flush_interval_s: float = 1.0):
+        if mode not in (MODE_DIRECT, MODE_ACCUMULATE):
+            raise ValueError(f"Unknown metrics mode: {mode}")
+        self.mode = mode
+        self.flush_interval_s = flush_interval_s
+        self._local = threading.local()
+        self._buffers = []
+        self._register_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if mode == MODE_ACCUMULATE:
+            self._thread = threading.Thread(target=self._run, name="ne-metrics", daemon=True)
+            self._thread.start()
+
+    def observe(self, histogram, value: float):
+        if self._thread is None:
+            histogram.observe(value)
+        else:
+            self._buffer().append((_OBSERVE, histogram, value))
+
+    def inc(self, counter, amount: float = 1):
+        if self._thread is None:
+            counter.inc(amount)
+        else:
+            self._buffer().append((_INC, counter, amount))
+
+    def set(self, gauge, value: float):
+        if self._thread is None:
+            gauge.set(value)
+        else:
+            self._buffer().append((_SET, gauge, value))
+
+    def flush(self):
+        """Переносит накопленное всеми потоками в метрики (в порядке записи внутри потока)."""
+        with self._register_lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            while True:
+                try:
+                    kind, metric, value = buffer.popleft()
+                except IndexError:
+                    break
+                if kind == _OBSERVE:
+                    metric.observe(value)
+                elif kind == _INC:
+                    metric.inc(value)
+                else:
+                    metric.set(value)
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=max(1.0, 2 * self.flush_interval_s))
+            self.flush()
+
+    def _buffer(self) -> deque:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = deque()
+            with self._register_lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+
+
+class NullRecorder(MetricsRecorder):
+    """Отбрасывает обновления: служебные проходы (проба готовности) не попадают в экспортируемые метрики."""
+
+    def observe(self, histogram, value: float):
+        pass
+
+    def inc(self, counter, amount: float = 1):
+        pass
+
+    def set(self, gauge, value: float):
+        pass
+
+
+# Общий recorder для компонентов, которым engine не передал свой (SafetyShield вне engine)
+DIRECT = MetricsRecorder()
+NULL = NullRecorder()
+
+
+def create_recorder(config) -> MetricsRecorder:
+    metrics_cfg = config.get('metrics', {})
+    return MetricsRecorder(metrics_cfg.get('mode', MODE_DIRECT), metrics_cfg.get('flush_interval_s', 1.0))
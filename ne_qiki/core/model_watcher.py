@@ -0,0 +1,52 @@
+import os
+import threading
+
+
+class ModelWatcher:
+    """
+    Следит за файлом модели (mtime/size) и запускает NeuralEngineV1.reload_model при его замене.
+    Перезагрузка стартует, когда файл не менялся в течение одного интервала опроса,
+    чтобы не читать модель, которую ещё копируют.
+    """
+
+    def __init__(self, engine, model_path: str, interval_s: float = 1.0):
+        self.engine = engine
+        self.model_path = model_path
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded = self._signature()
+        self._pending = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ne-model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def poll(self):
+        """Одна проверка файла; возвращает Future перезагрузки, если она запущена."""
+        signature = self._signature()
+        if signature is None or signature == self._loaded:
+            self._pending = None
+            return None
+        if signature != self._pending:
+            self._pending = signature
+            return None
+        self._loaded = signature
+        self._pending = None
+        return self.engine.reload_model(self.model_path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.poll()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
@@ -1,25 +1,170 @@
-import json
+import time
 import asyncio
+from collections import deque
 import nats
+from core import inproc_nats
+from core.metrics import NATS_PUBLISHED, NATS_BUFFERED, NATS_DROPPED, NATS_FLUSH_DURATION, NATS_RECONNECTS
+from core.proposal_codec import ENCODERS, BATCH_SEPARATORS, ENCODING_JSON
+
+
+class _Outbox:
+    """Буфер одного subject: закодированные записи и их суммарный размер."""
+
+    def __init__(self, subject: str, encoding: str):
+        if encoding not in ENCODERS:
+            raise ValueError(f"Unknown proposal encoding for {subject}: {encoding}")
+        self.subject = subject
+        self.encode = ENCODERS[encoding]
+        self.separator = BATCH_SEPARATORS[encoding]
+        self.records = deque()
+        self.size = 0
+
 
 class NATSLogger:
-    def __init__(self, nats_url="nats://localhost:4222"):
+    """
+    Публикация логов предложений в NATS. Записи копятся в ограниченном буфере (max_buffer, при переполнении
+    вытесняются самые старые) и уходят пачками: batch_size записей, max_batch_bytes байт или раз в
+    flush_interval_s — одним сообщением. batch_size=1 — сообщение на запись, как раньше.
+    Кодировка задаётся для каждого subject (subjects: {subject: json | protobuf}): json — JSON Lines,
+    protobuf — length-delimited qiki.mind.Proposal (core.proposal_codec). Запись публикуется во все subjects.
+    Пока соединения нет (не удалось подключиться или клиент закрылся), записи буферизуются, а
+    подключение повторяется с экспоненциальной задержкой.
+    """
+
+    def __init__(self, nats_url="nats://localhost:4222", subject: str = "qiki.neural.proposals",
+                 encoding: str = ENCODING_JSON, subjects: dict = None, batch_size: int = 1,
+                 max_batch_bytes: int = 64 * 1024, flush_interval_s: float = 0.05, max_buffer: int = 10000,
+                 reconnect_interval_s: float = 0.5, max_reconnect_interval_s: float = 10.0):
         self.nats_url = nats_url
+        self._outboxes = [_Outbox(name, enc) for name, enc in (subjects or {subject: encoding}).items()]
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval_s = flush_interval_s
+        self.max_buffer = max_buffer
+        self.reconnect_interval_s = reconnect_interval_s
+        self.max_reconnect_interval_s = max_reconnect_interval_s
         self.nc = None
+        self.published = 0
+        self.dropped = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._reconnect_task = None
+        self._closed = False
 
     async def connect(self):
         try:
-            self.nc = await nats.connect(self.nats_url)
+            self.nc = await self._open()
         except Exception as e:
             print(f"[NATS] Connection failed: {e}")
+            self._schedule_reconnect()
+            return
+        self._on_connected()
+        await self.flush()
 
     async def log_proposal(self, proposal_data):
-        if self.nc:
+        full = False
+        for outbox in self._outboxes:
+            record = outbox.encode(proposal_data)
+            if not record:
+                continue
+            self._enqueue(outbox, record)
+            full = full or len(outbox.records) >= self.batch_size or outbox.size >= self.max_batch_bytes
+        if full and self.connected:
+            await self.flush()
+
+    @property
+    def connected(self) -> bool:
+        return self.nc is not None and self.nc.is_connected
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(outbox.records) for outbox in self._outboxes)
+
+    def stats(self) -> dict:
+        return {"published": self.published, "buffered": self.buffered, "dropped": self.dropped}
+
+    async def flush(self):
+        """Отправляет всё накопленное пачками; при ошибке пачка возвращается в начало буфера."""
+        async with self._flush_lock:
+            for outbox in self._outboxes:
+                await self._flush_outbox(outbox)
+            NATS_BUFFERED.set(self.buffered)
+
+    async def _flush_outbox(self, outbox: _Outbox):
+        pending = outbox.records
+        while pending and self.connected:
+            batch = [pending.popleft()]
+            size = len(batch[0])
+            while pending and len(batch) < self.batch_size and size + len(pending[0]) <= self.max_batch_bytes:
+                size += len(pending[0])
+                batch.append(pending.popleft())
+            outbox.size -= size
+            start = time.perf_counter()
             try:
-                await self.nc.publish("qiki.neural.proposals", json.dumps(proposal_data).encode())
+                await self.nc.publish(outbox.subject, outbox.separator.join(batch))
             except Exception as e:
                 print(f"[NATS] Publish failed: {e}")
+                pending.extendleft(reversed(batch))
+                outbox.size += size
+                return
+            NATS_FLUSH_DURATION.observe(time.perf_counter() - start)
+            self.published += len(batch)
+            NATS_PUBLISHED.inc(len(batch))
 
     async def close(self):
+        self._closed = True
+        for task in (self._flush_task, self._reconnect_task):
+            if task is not None:
+                task.cancel()
         if self.nc:
+            await self.flush()
             await self.nc.close()
+
+    async def _open(self):
+        # inproc://<name> — брокер в памяти процесса (core.inproc_nats) для тестов и нагрузочных прогонов
+        if self.nats_url.startswith(inproc_nats.INPROC_SCHEME):
+            return await inproc_nats.connect(self.nats_url, closed_cb=self._on_closed)
+        return await nats.connect(self.nats_url, closed_cb=self._on_closed)
+
+    def _enqueue(self, outbox: _Outbox, record: bytes):
+        if len(outbox.records) >= self.max_buffer:
+            outbox.size -= len(outbox.records.popleft())
+            self.dropped += 1
+            NATS_DROPPED.inc()
+        outbox.records.append(record)
+        outbox.size += len(record)
+
+    def _on_connected(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _on_closed(self):
+        # Клиент nats исчерпал собственные попытки переподключения — продолжаем сами
+        if not self._closed:
+            self.nc = None
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._closed or (self._reconnect_task is not None and not self._reconnect_task.done()):
+            return
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        delay = self.reconnect_interval_s
+        while not self._closed and self.nc is None:
+            await asyncio.sleep(delay)
+            try:
+                self.nc = await self._open()
+            except Exception:
+                delay = min(delay * 2, self.max_reconnect_interval_s)
+                continue
+            NATS_RECONNECTS.inc()
+            print(f"[NATS] Reconnected to {self.nats_url}, {self.buffered} buffered records")
+            self._on_connected()
+            await self.flush()
+
+    async def _flush_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval_s)
+            if self.buffered:
+                await self.flush()
@@ -1,85 +1,443 @@
 import time
-import json
 from typing import List
 import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from core.interfaces import INeuralEngine
 from shared.models import Proposal, ActuatorCommand
 from models.ne_v1 import NE_v1
-from core.feature_extractor import FeatureExtractor
+from core.feature_extractor import FeatureExtractor, agent_id_of
 from core.calibration import Calibration
+from core.inference_backend import create_backend, DEFAULT_ONNX_PATHS
+from core.metrics_recorder import NULL, create_recorder
+from core.model_watcher import ModelWatcher
+from core.result_cache import create_cache
 from core.safety import SafetyShield
-from core.metrics import INFERENCE_COUNT, INFERENCE_LATENCY
+from core.metrics import (
+    INFERENCE_COUNT, INFERENCE_LATENCY, DEGRADATIONS, ACTIVE_PROPOSALS, AVG_CONFIDENCE, STAGE_HISTOGRAMS,
+    MODEL_RELOADS, MODEL_RELOAD_DURATION, MODEL_SWAP_DURATION
+)
 from core.nats_logger import NATSLogger
+from core.proposal_log_writer import create_log_writer
 import torch
 
+
+def _spawn(coro):
+    """Планирует корутину в активном event loop; без loop (sync-вызовы, тесты) — пропускает."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coro.close()
+        return None
+    return loop.create_task(coro)
+
+
+# С какого размера батча векторизованный extract_batch быстрее поконтекстного extract
+BATCH_EXTRACT_MIN = 4
+# Переходы FSM в эти состояния сбрасывают скрытое состояние GRU агента
+STREAM_RESET_STATES = ("BOOTING", "ERROR_STATE")
+
+
 class NeuralEngineV1(INeuralEngine):
-    def __init__(self, config):
-        self.model = NE_v1(config['in_dim'], 64, config['num_classes'], config['param_dim'])
+    def __init__(self, config, recorder=None):
+        self.ready = False
+        self.warmup_ms = None
+        self.last_inference_ms = None
+        self.model_version = 1
+        self.model, self.backend = self._load_model(config)
+        print(f"[NE] Inference backend: {self.backend.name}")
         self.extractor = FeatureExtractor(config['window'], config['in_dim'])
         self.calibrator = Calibration(config['calibration']['temperature'])
-        self.safety = SafetyShield(config['action_catalog'])
+        # recorder по умолчанию — из секции `metrics`; свой передают бенчмарки и проба готовности
+        self.recorder = recorder if recorder is not None else create_recorder(config)
+        self.safety = SafetyShield(config['action_catalog'], recorder=self.recorder)
         self.config = config
-        self.nats_logger = NATSLogger()
-        asyncio.create_task(self.nats_logger.connect())
+        # Шаблоны предложений по индексу действия: (proposal_id, имя действия, justification)
+        self._templates = [
+            (f"ne_{idx}", action['name'], f"Predicted by NE_v1 for {action['name']}")
+            for idx, action in enumerate(config['action_catalog']['actions'])
+        ]
+        self.streaming = config.get('streaming', False)
+        if self.streaming and not hasattr(self.backend, 'run_step'):
+            raise ValueError(f"Streaming inference requires the torch backend, got {self.backend.name}")
+        self.cache = create_cache(config, self.recorder)
+        if self.streaming and self.cache is not None:
+            raise ValueError("Inference cache cannot be combined with streaming: outputs depend on hidden state")
+        self._hidden = {}
+        self._last_fsm_state = {}
+        self._last_good = {}
+        # Инференс выполняется в выделенном worker-потоке, тик ждёт его не дольше time_budget_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ne-inference")
+        # Загрузка и прогрев новой модели при hot reload — в отдельном фоновом потоке
+        self._reload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ne-reload")
+        self.nats_logger = NATSLogger(**config.get('nats', {}))
+        _spawn(self.nats_logger.connect())
+        self.log_writer = create_log_writer(config, self.nats_logger)
+        self.warmup()
+        self.model_watcher = None
+        hot_reload_cfg = config.get('hot_reload', {})
+        if hot_reload_cfg.get('watch'):
+            self.model_watcher = ModelWatcher(self, self.model_path, hot_reload_cfg.get('interval_s', 1.0))
+            self.model_watcher.start()
+
+    def warmup(self):
+        """
+        Прогревочные проходы backend на сконфигурированных окне и размерах батча, чтобы ленивая
+        инициализация (аллокаторы, JIT, сессия ONNX) не попадала в тик. По завершении engine готов.
+        """
+        warmup_cfg = self.config.get('warmup', {})
+        iterations = warmup_cfg.get('iterations', 0)
+        start = time.perf_counter()
+        # Прогрев идёт в том же worker-потоке, что и инференс
+        self._executor.submit(
+            self._warmup_passes, self.model, self.backend, warmup_cfg.get('batch_sizes', [1]), iterations
+        ).result()
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        self.ready = True
+        print(f"[NE] Ready: warmup {iterations} iterations in {self.warmup_ms:.2f} ms")
+
+    def _warmup_passes(self, model, backend, batch_sizes, iterations: int):
+        for batch_size in batch_sizes:
+            mask = torch.ones(batch_size, self.config['num_classes'], dtype=torch.bool)
+            for _ in range(iterations):
+                if self.streaming:
+                    hidden = torch.zeros(model.gru.num_layers, batch_size, model.gru.hidden_size)
+                    backend.run_step(torch.zeros(batch_size, 1, self.config['in_dim']), mask, hidden)
+                else:
+                    backend.run(torch.zeros(batch_size, self.config['window'], self.config['in_dim']), mask)
+
+    def _load_model(self, config):
+        model = NE_v1(config['in_dim'], 64, config['num_classes'], config['param_dim'])
+        if config.get('model_path'):
+            model.load_state_dict(torch.load(config['model_path'], map_location='cpu'))
+        model.eval()
+        return model, create_backend(config, model)
+
+    def reload_model(self, model_path: str):
+        """
+        Hot reload без простоя: новая модель (ne_v1.pt для torch, .onnx для ONNX backend) загружается
+        и прогревается в фоновом потоке, проходит smoke-check и подменяется между тиками.
+        Возвращает Future с отчётом о перезагрузке.
+        """
+        return self._reload_executor.submit(self._reload, model_path)
+
+    def _reload(self, model_path: str):
+        start = time.perf_counter()
+        try:
+            config = dict(self.config)
+            if self.backend.name in DEFAULT_ONNX_PATHS:
+                path_key = 'fp32_path' if self.backend.name == "onnx_fp32" else 'int8_path'
+                config['onnx'] = dict(config.get('onnx', {}), **{path_key: model_path})
+            else:
+                config['model_path'] = model_path
+            model, backend = self._load_model(config)
+            warmup_cfg = config.get('warmup', {})
+            self._warmup_passes(model, backend, warmup_cfg.get('batch_sizes', [1]), warmup_cfg.get('iterations', 0))
+            self._smoke_check(model, backend)
+        except Exception as e:
+            MODEL_RELOADS.labels(result="failed").inc()
+            print(f"[NE] Model reload from {model_path} failed: {e}")
+            raise
+        load_ms = (time.perf_counter() - start) * 1000
+        MODEL_RELOAD_DURATION.observe(load_ms / 1000.0)
+
+        # Подмена выполняется в потоке инференса: тик видит либо старую, либо новую модель целиком
+        swap_ms = self._executor.submit(self._swap, model, backend, config).result()
+        MODEL_SWAP_DURATION.observe(swap_ms / 1000.0)
+        MODEL_RELOADS.labels(result="success").inc()
+        print(f"[NE] Model reloaded from {model_path}: v{self.model_version}, "
+              f"load+warmup {load_ms:.2f} ms, swap {swap_ms:.3f} ms")
+        return {"version": self.model_version, "load_ms": load_ms, "swap_ms": swap_ms}
+
+    def _smoke_check(self, model, backend):
+        """Контракт выходов новой модели на пробном батче и (опционально) расхождение с текущей."""
+        probe = torch.linspace(-1.0, 1.0, 2 * self.config['window'] * self.config['in_dim'])
+        probe = probe.reshape(2, self.config['window'], self.config['in_dim'])
+        mask = torch.ones(2, self.config['num_classes'], dtype=torch.bool)
+        logits, priority, params = backend.run(probe, mask)
+        if tuple(logits.shape) != (2, self.config['num_classes']) or tuple(priority.shape) != (2,) \
+                or tuple(params.shape) != (2, self.config['param_dim']):
+            raise ValueError(f"Smoke check failed: unexpected output shapes {tuple(logits.shape)}, "
+                             f"{tuple(priority.shape)}, {tuple(params.shape)}")
+        probs = self.calibrator.calibrate(logits)
+        if not (torch.isfinite(probs).all() and torch.isfinite(priority).all()):
+            raise ValueError("Smoke check failed: non-finite outputs")
+
+        max_divergence = self.config.get('hot_reload', {}).get('max_prob_divergence')
+        if max_divergence is not None:
+            current_probs = self.calibrator.calibrate(self._executor.submit(self.backend.run, probe, mask).result()[0])
+            divergence = (probs - current_probs).abs().max().item()
+            if divergence > max_divergence:
+                raise ValueError(f"Smoke check failed: probability divergence {divergence:.4f} > {max_divergence}")
+
+    def _swap(self, model, backend, config) -> float:
+        start = time.perf_counter()
+        self.model, self.backend, self.config = model, backend, config
+        # Состояния, посчитанные старой моделью, невалидны для новой
+        self._hidden.clear()
+        if self.cache is not None:
+            self.cache.clear()
+        self.model_version += 1
+        return (time.perf_counter() - start) * 1000
+
+    @property
+    def active_backend(self) -> str:
+        return self.backend.name
+
+    @property
+    def model_path(self) -> str:
+        """Файл активной модели: веса torch или граф ONNX выбранного backend."""
+        if self.backend.name in DEFAULT_ONNX_PATHS:
+            return self.backend.model_path
+        return self.config.get('model_path')
 
     def generate_proposals(self, context) -> List[Proposal]:
+        return self.generate_proposals_batch([context])[0]
+
+    def generate_proposals_batch(self, contexts) -> List[List[Proposal]]:
+        """
+        Пакетный инференс: один forward NE_v1 на все контексты.
+        Возвращает список предложений для каждого контекста (в том же порядке).
+        В режиме streaming каждый контекст обязан иметь agent_id (иначе ValueError).
+        """
+        if not contexts:
+            return []
+        if self.streaming and any(agent_id_of(context) is None for context in contexts):
+            raise ValueError("Streaming inference requires agent_id on every context")
         start = time.time()
-        INFERENCE_COUNT.inc()
+        recorder = self.recorder
+        recorder.inc(INFERENCE_COUNT, len(contexts))
+        future = self._executor.submit(self._infer, contexts)
         try:
-            tensor, mask = self.extractor.extract(context)
-            logits, priority, params = self.model(tensor, mask)
-            probs = self.calibrator.calibrate(logits)
+            indices, values, priority = future.result(timeout=self.config['time_budget_ms'] / 1000.0)
+            results = []
+            log_s = safety_s = 0.0
+            active = 0
+            confidence_sum = 0.0
+            for b, context in enumerate(contexts):
+                proposals = self._build_proposals(indices[b], values[b], priority[b])
 
-            proposals = []
-            top_k = torch.topk(probs, min(self.config['topk'], probs.size(-1)), dim=-1)
-            for i in range(top_k.indices.size(1)):
-                idx = top_k.indices[0, i].item()
-                conf = top_k.values[0, i].item()
-                if conf < self.config['min_confidence']:
-                    continue
-                action_meta = self.config['action_catalog']['actions'][idx]
-                action_name = action_meta['name']
-                actuator = ActuatorCommand(action_name, {})
-                proposal = Proposal(
-                    proposal_id=f"ne_{idx}",
-                    source_module_id="NeuralEngineV1",
-                    confidence=conf,
-                    priority=priority.item(),
-                    justification=f"Predicted by NE_v1 for {action_name}",
-                    proposed_actions=[actuator]
-                )
-                proposals.append(proposal)
-
-            # Логирование
-            self._log_proposals(proposals, context)
-
-            proposals = self.safety.validate(proposals, context.fsm_state, context.bios_status.ok)
+                # Логирование
+                t0 = time.perf_counter()
+                self._log_proposals(proposals, context)
+                t1 = time.perf_counter()
+                proposals = self.safety.validate(proposals, context.fsm_state, context.bios_status.ok)
+                t2 = time.perf_counter()
+                log_s += t1 - t0
+                safety_s += t2 - t1
+                if proposals:
+                    agent_id = agent_id_of(context)
+                    if agent_id is not None:
+                        self._last_good[agent_id] = proposals
+                    active += len(proposals)
+                    confidence_sum += sum(p.confidence for p in proposals)
+                results.append(proposals)
+            recorder.observe(STAGE_HISTOGRAMS["log"], log_s)
+            recorder.observe(STAGE_HISTOGRAMS["safety"], safety_s)
+            recorder.set(ACTIVE_PROPOSALS, active)
+            if active:
+                recorder.set(AVG_CONFIDENCE, confidence_sum / active)
+        except FuturesTimeout:
+            # Поздний результат worker отбрасывается; ещё не начатый инференс отменяется
+            future.cancel()
+            print(f"[NE] Deadline exceeded: {(time.time() - start) * 1000:.2f} ms, using fallback")
+            recorder.inc(DEGRADATIONS, len(contexts))
+            results = [self._fallback(context) for context in contexts]
         except Exception as e:
             print(f"[NE] Exception: {e}")
-            proposals = []
+            results = [[] for _ in contexts]
 
-        elapsed = (time.time() - start) * 1000
-        INFERENCE_LATENCY.observe(elapsed / 1000.0)
-        if elapsed > self.config['time_budget_ms']:
-            print(f"[NE] Timeout: {elapsed:.2f} ms")
-            return []
+        elapsed = time.time() - start
+        self.last_inference_ms = elapsed * 1000
+        recorder.observe(INFERENCE_LATENCY, elapsed)
+        return results
+
+    def probe(self, context, timeout_s: float) -> float:
+        """
+        Проверка готовности: один проход _infer (признаки, forward, калибровка, top-k) в worker-потоке
+        инференса, без лога предложений и SafetyShield. Проба не пишет в метрики и идёт мимо кэша, чтобы
+        опросы /ready не искажали латентность стадий. Возвращает латентность в мс; таймаут — исключение.
+        """
+        start = time.perf_counter()
+        future = self._executor.submit(self._infer, [context], True)
+        try:
+            future.result(timeout=timeout_s)
+        except FuturesTimeout:
+            future.cancel()
+            raise
+        return (time.perf_counter() - start) * 1000
+
+    def close(self):
+        if self.model_watcher is not None:
+            self.model_watcher.stop()
+        self._reload_executor.shutdown(wait=False)
+        self._executor.shutdown(wait=False)
+        self.log_writer.close()
+        self.recorder.close()
+
+    def _infer(self, contexts, probe: bool = False):
+        """
+        Извлечение признаков, forward, калибровка и top-k (выполняется в worker-потоке).
+        probe — проход пробы готовности: без записи в метрики и без кэша.
+        """
+        observe = (NULL if probe else self.recorder).observe
+        t0 = time.perf_counter()
+        if self.streaming:
+            tensor, mask = self._extract(contexts, self.extractor.extract_step, 1)
+            t1 = time.perf_counter()
+            logits, priority, params = self._run_streaming(contexts, tensor, mask)
+            t2 = time.perf_counter()
+            probs = self.calibrator.calibrate(logits)
+        else:
+            if len(contexts) >= BATCH_EXTRACT_MIN:
+                tensor, mask = self.extractor.extract_batch(contexts)
+            else:
+                tensor, mask = self._extract(contexts, self.extractor.extract, self.extractor.window)
+            t1 = time.perf_counter()
+            if self.cache is not None and not probe:
+                # Кэш хранит уже калиброванные probs: калибровка промахов учитывается в forward
+                probs, priority = self._forward_cached(tensor, mask)
+                t2 = time.perf_counter()
+            else:
+                logits, priority, params = self.backend.run(tensor, mask)
+                t2 = time.perf_counter()
+                probs = self.calibrator.calibrate(logits)
+        t3 = time.perf_counter()
+
+        top_k = torch.topk(probs, min(self.config['topk'], probs.size(-1)), dim=-1)
+        # Один .tolist() на тензор вместо .item() на каждый элемент
+        result = top_k.indices.tolist(), top_k.values.tolist(), priority.tolist()
+        t4 = time.perf_counter()
+        observe(STAGE_HISTOGRAMS["extract"], t1 - t0)
+        observe(STAGE_HISTOGRAMS["forward"], t2 - t1)
+        observe(STAGE_HISTOGRAMS["calibrate"], t3 - t2)
+        observe(STAGE_HISTOGRAMS["topk"], t4 - t3)
+        return result
+
+    def _forward_cached(self, tensor, mask):
+        """Forward только для промахов кэша; попадания переиспользуют калиброванные probs и priority."""
+        keys = self.cache.keys(tensor, mask)
+        outputs = [self.cache.get(key) for key in keys]
+        misses = [b for b, output in enumerate(outputs) if output is None]
+        if misses:
+            logits, priority, params = self.backend.run(tensor[misses], mask[misses])
+            probs = self.calibrator.calibrate(logits)
+            for j, b in enumerate(misses):
+                outputs[b] = (probs[j], priority[j])
+                self.cache.put(keys[b], outputs[b])
+        return torch.stack([o[0] for o in outputs]), torch.stack([o[1] for o in outputs])
+
+    def _fallback(self, context) -> List[Proposal]:
+        """
+        Ответ при пропуске дедлайна: последний успешный набор предложений агента (fallback: last_good)
+        или rule-based безопасное действие deadline.safe_action. SafetyShield применяется и здесь.
+        """
+        deadline_cfg = self.config.get('deadline', {})
+        proposals = None
+        if deadline_cfg.get('fallback', 'last_good') == 'last_good':
+            proposals = self._last_good.get(agent_id_of(context))
+        if not proposals and deadline_cfg.get('safe_action'):
+            action_name = deadline_cfg['safe_action']
+            proposals = [Proposal(
+                proposal_id=f"fallback_{action_name}",
+                source_module_id="NeuralEngineV1",
+                confidence=self.config['min_confidence'],
+                priority=0.0,
+                justification=f"Deadline fallback for {action_name}",
+                proposed_actions=[ActuatorCommand(action_name, {})]
+            )]
+        return self.safety.validate(list(proposals or []), context.fsm_state, context.bios_status.ok)
+
+    def reset_stream(self, agent_id: str = None):
+        """Сбрасывает скрытое состояние GRU одного агента или всех агентов."""
+        if agent_id is None:
+            self._hidden.clear()
+            self._last_fsm_state.clear()
+        else:
+            self._hidden.pop(agent_id, None)
+            self._last_fsm_state.pop(agent_id, None)
+
+    def _run_streaming(self, contexts, tensor, mask):
+        """
+        Потоковый режим: в GRU подаётся только новый таймстеп, hidden переносится между тиками.
+        Повторы одного агента в батче — его последовательные тики: r-е вхождения всех агентов
+        идут r-м шагом, так что hidden каждого следующего тика берётся из предыдущего.
+        """
+        agent_ids = [agent_id_of(context) for context in contexts]
+        steps = []
+        occurrences = {}
+        for b, agent_id in enumerate(agent_ids):
+            step = occurrences.get(agent_id, 0)
+            occurrences[agent_id] = step + 1
+            if step == len(steps):
+                steps.append([])
+            steps[step].append(b)
+        if len(steps) == 1:
+            return self._stream_step(contexts, agent_ids, tensor, mask)
+
+        outputs = None
+        for batch in steps:
+            step_outputs = self._stream_step(
+                [contexts[b] for b in batch], [agent_ids[b] for b in batch], tensor[batch], mask[batch]
+            )
+            if outputs is None:
+                outputs = [out.new_empty((len(contexts),) + tuple(out.shape[1:])) for out in step_outputs]
+            for out, step_out in zip(outputs, step_outputs):
+                out[batch] = step_out
+        return tuple(outputs)
+
+    def _stream_step(self, contexts, agent_ids, tensor, mask):
+        """Один шаг GRU для различных агентов; hidden каждого сохраняется для следующего тика."""
+        hidden = torch.cat(
+            [self._stream_hidden(agent_id, context.fsm_state) for agent_id, context in zip(agent_ids, contexts)],
+            dim=1
+        )
+        logits, priority, params, hidden = self.backend.run_step(tensor, mask, hidden)
+        for b, agent_id in enumerate(agent_ids):
+            self._hidden[agent_id] = hidden[:, b:b + 1, :]
+        return logits, priority, params
+
+    def _extract(self, contexts, extract, steps: int):
+        # Окна экстрактора — представления его буферов, валидные до следующего тика агента,
+        # поэтому каждое сразу копируется в батч (контексты одного агента в батче идут по порядку).
+        # Одиночный контекст отдаётся как есть: до его следующего тика forward уже завершится
+        if len(contexts) == 1:
+            return extract(contexts[0])
+        tensor = torch.empty(len(contexts), steps, self.extractor.in_dim)
+        masks = []
+        for b, context in enumerate(contexts):
+            window, mask = extract(context)
+            tensor[b] = window[0]
+            masks.append(mask)
+        return tensor, torch.cat(masks, dim=0)
+
+    def _stream_hidden(self, agent_id: str, fsm_state: str) -> torch.Tensor:
+        prev_state = self._last_fsm_state.get(agent_id)
+        self._last_fsm_state[agent_id] = fsm_state
+        if fsm_state in STREAM_RESET_STATES and fsm_state != prev_state:
+            self._hidden.pop(agent_id, None)
+        hidden = self._hidden.get(agent_id)
+        if hidden is None:
+            hidden = torch.zeros(self.model.gru.num_layers, 1, self.model.gru.hidden_size)
+        return hidden
+
+    def _build_proposals(self, indices: List[int], values: List[float], priority: float) -> List[Proposal]:
+        min_confidence = self.config['min_confidence']
+        templates = self._templates
+        proposals = []
+        for idx, conf in zip(indices, values):
+            if conf < min_confidence:
+                continue
+            proposal_id, action_name, justification = templates[idx]
+            proposals.append(Proposal(
+                proposal_id=proposal_id,
+                source_module_id="NeuralEngineV1",
+                confidence=conf,
+                priority=priority,
+                justification=justification,
+                proposed_actions=[ActuatorCommand(action_name, {})]
+            ))
         return proposals
 
     def _log_proposals(self, proposals, context):
-        log_data = {
-            "timestamp": time.time(),
-            "fsm_state": context.fsm_state,
-            "bios_ok": context.bios_status.ok,
-            "proposals": [
-                {
-                    "id": p.proposal_id,
-                    "confidence": p.confidence,
-                    "priority": p.priority,
-                    "action": p.proposed_actions[0].name if p.proposed_actions else None
-                }
-                for p in proposals
-            ]
-        }
-        print(json.dumps(log_data))
-        # NATS logging
-        asyncio.create_task(self.nats_logger.log_proposal(log_data))
+        # Тик платит только за постановку в очередь; сериализация и вывод — в фоновом ProposalLogWriter
+        self.log_writer.enqueue(time.time(), context.fsm_state, context.bios_status.ok, proposals)
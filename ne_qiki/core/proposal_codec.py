@@ -0,0 +1,193 @@
+import json
+import struct
+from functools import lru_cache
+
+ENCODING_JSON = "json"
+ENCODING_PROTOBUF = "protobuf"
+ENCODINGS = (ENCODING_JSON, ENCODING_PROTOBUF)
+
+# Разделитель записей в пачке: JSON Lines; protobuf-сообщения уже length-delimited
+BATCH_SEPARATORS = {ENCODING_JSON: b"\n", ENCODING_PROTOBUF: b""}
+
+SOURCE_MODULE_ID = "NeuralEngineV1"
+
+_FLOAT = struct.Struct("<f")
+
+# Ключи полей (field_number << 3 | wire_type) qiki.mind.Proposal из QIKI_DTMP/protos/proposal.proto
+_PROPOSAL_ID = b"\x0a"         # 1: qiki.common.UUID
+_SOURCE_MODULE_ID = b"\x12"    # 2: string
+_TIMESTAMP = b"\x1a"           # 3: google.protobuf.Timestamp
+_PROPOSED_ACTIONS = b"\x22"    # 4: repeated qiki.actuators.ActuatorCommand
+_PRIORITY = b"\x35"            # 6: float
+_METADATA = b"\x4a"            # 9: map<string, string>
+_CONFIDENCE = b"\x55"          # 10: float
+# Вложенные: UUID.value = 1, Timestamp.seconds = 1 / nanos = 2, ActuatorCommand.actuator_id = 1,
+# ActuatorCommand.confidence = 9, MapEntry.key = 1 / value = 2
+_FIELD_1 = b"\x0a"
+_FIELD_2 = b"\x12"
+_SECONDS = b"\x08"
+_NANOS = b"\x10"
+_COMMAND_CONFIDENCE = b"\x4d"
+
+
+def _varint(value: int) -> bytes:
+    if value < 0x80:
+        return bytes((value,))
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _len_field(key: bytes, data: bytes) -> bytes:
+    return key + _varint(len(data)) + data
+
+
+def _string_field(key: bytes, value: str) -> bytes:
+    return _len_field(key, value.encode())
+
+
+def _read_varint(buf, pos: int):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _text(value) -> str:
+    return bytes(value).decode()
+
+
+def _fields(buf):
+    """Разбор protobuf-сообщения: (номер поля, значение) для wire types 0, 1, 2, 5."""
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 2:
+            size, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + size]
+            pos += size
+        elif wire_type == 5:
+            value = _FLOAT.unpack_from(buf, pos)[0]
+            pos += 4
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield field, value
+
+
+def encode_json(record: dict) -> bytes:
+    return json.dumps(record).encode()
+
+
+@lru_cache(maxsize=1024)
+def _id_field(proposal_id: str) -> bytes:
+    return _len_field(_PROPOSAL_ID, _string_field(_FIELD_1, proposal_id))
+
+
+@lru_cache(maxsize=1024)
+def _action_prefix(action: str) -> bytes:
+    # ActuatorCommand{actuator_id, confidence}: длина известна заранее (float — 5 байт с ключом)
+    actuator_id = _len_field(_FIELD_1, _string_field(_FIELD_1, action))
+    return _PROPOSED_ACTIONS + _varint(len(actuator_id) + 5) + actuator_id + _COMMAND_CONFIDENCE
+
+
+@lru_cache(maxsize=1024)
+def _context_fields(source_module_id: str, fsm_state: str, bios_ok: bool) -> bytes:
+    return (
+        _string_field(_SOURCE_MODULE_ID, source_module_id)
+        + _len_field(_METADATA, _string_field(_FIELD_1, "fsm_state") + _string_field(_FIELD_2, fsm_state))
+        + _len_field(_METADATA, _string_field(_FIELD_1, "bios_ok")
+                     + _string_field(_FIELD_2, "true" if bios_ok else "false"))
+    )
+
+
+def encode_protobuf(record: dict, source_module_id: str = SOURCE_MODULE_ID) -> bytes:
+    """
+    Запись лога предложений (proposal_record) как последовательность length-delimited qiki.mind.Proposal:
+    по сообщению на предложение. Действие — ActuatorCommand с actuator_id.value = имя действия,
+    fsm_state и bios_ok — в metadata. Запись без предложений даёт пустую последовательность.
+    Неизменные части сообщений (id, действие, source и metadata) кэшируются.
+    """
+    if not record["proposals"]:
+        return b""
+    seconds = int(record["timestamp"])
+    timestamp = _SECONDS + _varint(seconds)
+    nanos = int((record["timestamp"] - seconds) * 1e9)
+    if nanos:
+        timestamp += _NANOS + _varint(nanos)
+    # Поля, общие для всех предложений записи (порядок полей в protobuf не важен)
+    common = _context_fields(source_module_id, record["fsm_state"], record["bios_ok"]) \
+        + _len_field(_TIMESTAMP, timestamp)
+    pack = _FLOAT.pack
+    out = []
+    for p in record["proposals"]:
+        confidence = pack(p["confidence"])
+        message = _id_field(p["id"]) + common
+        if p["action"] is not None:
+            message += _action_prefix(p["action"]) + confidence
+        message += _PRIORITY + pack(p["priority"]) + _CONFIDENCE + confidence
+        out.append(_varint(len(message)))
+        out.append(message)
+    return b"".join(out)
+
+
+ENCODERS = {ENCODING_JSON: encode_json, ENCODING_PROTOBUF: encode_protobuf}
+
+
+def _decode_proposal(buf) -> dict:
+    proposal = {"proposal_id": "", "source_module_id": "", "timestamp": 0.0, "actions": [],
+                "priority": 0.0, "confidence": 0.0, "metadata": {}}
+    for field, value in _fields(buf):
+        if field == 1:
+            proposal["proposal_id"] = _text(dict(_fields(value)).get(1, b""))
+        elif field == 2:
+            proposal["source_module_id"] = _text(value)
+        elif field == 3:
+            ts = dict(_fields(value))
+            proposal["timestamp"] = ts.get(1, 0) + ts.get(2, 0) / 1e9
+        elif field == 4:
+            command = dict(_fields(value))
+            proposal["actions"].append(_text(dict(_fields(command.get(1, b""))).get(1, b"")))
+        elif field == 5:
+            proposal["justification"] = _text(value)
+        elif field == 6:
+            proposal["priority"] = value
+        elif field == 9:
+            entry = dict(_fields(value))
+            proposal["metadata"][_text(entry.get(1, b""))] = _text(entry.get(2, b""))
+        elif field == 10:
+            proposal["confidence"] = value
+    return proposal
+
+
+def decode_proposals(payload: bytes) -> list:
+    """Декодер для потребителей: пачка length-delimited qiki.mind.Proposal -> список словарей."""
+    buf = memoryview(payload)
+    proposals = []
+    pos = 0
+    while pos < len(buf):
+        size, pos = _read_varint(buf, pos)
+        proposals.append(_decode_proposal(buf[pos:pos + size]))
+        pos += size
+    return proposals
+
+
+def decode_payload(payload: bytes, encoding: str = ENCODING_JSON) -> list:
+    """Сообщение NATSLogger -> записи JSON (json) или предложения (protobuf)."""
+    if encoding == ENCODING_JSON:
+        return [json.loads(line) for line in payload.split(b"\n") if line]
+    if encoding == ENCODING_PROTOBUF:
+        return decode_proposals(payload)
+    raise ValueError(f"Unknown proposal encoding: {encoding}")
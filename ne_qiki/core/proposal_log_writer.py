@@ -0,0 +1,193 @@
+import sys
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from core.metrics import PROPOSAL_LOG_DROPPED, PROPOSAL_LOG_WRITTEN, PROPOSAL_LOG_FLUSH_DURATION
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_SAMPLE = "sample"
+
+SINK_STDOUT = "stdout"
+SINK_FILE = "file"
+SINK_NATS = "nats"
+
+
+def proposal_record(timestamp: float, fsm_state: str, bios_ok: bool, proposals) -> dict:
+    """JSON-запись лога предложений одного контекста (формат прежнего _log_proposals)."""
+    return {
+        "timestamp": timestamp,
+        "fsm_state": fsm_state,
+        "bios_ok": bios_ok,
+        "proposals": [
+            {
+                "id": p.proposal_id,
+                "confidence": p.confidence,
+                "priority": p.priority,
+                "action": p.proposed_actions[0].name if p.proposed_actions else None
+            }
+            for p in proposals
+        ]
+    }
+
+
+class StdoutSink:
+    def write(self, records, lines):
+        sys.stdout.write("".join(line + "\n" for line in lines))
+        sys.stdout.flush()
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    """JSON Lines в файл (дозапись)."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records, lines):
+        self._file.write("".join(line + "\n" for line in lines))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class NatsSink:
+    """
+    Публикация пачки через NATSLogger в event loop, где логгер подключался. Записи передаются логгеру
+    и при отсутствии соединения: он буферизует их (с учётом dropped) и дописывает после переподключения.
+    Без loop (engine создан вне asyncio) соединения нет и записи не публикуются — как и раньше.
+    """
+
+    def __init__(self, nats_logger, loop=None):
+        self.nats_logger = nats_logger
+        self.loop = loop
+
+    def write(self, records, lines):
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._publish(records), self.loop)
+
+    async def _publish(self, records):
+        for record in records:
+            await self.nats_logger.log_proposal(record)
+
+    def close(self):
+        pass
+
+
+class ProposalLogWriter:
+    """
+    Лог предложений вне горячего пути: тик только кладёт запись в ограниченную очередь, фоновый поток
+    собирает пачки (по batch_size или раз в flush_interval_s), сериализует их и пишет во все sinks.
+    При переполнении: drop_oldest — вытесняется самая старая запись; sample — принимается только каждая
+    sample_every-я новая запись (вытесняя самую старую), остальные отбрасываются. Потери считаются в dropped.
+    """
+
+    def __init__(self, sinks, max_queue: int = 4096, batch_size: int = 64, flush_interval_s: float = 0.05,
+                 full_policy: str = POLICY_DROP_OLDEST, sample_every: int = 10):
+        if full_policy not in (POLICY_DROP_OLDEST, POLICY_SAMPLE):
+            raise ValueError(f"Unknown proposal log full policy: {full_policy}")
+        self.sinks = list(sinks)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.full_policy = full_policy
+        self.sample_every = sample_every
+        self.dropped = 0
+        self.written = 0
+        self._full_seen = 0
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ne-proposal-log", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, timestamp: float, fsm_state: str, bios_ok: bool, proposals):
+        """Единственное, что оплачивает тик: кортеж и append (сериализация — в writer)."""
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            PROPOSAL_LOG_DROPPED.labels(policy=self.full_policy).inc()
+            if self.full_policy == POLICY_SAMPLE:
+                self._full_seen += 1
+                if self._full_seen % self.sample_every:
+                    return
+            try:
+                queue.popleft()
+            except IndexError:
+                pass
+        queue.append((timestamp, fsm_state, bios_ok, proposals))
+        if len(queue) >= self.batch_size and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def flush(self):
+        """Синхронно дописывает всё накопленное (close, тесты)."""
+        self._drain()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=max(1.0, 2 * self.flush_interval_s))
+        self._drain()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            self._drain()
+
+    def _drain(self):
+        queue = self._queue
+        with self._write_lock:
+            while queue:
+                batch = []
+                while queue and len(batch) < self.batch_size:
+                    batch.append(queue.popleft())
+                start = time.perf_counter()
+                records = [proposal_record(*item) for item in batch]
+                lines = [json.dumps(record) for record in records]
+                for sink in self.sinks:
+                    try:
+                        sink.write(records, lines)
+                    except Exception as e:
+                        print(f"[NE] Proposal log sink {type(sink).__name__} failed: {e}")
+                self.written += len(batch)
+                PROPOSAL_LOG_WRITTEN.inc(len(batch))
+                PROPOSAL_LOG_FLUSH_DURATION.observe(time.perf_counter() - start)
+
+
+def create_log_writer(config, nats_logger) -> ProposalLogWriter:
+    """ProposalLogWriter по секции `proposal_log` (по умолчанию stdout + NATS, как прежде)."""
+    log_cfg = config.get('proposal_log', {})
+    sinks = []
+    for name in log_cfg.get('sinks', [SINK_STDOUT, SINK_NATS]):
+        if name == SINK_STDOUT:
+            sinks.append(StdoutSink())
+        elif name == SINK_FILE:
+            sinks.append(FileSink(log_cfg.get('file_path', 'proposals.jsonl')))
+        elif name == SINK_NATS:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            sinks.append(NatsSink(nats_logger, loop))
+        else:
+            raise ValueError(f"Unknown proposal log sink: {name}")
+    return ProposalLogWriter(
+        sinks,
+        max_queue=log_cfg.get('max_queue', 4096),
+        batch_size=log_cfg.get('batch_size', 64),
+        flush_interval_s=log_cfg.get('flush_interval_s', 0.05),
+        full_policy=log_cfg.get('full_policy', POLICY_DROP_OLDEST),
+        sample_every=log_cfg.get('sample_every', 10),
+    )
@@ -0,0 +1,74 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from shared.models import Proposal
+from core.metrics import COALESCER_BATCH_SIZE, COALESCER_QUEUE_WAIT
+
+
+class RequestCoalescer:
+    """
+    Micro-batching перед NeuralEngineV1 для asyncio-циклов агентов.
+
+    Конкурентные запросы копятся не дольше window_ms или до max_batch_size, затем выполняются
+    одним generate_proposals_batch, и каждый вызывающий получает свои предложения.
+    Батч выполняется в отдельном потоке (по одному за раз), чтобы блокирующий вызов движка
+    не останавливал event loop; futures вызывающих разрешаются уже в loop.
+    """
+
+    def __init__(self, engine, window_ms: float = 1.0, max_batch_size: int = 64):
+        self.engine = engine
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ne-coalescer")
+
+    async def generate_proposals(self, context) -> List[Proposal]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((context, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000.0, self.flush)
+        return await future
+
+    def flush(self):
+        """Отправляет накопленные запросы одним батчем (выполняется в фоновой задаче loop)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = [item for item in self._pending if not item[1].done()]
+        self._pending = []
+        if not pending:
+            return
+
+        COALESCER_BATCH_SIZE.observe(len(pending))
+        task = asyncio.get_running_loop().create_task(self._run_batch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _execute(self, pending):
+        # Ожидание считается до старта job: сюда входит и время за предыдущим батчем в executor
+        now = time.perf_counter()
+        for _, _, enqueued in pending:
+            COALESCER_QUEUE_WAIT.observe(now - enqueued)
+        return self.engine.generate_proposals_batch([context for context, _, _ in pending])
+
+    async def _run_batch(self, pending):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self._execute, pending)
+        except Exception as e:
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), proposals in zip(pending, results):
+            if not future.done():
+                future.set_result(proposals)
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import List
+import torch
+from core.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTION_COUNTERS
+from core.metrics_recorder import DIRECT
+
+
+class InferenceCache:
+    """
+    LRU+TTL кэш выходов модели перед forward NE_v1.
+
+    Ключ — окно признаков, квантованное с шагом quant_step, плюс маска действий; значение —
+    калиброванные вероятности и priority. Кэшируется только выход модели: SafetyShield
+    и построение предложений выполняются на каждом тике. Метрики кэша обновляются через recorder
+    движка (get/put вызываются в worker-потоке инференса).
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_s: float = 0.5, quant_step: float = 0.01, clock=time.monotonic,
+                 recorder=DIRECT):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.quant_step = quant_step
+        self.clock = clock
+        self.recorder = recorder
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def keys(self, tensor: torch.Tensor, mask: torch.Tensor) -> List[bytes]:
+        """Ключи для батча окон (B, T, in_dim) и масок (B, num_actions)."""
+        quantized = torch.round(tensor / self.quant_step).to(torch.int32).reshape(tensor.size(0), -1).numpy()
+        masks = mask.numpy()
+        return [quantized[b].tobytes() + masks[b].tobytes() for b in range(tensor.size(0))]
+
+    def get(self, key: bytes):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if self.clock() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.recorder.inc(CACHE_HITS)
+                return value
+            del self._entries[key]
+            self._evicted("ttl")
+        self.misses += 1
+        self.recorder.inc(CACHE_MISSES)
+        return None
+
+    def put(self, key: bytes, value):
+        self._entries[key] = (value, self.clock() + self.ttl_s)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evicted("size")
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evicted(self, reason: str):
+        self.evictions += 1
+        self.recorder.inc(CACHE_EVICTION_COUNTERS[reason])
+
+
+def create_cache(config, recorder=DIRECT):
+    """InferenceCache из секции `cache` конфигурации или None, если кэш выключен."""
+    cache_cfg = config.get('cache', {})
+    if not cache_cfg.get('enabled', False):
+        return None
+    return InferenceCache(
+        max_size=cache_cfg.get('max_size', 1024),
+        ttl_s=cache_cfg.get('ttl_s', 0.5),
+        quant_step=cache_cfg.get('quant_step', 0.01),
+        recorder=recorder,
+    )
@@ -1,15 +1,20 @@
 from shared.models import Proposal, ActuatorCommand
 from collections import deque
+from core.metrics import SAFETY_BLOCKS
+from core.metrics_recorder import DIRECT
 
 class SafetyShield:
-    def __init__(self, action_catalog, max_actions_per_tick=3, flap_window=5):
+    def __init__(self, action_catalog, max_actions_per_tick=3, flap_window=5, recorder=DIRECT):
         self.action_catalog = {a['name']: a for a in action_catalog['actions']}
         self.max_actions = max_actions_per_tick
         self.flap_window = flap_window
         self.action_history = deque(maxlen=flap_window)
+        self.recorder = recorder
 
     def validate(self, proposals: list, fsm_state: str, bios_ok: bool) -> list:
         if fsm_state == "ERROR_STATE" or not bios_ok:
+            if proposals:
+                self.recorder.inc(SAFETY_BLOCKS, len(proposals))
             return []
 
         filtered = []
@@ -24,6 +29,8 @@ class SafetyShield:
             if valid and not self._is_flapping(p):
                 filtered.append(p)
                 self.action_history.append(p.proposed_actions[0].name if p.proposed_actions else None)
+        if len(filtered) < len(proposals):
+            self.recorder.inc(SAFETY_BLOCKS, len(proposals) - len(filtered))
         return filtered
 
     def _validate_action(self, cmd: ActuatorCommand) -> bool:
@@ -15,7 +15,18 @@ class NE_v1(nn.Module):
     def forward(self, x, action_mask=None):
         out, _ = self.gru(x)
         features = out[:, -1, :]  # последний таймстеп
+        return self._heads(features, action_mask)
 
+    def forward_step(self, x, action_mask=None, hidden=None):
+        """
+        Потоковый шаг: x (B, T, input_dim) — только новые таймстепы, hidden (num_layers, B, hidden_dim)
+        — состояние GRU с прошлого тика (None — нулевое). Возвращает головы и новое состояние.
+        """
+        out, hidden = self.gru(x, hidden)
+        logits, priority, params = self._heads(out[:, -1, :], action_mask)
+        return logits, priority, params, hidden
+
+    def _heads(self, features, action_mask=None):
         logits = self.class_head(features)
         if action_mask is not None:
             logits = logits.masked_fill(~action_mask.bool(), float('-inf'))
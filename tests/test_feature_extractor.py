@@ -15,6 +15,7 @@ class MockContext:
     bios_status: MockBiosStatus
     fsm_state: str
     sensor_data: dict = None
+    agent_id: str = None
 
 class TestFeatureExtractor(unittest.TestCase):
     def setUp(self):
@@ -30,5 +31,98 @@ class TestFeatureExtractor(unittest.TestCase):
         self.assertEqual(tensor.shape, (1, 16, 32))
         self.assertEqual(mask.shape, (1, 6))
 
+    def test_first_tick_fills_window(self):
+        context = MockContext(bios_status=MockBiosStatus(temperature=150.0), fsm_state="IDLE",
+                              sensor_data={"velocity": -1.0, "action_history": [2, 4]})
+        tensor, _ = self.extractor.extract(context)
+        expected = [0.0, 1.0, 0.0, 0.0, 1.0, 0.5, 0.5, 0.0, -0.2, 0.0, 0.0, 0.2, 0.4]
+        for t in range(16):
+            self.assertEqual(tensor[0, t, :13].tolist(), torch.tensor(expected).tolist())
+            self.assertEqual(tensor[0, t, 13:].abs().sum().item(), 0.0)
+
+    def test_sliding_window_order(self):
+        extractor = FeatureExtractor(window=4, in_dim=32)
+        for i in range(6):
+            tensor, _ = extractor.extract(MockContext(
+                bios_status=MockBiosStatus(temperature=10.0 * i), fsm_state="ACTIVE", agent_id="agent_a"))
+        # Самый новый тик — последний в окне
+        self.assertTrue(torch.allclose(tensor[0, :, 4], torch.tensor([0.2, 0.3, 0.4, 0.5])))
+
+        step, _ = extractor.extract_step(MockContext(
+            bios_status=MockBiosStatus(temperature=60.0), fsm_state="ACTIVE", agent_id="agent_a"))
+        self.assertEqual(step.shape, (1, 1, 32))
+        self.assertAlmostEqual(step[0, 0, 4].item(), 0.6, places=6)
+
+    def test_window_is_zero_copy_view(self):
+        context = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE")
+        context.agent_id = "agent_a"
+        tensor, _ = self.extractor.extract(context)
+        buf = self.extractor._buffers["agent_a"]
+        self.assertEqual(buf.dtype.name, "float32")
+        self.assertEqual(buf.shape, (32, 32))
+        start = buf.ctypes.data
+        self.assertTrue(start <= tensor.data_ptr() < start + buf.nbytes)
+        self.assertTrue(tensor.is_contiguous())
+
+    def test_windows_are_per_agent(self):
+        ctx_a = MockContext(bios_status=MockBiosStatus(temperature=10.0), fsm_state="ACTIVE")
+        ctx_b = MockContext(bios_status=MockBiosStatus(temperature=90.0), fsm_state="ACTIVE")
+        ctx_a.agent_id = "agent_a"
+        ctx_b.agent_id = "agent_b"
+        self.extractor.extract(ctx_a)
+        tensor_b, _ = self.extractor.extract(ctx_b)
+        self.assertTrue(torch.allclose(tensor_b[0, :, 4], torch.full((16,), 0.9)))
+
+        self.extractor.reset("agent_b")
+        self.assertNotIn("agent_b", self.extractor._buffers)
+        self.assertIn("agent_a", self.extractor._buffers)
+
+    def test_contexts_without_agent_id_are_stateless(self):
+        ctx_a = MockContext(bios_status=MockBiosStatus(temperature=10.0), fsm_state="ACTIVE")
+        ctx_b = MockContext(bios_status=MockBiosStatus(temperature=90.0), fsm_state="ACTIVE")
+        self.extractor.extract(ctx_a)
+        tensor_b, _ = self.extractor.extract(ctx_b)
+        self.assertTrue(torch.allclose(tensor_b[0, :, 4], torch.full((16,), 0.9)))
+        self.assertEqual(self.extractor._buffers, {})
+
+        batch, _ = self.extractor.extract_batch([ctx_a, ctx_b, ctx_a])
+        self.assertTrue(torch.allclose(batch[:, :, 4], torch.tensor([[0.1], [0.9], [0.1]]).expand(3, 16)))
+        step, _ = self.extractor.extract_step(ctx_b)
+        self.assertAlmostEqual(step[0, 0, 4].item(), 0.9, places=6)
+        self.assertEqual(self.extractor._buffers, {})
+
+    def test_extract_batch_single_is_zero_copy(self):
+        context = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE")
+        context.agent_id = "agent_a"
+        tensor, mask = self.extractor.extract_batch([context])
+        self.assertEqual(tensor.shape, (1, 16, 32))
+        self.assertEqual(mask.shape, (1, 6))
+        buf = self.extractor._buffers["agent_a"]
+        self.assertTrue(buf.ctypes.data <= tensor.data_ptr() < buf.ctypes.data + buf.nbytes)
+
+    def test_extract_batch_matches_extract(self):
+        states = ["BOOTING", "IDLE", "ACTIVE", "ERROR_STATE", "SHUTDOWN"]
+        contexts = []
+        for i in range(40):
+            context = MockContext(
+                bios_status=MockBiosStatus(temperature=7.3 * i - 20, power_draw=3.1 * i, utilization=130 - 4.7 * i),
+                fsm_state=states[i % len(states)],
+                sensor_data=None if i % 7 == 0 else {
+                    "distance": 0.37 * i, "velocity": 0.41 * i - 8, "azimuth": 0.23 * i - 4,
+                    "hazard_score": 0.031 * i, "action_history": list(range(i % 9))
+                }
+            )
+            context.agent_id = f"agent_{i % 6}"
+            contexts.append(context)
+
+        scalar = FeatureExtractor(window=8, in_dim=32)
+        batched = FeatureExtractor(window=8, in_dim=32)
+        for _ in range(3):
+            expected = torch.stack([scalar.extract(c)[0][0].clone() for c in contexts])
+            tensor, mask = batched.extract_batch(contexts)
+            self.assertEqual(tensor.shape, (40, 8, 32))
+            self.assertEqual(mask.shape, (40, 6))
+            self.assertTrue(torch.equal(tensor, expected))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,128 @@
+import time
+import unittest
+from prometheus_client import REGISTRY
+from api.health_check import create_app, ReadinessProbe, ProbeContext, PROBE_AGENT_ID
+from core.neural_engine_impl import NeuralEngineV1
+from benchmark.feature_extraction_benchmark import make_contexts
+
+
+def engine_config():
+    return {
+        "window": 16, "in_dim": 32, "num_classes": 6, "param_dim": 4, "topk": 3,
+        "min_confidence": 0.0, "time_budget_ms": 1000, "calibration": {"temperature": 1.2},
+        "action_catalog": {"actions": [{"name": f"A{i}", "params": {}} for i in range(6)]},
+        "proposal_log": {"sinks": []},
+        "health": {"ready_ttl_s": 60.0}
+    }
+
+
+class CountingEngine:
+    """Engine-заглушка: считает пробы и может падать."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.probes = 0
+        self.active_backend = "torch"
+        self.model_version = 1
+        self.last_inference_ms = 2.5
+        self.config = {"time_budget_ms": 8}
+
+    def probe(self, context, timeout_s):
+        self.probes += 1
+        if self.fail:
+            raise RuntimeError("backend unavailable")
+        return 1.0
+
+
+class TestReadinessProbe(unittest.TestCase):
+    def test_result_cached_for_ttl(self):
+        engine = CountingEngine()
+        probe = ReadinessProbe(lambda: engine, ttl_s=60.0)
+        body, status = probe.check()
+        self.assertEqual(status, 200)
+        self.assertFalse(body["cached"])
+        body, status = probe.check()
+        self.assertTrue(body["cached"])
+        self.assertEqual(engine.probes, 1)
+
+    def test_expired_result_reprobes(self):
+        engine = CountingEngine()
+        probe = ReadinessProbe(lambda: engine, ttl_s=0.01)
+        probe.check()
+        time.sleep(0.02)
+        probe.check()
+        self.assertEqual(engine.probes, 2)
+
+    def test_failure_not_ready(self):
+        probe = ReadinessProbe(lambda: CountingEngine(fail=True), ttl_s=60.0)
+        body, status = probe.check()
+        self.assertEqual(status, 503)
+        self.assertEqual(body["status"], "not_ready")
+        self.assertIn("backend unavailable", body["details"])
+
+    def test_engine_factory_failure_not_ready(self):
+        def factory():
+            raise FileNotFoundError("ne_v1.pt")
+
+        body, status = ReadinessProbe(factory).check()
+        self.assertEqual(status, 503)
+
+
+class TestHealthApp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        config = engine_config()
+        cls.engine = NeuralEngineV1(config)
+        cls.client = create_app(lambda: cls.engine, config).test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.close()
+
+    def test_health(self):
+        response = self.client.get("/health")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "ok")
+
+    def test_ready_runs_real_inference(self):
+        self.engine.generate_proposals_batch(make_contexts(2))
+        ticks = REGISTRY.get_sample_value('ne_inference_total')
+        response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["status"], "ready")
+        self.assertEqual(body["backend"], "torch")
+        self.assertGreater(body["probe_latency_ms"], 0.0)
+        self.assertIsNotNone(body["last_inference_ms"])
+        # Проба идёт мимо generate_proposals: не считается тиком и не пишет лог предложений
+        self.assertEqual(REGISTRY.get_sample_value('ne_inference_total'), ticks)
+
+    def test_probe_not_in_stage_metrics(self):
+        before = {stage: REGISTRY.get_sample_value('ne_stage_duration_seconds_count', {"stage": stage})
+                  for stage in ("extract", "forward", "calibrate", "topk")}
+        self.engine.probe(ProbeContext(), timeout_s=1.0)
+        for stage, count in before.items():
+            self.assertEqual(REGISTRY.get_sample_value('ne_stage_duration_seconds_count', {"stage": stage}), count)
+        self.assertNotIn(PROBE_AGENT_ID, self.engine._last_good)
+
+    def test_metrics_exposes_registry(self):
+        self.engine.generate_proposals_batch(make_contexts(1))
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        self.assertIn("ne_inference_total", text)
+        self.assertIn('ne_stage_duration_seconds_bucket{le="0.001",stage="forward"}', text)
+
+
+class TestDefaultConfig(unittest.TestCase):
+    def test_ready_with_example_config(self):
+        # config.example.yaml не требует файла весов, которого нет в репозитории
+        app = create_app()
+        response = app.test_client().get("/ready")
+        self.assertEqual(response.status_code, 200, response.get_json())
+        app.config['READINESS_PROBE'].engine.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import unittest
+import torch
+from core.neural_engine_impl import NeuralEngineV1
+from core.model_watcher import ModelWatcher
+from models.ne_v1 import NE_v1
+from dataclasses import dataclass
+
+
+@dataclass
+class MockBiosStatus:
+    ok: bool = True
+    temperature: float = 50.0
+    power_draw: float = 50.0
+    utilization: float = 50.0
+
+
+@dataclass
+class MockContext:
+    bios_status: MockBiosStatus
+    fsm_state: str
+    sensor_data: dict = None
+
+
+class TestHotReload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ne_v1.pt")
+        torch.save(NE_v1(32, 64, 6, 4).state_dict(), self.path)
+        self.config = {
+            "window": 16,
+            "in_dim": 32,
+            "num_classes": 6,
+            "param_dim": 4,
+            "topk": 3,
+            "min_confidence": 0.0,
+            "time_budget_ms": 10000,
+            "model_path": self.path,
+            "warmup": {"iterations": 1},
+            "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"ACTION_{i}", "params": {}} for i in range(6)]}
+        }
+        self.engine = NeuralEngineV1(self.config)
+        self.context = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE")
+
+    def tearDown(self):
+        self.engine.close()
+        self.tmp.cleanup()
+
+    def test_reload_swaps_weights(self):
+        new_model = NE_v1(32, 64, 6, 4)
+        new_path = os.path.join(self.tmp.name, "ne_v1_new.pt")
+        torch.save(new_model.state_dict(), new_path)
+        old_model = self.engine.model
+
+        report = self.engine.reload_model(new_path).result(timeout=10)
+        self.assertEqual(report["version"], 2)
+        self.assertGreaterEqual(report["swap_ms"], 0.0)
+        self.assertIsNot(self.engine.model, old_model)
+        self.assertEqual(self.engine.model_path, new_path)
+        for key, value in new_model.state_dict().items():
+            self.assertTrue(torch.equal(self.engine.model.state_dict()[key], value))
+        self.assertTrue(self.engine.generate_proposals(self.context))
+
+    def test_failed_reload_keeps_current_model(self):
+        bad_path = os.path.join(self.tmp.name, "broken.pt")
+        with open(bad_path, "wb") as f:
+            f.write(b"not a model")
+        old_model = self.engine.model
+        with self.assertRaises(Exception):
+            self.engine.reload_model(bad_path).result(timeout=10)
+        self.assertIs(self.engine.model, old_model)
+        self.assertEqual(self.engine.model_version, 1)
+
+    def test_divergence_smoke_check_rejects_model(self):
+        self.engine.config["hot_reload"] = {"max_prob_divergence": 0.0}
+        different = NE_v1(32, 64, 6, 4)
+        with torch.no_grad():
+            different.class_head.bias.add_(5.0 * torch.arange(6.0))
+        new_path = os.path.join(self.tmp.name, "ne_v1_new.pt")
+        torch.save(different.state_dict(), new_path)
+        with self.assertRaises(ValueError):
+            self.engine.reload_model(new_path).result(timeout=10)
+        self.assertEqual(self.engine.model_version, 1)
+
+    def test_ticks_during_reload_always_succeed(self):
+        stop = threading.Event()
+        failures = []
+
+        def tick_loop():
+            while not stop.is_set():
+                if self.engine.generate_proposals(self.context) == []:
+                    failures.append(True)
+
+        thread = threading.Thread(target=tick_loop)
+        thread.start()
+        try:
+            for i in range(3):
+                path = os.path.join(self.tmp.name, f"ne_v1_{i}.pt")
+                torch.save(NE_v1(32, 64, 6, 4).state_dict(), path)
+                self.engine.reload_model(path).result(timeout=10)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(self.engine.model_version, 4)
+        self.assertEqual(failures, [])
+
+    def test_watcher_reloads_after_file_settles(self):
+        watcher = ModelWatcher(self.engine, self.path, interval_s=0.01)
+        self.assertIsNone(watcher.poll())
+        torch.save(NE_v1(32, 64, 6, 4).state_dict(), self.path)
+        os.utime(self.path, ns=(1, 1))
+        self.assertIsNone(watcher.poll())
+        future = watcher.poll()
+        self.assertIsNotNone(future)
+        future.result(timeout=10)
+        self.assertEqual(self.engine.model_version, 2)
+        self.assertIsNone(watcher.poll())
+
+if __name__ == "__main__":
+    unittest.main()
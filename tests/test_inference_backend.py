@@ -0,0 +1,156 @@
+import os
+import json
+import tempfile
+import unittest
+import torch
+from core.inference_backend import create_backend, compile_model, export_onnx, TorchBackend
+from core.neural_engine_impl import NeuralEngineV1
+from models.ne_v1 import NE_v1
+
+try:
+    import onnxruntime  # noqa: F401
+    HAS_ORT = True
+except ImportError:
+    HAS_ORT = False
+
+
+def export(model, path):
+    export_onnx(model, path, window=16, in_dim=32, num_classes=6)
+
+
+class TestInferenceBackend(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "window": 16,
+            "in_dim": 32,
+            "num_classes": 6,
+            "param_dim": 4,
+            "topk": 3,
+            "min_confidence": 0.55,
+            "time_budget_ms": 8,
+            "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": "HOLD_POSITION", "params": {}}]}
+        }
+
+    def test_default_backend_is_torch(self):
+        engine = NeuralEngineV1(self.config)
+        self.assertIsInstance(engine.backend, TorchBackend)
+        self.assertEqual(engine.active_backend, "torch")
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            create_backend({"backend": "tensorrt"}, NE_v1(32, 64, 6, 4))
+
+    def test_startup_warmup_and_weights(self):
+        model = NE_v1(32, 64, 6, 4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ne_v1.pt")
+            torch.save(model.state_dict(), path)
+            config = dict(self.config, model_path=path, warmup={"iterations": 3, "batch_sizes": [1, 4]})
+            engine = NeuralEngineV1(config)
+        self.assertTrue(engine.ready)
+        self.assertGreater(engine.warmup_ms, 0.0)
+        self.assertFalse(engine.model.training)
+        for key, value in model.state_dict().items():
+            self.assertTrue(torch.equal(engine.model.state_dict()[key], value))
+
+    def test_torch_backend_runs_in_inference_mode(self):
+        engine = NeuralEngineV1(self.config)
+        logits, _, _ = engine.backend.run(torch.zeros(1, 16, 32), torch.ones(1, 6).bool())
+        self.assertTrue(logits.is_inference())
+
+    def test_torchscript_compile_matches_eager(self):
+        model = NE_v1(32, 64, 6, 4).eval()
+        scripted = compile_model(model, "torchscript", 16, 32, 6)
+        x = torch.randn(3, 16, 32)
+        mask = torch.tensor([[True, True, True, True, False, False]] * 3)
+        with torch.no_grad():
+            ref = model(x, mask)
+            out = scripted(x, mask)
+            hidden = torch.zeros(2, 3, 64)
+            ref_step = model.forward_step(x[:, :1], mask, hidden)
+            out_step = scripted.forward_step(x[:, :1], mask, hidden)
+        for a, b in zip(out + out_step, ref + ref_step):
+            self.assertTrue(torch.allclose(a, b, atol=1e-5))
+
+        engine = NeuralEngineV1(dict(self.config, compile="torchscript", warmup={"iterations": 2}))
+        self.assertTrue(engine.ready)
+
+    def test_torch_int8_backend(self):
+        engine = NeuralEngineV1(dict(self.config, backend="torch_int8", streaming=True, warmup={"iterations": 1}))
+        self.assertEqual(engine.active_backend, "torch_int8")
+        quantized = engine.backend.model
+        dynamic = torch.ao.nn.quantized.dynamic
+        self.assertIsInstance(quantized.gru, dynamic.GRU)
+        for head in (quantized.class_head, quantized.priority_head[0], quantized.param_head):
+            self.assertIsInstance(head, dynamic.Linear)
+
+        x = torch.randn(2, 16, 32)
+        mask = torch.ones(2, 6).bool()
+        with torch.no_grad():
+            ref_probs = torch.softmax(engine.model(x, mask)[0], -1)
+        probs = torch.softmax(engine.backend.run(x, mask)[0], -1)
+        self.assertTrue(torch.allclose(probs, ref_probs, atol=0.05))
+        engine.close()
+
+    def test_quantization_report(self):
+        from benchmark.quantization_report import quantization_report
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "holdout.jsonl")
+            with open(path, "w") as f:
+                for i in range(20):
+                    f.write(json.dumps({
+                        "features": torch.randn(32).tolist(),
+                        "label": i % 4,
+                        "priority": 0.5,
+                        "params": [0.0, 0.1, 0.2, 0.3],
+                        "action_mask": [True, True, True, True, False, False]
+                    }) + "\n")
+            report = quantization_report(path, batch_size=8, latency_iterations=5)
+        self.assertEqual(report["samples"], 20)
+        self.assertGreaterEqual(report["top1_agreement"], 0.0)
+        self.assertLess(report["prob_max_abs_diff"], 0.1)
+        self.assertIn("p95", report["int8_latency_ms"])
+
+    def test_unknown_compile_mode_raises(self):
+        with self.assertRaises(ValueError):
+            compile_model(NE_v1(32, 64, 6, 4), "tvm", 16, 32, 6)
+
+    @unittest.skipUnless(HAS_ORT, "onnxruntime not installed")
+    def test_onnx_fp32_matches_torch(self):
+        model = NE_v1(32, 64, 6, 4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ne_v1.onnx")
+            export(model, path)
+            config = dict(self.config, backend="onnx_fp32",
+                          onnx={"fp32_path": path, "intra_op_num_threads": 1, "inter_op_num_threads": 1})
+            engine = NeuralEngineV1(config)
+            self.assertEqual(engine.active_backend, "onnx_fp32")
+
+            x = torch.randn(2, 16, 32)
+            mask = torch.tensor([[True, True, True, True, False, False]] * 2)
+            logits, priority, params = engine.backend.run(x, mask)
+            with torch.no_grad():
+                ref_logits, ref_priority, ref_params = model(x, mask)
+            self.assertTrue(torch.allclose(torch.softmax(logits, -1), torch.softmax(ref_logits, -1), atol=1e-4))
+            self.assertTrue(torch.allclose(priority, ref_priority, atol=1e-4))
+            self.assertTrue(torch.allclose(params, ref_params, atol=1e-4))
+
+    @unittest.skipUnless(HAS_ORT, "onnxruntime not installed")
+    def test_onnx_int8_backend(self):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        with tempfile.TemporaryDirectory() as tmp:
+            fp32_path = os.path.join(tmp, "ne_v1.onnx")
+            int8_path = os.path.join(tmp, "ne_v1_int8.onnx")
+            export(NE_v1(32, 64, 6, 4), fp32_path)
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+            engine = NeuralEngineV1(dict(self.config, backend="onnx_int8", onnx={"int8_path": int8_path}))
+            self.assertEqual(engine.active_backend, "onnx_int8")
+
+            logits, priority, params = engine.backend.run(torch.randn(1, 16, 32), torch.ones(1, 6).bool())
+            self.assertEqual(tuple(logits.shape), (1, 6))
+            self.assertEqual(tuple(priority.shape), (1,))
+            self.assertEqual(tuple(params.shape), (1, 4))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from benchmark.inference_benchmark import run_matrix, compare_to_baseline, RUNTIMES
+
+try:
+    import onnxruntime  # noqa: F401
+    HAS_ORT = True
+except ImportError:
+    HAS_ORT = False
+
+
+class TestInferenceBenchmark(unittest.TestCase):
+    def test_matrix_rows_and_percentiles(self):
+        runtimes = RUNTIMES if HAS_ORT else ("torch", "torchscript")
+        results = run_matrix(runtimes=runtimes, batch_sizes=(1, 4), windows=(8,), hidden_sizes=(16,),
+                             threads=(1,), iterations=5, warmup=1)
+        self.assertEqual(len(results), len(runtimes) * 2)
+        for row in results:
+            self.assertLessEqual(row["p50"], row["p95"])
+            self.assertLessEqual(row["p95"], row["p99"])
+            self.assertLessEqual(row["p99"], row["max"])
+
+    def test_compare_to_baseline(self):
+        key = {"runtime": "torch", "batch_size": 1, "window": 16, "hidden_size": 64, "threads": 1}
+        baseline = [dict(key, p95=1.0)]
+        self.assertEqual(compare_to_baseline([dict(key, p95=1.05)], baseline, max_regression=0.10), [])
+        regressions = compare_to_baseline([dict(key, p95=1.5)], baseline, max_regression=0.10)
+        self.assertEqual(len(regressions), 1)
+        self.assertAlmostEqual(regressions[0]["regression"], 0.5)
+        # Точки без пары в базе не сравниваются
+        other = dict(key, batch_size=8, p95=100.0)
+        self.assertEqual(compare_to_baseline([other], baseline), [])
+
+if __name__ == "__main__":
+    unittest.main()
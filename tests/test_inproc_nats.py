@@ -0,0 +1,105 @@
+import asyncio
+import time
+import unittest
+from core import inproc_nats
+from core.inproc_nats import get_broker, remove_broker
+from core.nats_logger import NATSLogger
+from core.proposal_codec import decode_payload
+
+URL = "inproc://test"
+
+
+class TestInProcessBroker(unittest.TestCase):
+    def setUp(self):
+        remove_broker("test")
+        self.broker = get_broker("test")
+
+    def tearDown(self):
+        remove_broker("test")
+
+    def test_publish_subscribe_with_wildcards(self):
+        async def run_test():
+            nc = await inproc_nats.connect(URL)
+            exact = await nc.subscribe("qiki.neural.proposals")
+            token = await nc.subscribe("qiki.*.proposals")
+            tail = await nc.subscribe("qiki.>")
+            await nc.publish("qiki.neural.proposals", b"a")
+            await nc.publish("qiki.neural.other", b"b")
+            self.assertEqual((await exact.next_msg()).data, b"a")
+            self.assertEqual(token.pending, 1)
+            self.assertEqual(tail.pending, 2)
+            await nc.close()
+            self.assertTrue(nc.is_closed)
+
+        asyncio.run(run_test())
+        self.assertEqual(self.broker.published, 2)
+
+    def test_slow_consumer_drops_overflow(self):
+        received = []
+
+        async def handler(msg):
+            received.append(msg.data)
+
+        async def run_test():
+            nc = await inproc_nats.connect(URL)
+            sub = await nc.subscribe("s", cb=handler, max_pending=2, processing_delay_s=0.01)
+            for i in range(5):
+                await nc.publish("s", bytes([i]))
+            await asyncio.sleep(0.1)
+            return sub
+
+        sub = asyncio.run(run_test())
+        self.assertEqual(sub.dropped, 3)
+        self.assertEqual(received, [b"\x00", b"\x01"])
+
+    def test_injected_latency_and_failures(self):
+        self.broker.publish_latency_s = 0.01
+        self.broker.fail_connects = 1
+
+        async def run_test():
+            with self.assertRaises(ConnectionError):
+                await inproc_nats.connect(URL)
+            nc = await inproc_nats.connect(URL)
+            start = time.perf_counter()
+            await nc.publish("s", b"x")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.01)
+            self.broker.publish_failure_rate = 1.0
+            with self.assertRaises(ConnectionError):
+                await nc.publish("s", b"x")
+
+        asyncio.run(run_test())
+        self.assertEqual(self.broker.failed_publishes, 1)
+
+    def test_nats_logger_batches_reconnects_and_recovers(self):
+        logger = NATSLogger(URL, batch_size=4, flush_interval_s=0.01, reconnect_interval_s=0.01)
+
+        async def run_test():
+            consumer = await inproc_nats.connect(URL)
+            sub = await consumer.subscribe("qiki.neural.proposals")
+            await logger.connect()
+            for i in range(8):
+                await logger.log_proposal({"i": i})
+            self.assertEqual(self.broker.published, 2)
+
+            # Обрыв: записи буферизуются, NATSLogger переподключается и дописывает их
+            self.broker.down = True
+            await self.broker.disconnect_all(keep=(consumer,))
+            for i in range(8, 11):
+                await logger.log_proposal({"i": i})
+            self.assertEqual(logger.buffered, 3)
+            self.broker.down = False
+            await asyncio.sleep(0.1)
+
+            records = []
+            while sub.pending:
+                records += decode_payload((await sub.next_msg()).data, "json")
+            await logger.close()
+            return records
+
+        records = asyncio.run(run_test())
+        self.assertEqual([r["i"] for r in records], list(range(11)))
+        self.assertEqual(self.broker.connects, 3)
+        self.assertEqual(logger.stats(), {"published": 11, "buffered": 0, "dropped": 0})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import threading
+import unittest
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from core.metrics import STAGES
+from core.metrics_recorder import MetricsRecorder, MODE_ACCUMULATE, create_recorder
+from core.neural_engine_impl import NeuralEngineV1
+from core.safety import SafetyShield
+from benchmark.feature_extraction_benchmark import make_contexts
+from shared.models import Proposal, ActuatorCommand
+
+TEST_COUNTER = Counter('test_recorder_total', 'MetricsRecorder test counter')
+TEST_GAUGE = Gauge('test_recorder_gauge', 'MetricsRecorder test gauge')
+TEST_HISTOGRAM = Histogram('test_recorder_seconds', 'MetricsRecorder test histogram')
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+class TestMetricsRecorder(unittest.TestCase):
+    def test_direct_updates_immediately(self):
+        before = sample('test_recorder_total')
+        recorder = MetricsRecorder()
+        recorder.inc(TEST_COUNTER, 2)
+        recorder.set(TEST_GAUGE, 7)
+        self.assertEqual(sample('test_recorder_total'), before + 2)
+        self.assertEqual(sample('test_recorder_gauge'), 7)
+
+    def test_accumulate_applies_on_flush(self):
+        recorder = MetricsRecorder(MODE_ACCUMULATE, flush_interval_s=60.0)
+        before = sample('test_recorder_seconds_count')
+        recorder.observe(TEST_HISTOGRAM, 0.001)
+        recorder.set(TEST_GAUGE, 1)
+        recorder.set(TEST_GAUGE, 3)
+        self.assertEqual(sample('test_recorder_seconds_count'), before)
+        recorder.flush()
+        self.assertEqual(sample('test_recorder_seconds_count'), before + 1)
+        # Порядок внутри потока сохраняется: последнее set побеждает
+        self.assertEqual(sample('test_recorder_gauge'), 3)
+        recorder.close()
+
+    def test_accumulate_collects_all_threads(self):
+        recorder = MetricsRecorder(MODE_ACCUMULATE, flush_interval_s=60.0)
+        before = sample('test_recorder_total')
+
+        def work():
+            for _ in range(1000):
+                recorder.inc(TEST_COUNTER)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        recorder.close()
+        self.assertEqual(sample('test_recorder_total'), before + 4000)
+
+    def test_background_flush(self):
+        recorder = MetricsRecorder(MODE_ACCUMULATE, flush_interval_s=0.01)
+        before = sample('test_recorder_total')
+        recorder.inc(TEST_COUNTER)
+        done = threading.Event()
+        for _ in range(100):
+            if sample('test_recorder_total') == before + 1:
+                done.set()
+                break
+            done.wait(0.01)
+        recorder.close()
+        self.assertTrue(done.is_set())
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            create_recorder({"metrics": {"mode": "sampled"}})
+
+
+class TestEngineMetrics(unittest.TestCase):
+    def config(self, mode="direct"):
+        return {
+            "window": 16, "in_dim": 32, "num_classes": 6, "param_dim": 4, "topk": 3,
+            "min_confidence": 0.0, "time_budget_ms": 1000, "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"A{i}", "params": {}} for i in range(6)]},
+            "proposal_log": {"sinks": []},
+            "metrics": {"mode": mode, "flush_interval_s": 60.0}
+        }
+
+    def test_stage_histograms_and_gauges(self):
+        before = {stage: sample('ne_stage_duration_seconds_count', {'stage': stage}) for stage in STAGES}
+        engine = NeuralEngineV1(self.config())
+        # Каталог теста (A0..A5) не знает действий NE — подставляем их, чтобы предложения проходили SafetyShield
+        engine.safety.action_catalog = {name: {"name": name, "params": {}} for _, name, _ in engine._templates}
+        results = engine.generate_proposals_batch(make_contexts(2))
+        engine.close()
+        for stage in STAGES:
+            self.assertEqual(sample('ne_stage_duration_seconds_count', {'stage': stage}), before[stage] + 1, stage)
+        active = sum(len(r) for r in results)
+        self.assertEqual(sample('ne_active_proposals'), active)
+        if active:
+            mean = sum(p.confidence for r in results for p in r) / active
+            self.assertAlmostEqual(sample('ne_avg_confidence'), mean, places=6)
+
+    def test_accumulate_mode_defers_until_close(self):
+        engine = NeuralEngineV1(self.config(MODE_ACCUMULATE))
+        before = sample('ne_inference_total')
+        engine.generate_proposals_batch(make_contexts(3))
+        self.assertEqual(sample('ne_inference_total'), before)
+        engine.close()
+        self.assertEqual(sample('ne_inference_total'), before + 3)
+
+
+class TestSafetyBlocks(unittest.TestCase):
+    def test_blocked_proposals_counted(self):
+        shield = SafetyShield({"actions": [{"name": "HOLD_POSITION", "params": {}}]})
+        proposals = [Proposal(f"ne_{i}", "NeuralEngineV1", 0.9, 0.5, "test", [ActuatorCommand(name, {})])
+                     for i, name in enumerate(("HOLD_POSITION", "UNKNOWN"))]
+        before = sample('ne_safety_blocks_total')
+        self.assertEqual(len(shield.validate(proposals, "ACTIVE", True)), 1)
+        self.assertEqual(sample('ne_safety_blocks_total'), before + 1)
+        self.assertEqual(shield.validate(proposals, "ERROR_STATE", True), [])
+        self.assertEqual(sample('ne_safety_blocks_total'), before + 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
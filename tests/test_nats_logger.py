@@ -1,7 +1,9 @@
 import unittest
 from unittest.mock import AsyncMock, patch
 import asyncio
+import json
 from core.nats_logger import NATSLogger
+from core.proposal_codec import decode_payload
 
 class TestNATSLogger(unittest.TestCase):
     def setUp(self):
@@ -28,5 +30,104 @@ class TestNATSLogger(unittest.TestCase):
         
         asyncio.run(run_test())
 
+    @patch('core.nats_logger.nats.connect')
+    def test_batch_flushed_by_count_as_one_message(self, mock_connect):
+        mock_nc = AsyncMock()
+        mock_connect.return_value = mock_nc
+        logger = NATSLogger(batch_size=3, flush_interval_s=60.0)
+
+        async def run_test():
+            await logger.connect()
+            for i in range(3):
+                await logger.log_proposal({"i": i})
+
+        asyncio.run(run_test())
+        mock_nc.publish.assert_called_once()
+        subject, payload = mock_nc.publish.call_args[0]
+        self.assertEqual(subject, "qiki.neural.proposals")
+        self.assertEqual([json.loads(line)["i"] for line in payload.split(b"\n")], [0, 1, 2])
+        self.assertEqual(logger.stats(), {"published": 3, "buffered": 0, "dropped": 0})
+
+    @patch('core.nats_logger.nats.connect')
+    def test_batch_flushed_by_bytes_and_interval(self, mock_connect):
+        mock_nc = AsyncMock()
+        mock_connect.return_value = mock_nc
+        record_size = len(json.dumps({"i": 0}).encode())
+        logger = NATSLogger(batch_size=100, max_batch_bytes=2 * record_size, flush_interval_s=0.01)
+
+        async def run_test():
+            await logger.connect()
+            for i in range(2):
+                await logger.log_proposal({"i": i})
+            self.assertEqual(mock_nc.publish.call_count, 1)
+            await logger.log_proposal({"i": 2})
+            self.assertEqual(logger.buffered, 1)
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run_test())
+        self.assertEqual(mock_nc.publish.call_count, 2)
+        self.assertEqual(logger.published, 3)
+
+    @patch('core.nats_logger.nats.connect')
+    def test_reconnect_flushes_bounded_buffer(self, mock_connect):
+        mock_nc = AsyncMock()
+        mock_connect.side_effect = [OSError("refused"), OSError("refused"), mock_nc]
+        logger = NATSLogger(batch_size=10, max_buffer=3, reconnect_interval_s=0.01, flush_interval_s=60.0)
+
+        async def run_test():
+            await logger.connect()
+            self.assertFalse(logger.connected)
+            for i in range(5):
+                await logger.log_proposal({"i": i})
+            self.assertEqual(logger.stats(), {"published": 0, "buffered": 3, "dropped": 2})
+            await asyncio.sleep(0.2)
+
+        asyncio.run(run_test())
+        self.assertEqual(mock_connect.call_count, 3)
+        payload = mock_nc.publish.call_args[0][1]
+        self.assertEqual([json.loads(line)["i"] for line in payload.split(b"\n")], [2, 3, 4])
+        self.assertEqual(logger.stats(), {"published": 3, "buffered": 0, "dropped": 2})
+
+    @patch('core.nats_logger.nats.connect')
+    def test_failed_publish_keeps_records(self, mock_connect):
+        mock_nc = AsyncMock()
+        mock_nc.publish.side_effect = [RuntimeError("slow consumer"), None]
+        mock_connect.return_value = mock_nc
+        logger = NATSLogger()
+
+        async def run_test():
+            await logger.connect()
+            await logger.log_proposal({"i": 0})
+            self.assertEqual(logger.buffered, 1)
+            await logger.flush()
+
+        asyncio.run(run_test())
+        self.assertEqual(logger.published, 1)
+        self.assertEqual(logger.buffered, 0)
+
+    @patch('core.nats_logger.nats.connect')
+    def test_encoding_per_subject(self, mock_connect):
+        mock_nc = AsyncMock()
+        mock_connect.return_value = mock_nc
+        logger = NATSLogger(subjects={"qiki.neural.proposals": "json", "qiki.neural.proposals.pb": "protobuf"},
+                            batch_size=2, flush_interval_s=60.0)
+        record = {"timestamp": 1.0, "fsm_state": "ACTIVE", "bios_ok": True,
+                  "proposals": [{"id": "ne_0", "confidence": 0.75, "priority": 0.5, "action": "HOLD_POSITION"}]}
+
+        async def run_test():
+            await logger.connect()
+            await logger.log_proposal(record)
+            await logger.log_proposal(record)
+
+        asyncio.run(run_test())
+        payloads = {call[0][0]: call[0][1] for call in mock_nc.publish.call_args_list}
+        self.assertEqual(len(decode_payload(payloads["qiki.neural.proposals"], "json")), 2)
+        proposals = decode_payload(payloads["qiki.neural.proposals.pb"], "protobuf")
+        self.assertEqual([p["actions"] for p in proposals], [["HOLD_POSITION"], ["HOLD_POSITION"]])
+
+    def test_unknown_encoding_raises(self):
+        with self.assertRaises(ValueError):
+            NATSLogger(encoding="msgpack")
+
 if __name__ == "__main__":
     unittest.main()
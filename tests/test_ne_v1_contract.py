@@ -1,5 +1,8 @@
+import time
 import unittest
+import torch
 from core.neural_engine_impl import NeuralEngineV1
+from core.metrics import DEGRADATIONS
 from shared.models import Proposal
 from dataclasses import dataclass
 from typing import Dict, List
@@ -16,6 +19,7 @@ class MockContext:
     bios_status: MockBiosStatus
     fsm_state: str
     sensor_data: Dict = None
+    agent_id: str = None
 
 class TestNeuralEngineV1(unittest.TestCase):
     def setUp(self):
@@ -49,5 +53,187 @@ class TestNeuralEngineV1(unittest.TestCase):
         proposals = self.engine.generate_proposals(context)
         self.assertEqual(proposals, [])
 
+    def test_generate_proposals_batch_empty(self):
+        self.assertEqual(self.engine.generate_proposals_batch([]), [])
+
+    def test_generate_proposals_batch_matches_single(self):
+        config = dict(self.config)
+        config.update({
+            "min_confidence": 0.0,
+            "time_budget_ms": 10000,
+            "action_catalog": {"actions": [{"name": f"ACTION_{i}", "params": {}} for i in range(6)]}
+        })
+        single = NeuralEngineV1(config)
+        batched = NeuralEngineV1(config)
+        batched.model.load_state_dict(single.model.state_dict())
+
+        # Разные агенты: батч должен совпадать с независимыми вызовами, а не с общим окном
+        for tick in range(2):
+            contexts = [
+                MockContext(bios_status=MockBiosStatus(temperature=10.0 * i + tick), fsm_state=state,
+                            sensor_data={"distance": float(i), "velocity": -1.0}, agent_id=f"agent_{i}")
+                for i, state in enumerate(["ACTIVE", "IDLE", "ERROR_STATE", "BOOTING"])
+            ]
+            expected = [single.generate_proposals(c) for c in contexts]
+            actual = batched.generate_proposals_batch(contexts)
+
+            self.assertEqual(len(actual), len(contexts))
+            self.assertEqual(actual[2], [])
+            for exp, act in zip(expected, actual):
+                self.assertEqual([p.proposal_id for p in exp], [p.proposal_id for p in act])
+                for e, a in zip(exp, act):
+                    self.assertAlmostEqual(e.confidence, a.confidence, places=5)
+                    self.assertAlmostEqual(e.priority, a.priority, places=5)
+
+    def test_build_proposals_from_templates(self):
+        proposals = self.engine._build_proposals([1, 0], [0.9, 0.5], 0.7)
+        self.assertEqual(len(proposals), 1)
+        proposal = proposals[0]
+        self.assertEqual(proposal.proposal_id, "ne_1")
+        self.assertEqual(proposal.justification, "Predicted by NE_v1 for COOLING_BOOST")
+        self.assertEqual(proposal.proposed_actions[0].name, "COOLING_BOOST")
+        self.assertEqual((proposal.confidence, proposal.priority), (0.9, 0.7))
+        # Команды не разделяются между предложениями разных тиков
+        again = self.engine._build_proposals([1], [0.9], 0.7)[0]
+        self.assertIsNot(again.proposed_actions[0], proposal.proposed_actions[0])
+
+class TestDeadlineFallback(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "window": 16,
+            "in_dim": 32,
+            "num_classes": 6,
+            "param_dim": 4,
+            "topk": 3,
+            "min_confidence": 0.0,
+            "time_budget_ms": 50,
+            "deadline": {"fallback": "last_good", "safe_action": "ACTION_0"},
+            "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"ACTION_{i}", "params": {}} for i in range(6)]}
+        }
+        self.engine = NeuralEngineV1(self.config)
+        self.context = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE", agent_id="agent_a")
+
+    def tearDown(self):
+        self.engine.close()
+
+    def _make_slow(self, delay):
+        run = self.engine.backend.run
+
+        def slow_run(tensor, mask):
+            time.sleep(delay)
+            return run(tensor, mask)
+        self.engine.backend.run = slow_run
+
+    def test_deadline_returns_safe_action_without_waiting(self):
+        self._make_slow(0.5)
+        before = DEGRADATIONS._value.get()
+        start = time.perf_counter()
+        proposals = self.engine.generate_proposals(self.context)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual([p.proposal_id for p in proposals], ["fallback_ACTION_0"])
+        self.assertEqual(DEGRADATIONS._value.get(), before + 1)
+
+    def test_deadline_reuses_last_good(self):
+        good = self.engine.generate_proposals(self.context)
+        self.assertTrue(good)
+        self._make_slow(0.5)
+        fallback = self.engine.generate_proposals(self.context)
+        self.assertTrue(set(p.proposal_id for p in fallback) <= set(p.proposal_id for p in good))
+
+    def test_deadline_fallback_respects_safety(self):
+        self._make_slow(0.5)
+        error_context = MockContext(bios_status=MockBiosStatus(), fsm_state="ERROR_STATE")
+        self.assertEqual(self.engine.generate_proposals(error_context), [])
+
+class TestStreamingInference(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "window": 16,
+            "in_dim": 32,
+            "num_classes": 6,
+            "param_dim": 4,
+            "topk": 3,
+            "min_confidence": 0.0,
+            "time_budget_ms": 10000,
+            "streaming": True,
+            "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"ACTION_{i}", "params": {}} for i in range(6)]}
+        }
+        self.engine = NeuralEngineV1(self.config)
+
+    def test_forward_step_matches_full_sequence(self):
+        model = self.engine.model
+        x = torch.randn(2, 5, 32)
+        with torch.no_grad():
+            ref_logits, ref_priority, _ = model(x)
+            hidden = None
+            for t in range(x.size(1)):
+                logits, priority, _, hidden = model.forward_step(x[:, t:t + 1, :], hidden=hidden)
+        self.assertTrue(torch.allclose(logits, ref_logits, atol=1e-5))
+        self.assertTrue(torch.allclose(priority, ref_priority, atol=1e-5))
+
+    def test_hidden_state_carried_per_agent(self):
+        ctx_a = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE", agent_id="agent_a")
+        ctx_b = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE", agent_id="agent_b")
+        self.engine.generate_proposals_batch([ctx_a, ctx_b])
+        self.assertEqual(set(self.engine._hidden), {"agent_a", "agent_b"})
+        self.assertEqual(tuple(self.engine._hidden["agent_b"].shape), (2, 1, 64))
+
+        first = self.engine._hidden["agent_a"]
+        self.engine.generate_proposals(ctx_a)
+        self.assertFalse(torch.equal(first, self.engine._hidden["agent_a"]))
+
+    def test_hidden_reset_on_transition_to_error_or_booting(self):
+        active = MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE", agent_id="agent_a")
+        booting = MockContext(bios_status=MockBiosStatus(), fsm_state="BOOTING", agent_id="agent_a")
+        self.engine.generate_proposals(active)
+        self.engine.generate_proposals(active)
+
+        fresh = NeuralEngineV1(self.config)
+        fresh.model.load_state_dict(self.engine.model.state_dict())
+        self.engine.generate_proposals(booting)
+        fresh.generate_proposals(booting)
+        self.assertTrue(torch.allclose(self.engine._hidden["agent_a"], fresh._hidden["agent_a"]))
+
+        # Повторный тик в BOOTING не сбрасывает состояние
+        self.engine.generate_proposals(booting)
+        self.assertFalse(torch.allclose(self.engine._hidden["agent_a"], fresh._hidden["agent_a"]))
+
+    def test_contexts_without_agent_id_rejected(self):
+        ctx_a = MockContext(bios_status=MockBiosStatus(temperature=10.0), fsm_state="ACTIVE")
+        ctx_b = MockContext(bios_status=MockBiosStatus(temperature=90.0), fsm_state="ACTIVE")
+        with self.assertRaises(ValueError):
+            self.engine.generate_proposals_batch([ctx_a, ctx_b])
+        with self.assertRaises(ValueError):
+            self.engine.generate_proposals(ctx_a)
+        self.assertEqual(self.engine._hidden, {})
+
+    def test_repeated_agent_in_batch_is_chained(self):
+        ticks = [
+            MockContext(bios_status=MockBiosStatus(temperature=t), fsm_state="ACTIVE", agent_id="agent_a")
+            for t in (10.0, 50.0, 90.0)
+        ]
+        ctx_b = MockContext(bios_status=MockBiosStatus(temperature=30.0), fsm_state="IDLE", agent_id="agent_b")
+        sequential = NeuralEngineV1(self.config)
+        sequential.model.load_state_dict(self.engine.model.state_dict())
+        expected = [sequential.generate_proposals(ticks[0]), sequential.generate_proposals(ctx_b),
+                    sequential.generate_proposals(ticks[1]), sequential.generate_proposals(ticks[2])]
+
+        actual = self.engine.generate_proposals_batch([ticks[0], ctx_b, ticks[1], ticks[2]])
+        for exp, act in zip(expected, actual):
+            self.assertEqual([p.proposal_id for p in exp], [p.proposal_id for p in act])
+            for e, a in zip(exp, act):
+                self.assertAlmostEqual(e.confidence, a.confidence, places=5)
+                self.assertAlmostEqual(e.priority, a.priority, places=5)
+        for agent_id in ("agent_a", "agent_b"):
+            self.assertTrue(torch.allclose(self.engine._hidden[agent_id], sequential._hidden[agent_id], atol=1e-6))
+
+    def test_reset_stream(self):
+        self.engine.generate_proposals(
+            MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE", agent_id="agent_a"))
+        self.engine.reset_stream("agent_a")
+        self.assertNotIn("agent_a", self.engine._hidden)
+
 if __name__ == "__main__":
     unittest.main()
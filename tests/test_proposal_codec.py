@@ -0,0 +1,67 @@
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+from core.proposal_codec import encode_json, encode_protobuf, decode_payload, decode_proposals
+
+PROTOS = os.path.join(os.path.dirname(__file__), "..", "QIKI_DTMP", "protos")
+
+RECORD = {
+    "timestamp": 1760000000.25,
+    "fsm_state": "ACTIVE",
+    "bios_ok": True,
+    "proposals": [
+        {"id": "ne_0", "confidence": 0.875, "priority": 0.5, "action": "HOLD_POSITION"},
+        {"id": "ne_3", "confidence": 0.625, "priority": 0.5, "action": "THROTTLE_UP"},
+    ]
+}
+
+
+class TestProposalCodec(unittest.TestCase):
+    def test_protobuf_roundtrip(self):
+        proposals = decode_proposals(encode_protobuf(RECORD) + encode_protobuf(dict(RECORD, bios_ok=False)))
+        self.assertEqual(len(proposals), 4)
+        first = proposals[0]
+        self.assertEqual(first["proposal_id"], "ne_0")
+        self.assertEqual(first["source_module_id"], "NeuralEngineV1")
+        self.assertEqual(first["actions"], ["HOLD_POSITION"])
+        self.assertEqual(first["confidence"], 0.875)
+        self.assertEqual(first["priority"], 0.5)
+        self.assertAlmostEqual(first["timestamp"], 1760000000.25, places=6)
+        self.assertEqual(first["metadata"], {"fsm_state": "ACTIVE", "bios_ok": "true"})
+        self.assertEqual(proposals[3]["metadata"]["bios_ok"], "false")
+
+    def test_empty_record_encodes_to_nothing(self):
+        self.assertEqual(encode_protobuf(dict(RECORD, proposals=[])), b"")
+
+    def test_json_payload_roundtrip(self):
+        payload = b"\n".join([encode_json(RECORD), encode_json(dict(RECORD, fsm_state="IDLE"))])
+        records = decode_payload(payload, "json")
+        self.assertEqual([r["fsm_state"] for r in records], ["ACTIVE", "IDLE"])
+        with self.assertRaises(ValueError):
+            decode_payload(payload, "avro")
+
+    @unittest.skipUnless(shutil.which("protoc"), "protoc not installed")
+    def test_wire_compatible_with_proposal_proto(self):
+        from google.protobuf.internal.decoder import _DecodeVarint32
+        with tempfile.TemporaryDirectory() as tmp:
+            subprocess.run(["protoc", f"-I{PROTOS}", f"--python_out={tmp}", "proposal.proto",
+                            "common_types.proto", "actuator_raw_out.proto"], check=True, capture_output=True)
+            sys.path.insert(0, tmp)
+            try:
+                import proposal_pb2
+            finally:
+                sys.path.remove(tmp)
+        payload = encode_protobuf(RECORD)
+        size, pos = _DecodeVarint32(payload, 0)
+        message = proposal_pb2.Proposal.FromString(payload[pos:pos + size])
+        self.assertEqual(message.proposal_id.value, "ne_0")
+        self.assertEqual(message.proposed_actions[0].actuator_id.value, "HOLD_POSITION")
+        self.assertEqual(message.confidence, 0.875)
+        self.assertEqual(message.timestamp.seconds, 1760000000)
+        self.assertEqual(dict(message.metadata), {"fsm_state": "ACTIVE", "bios_ok": "true"})
+
+if __name__ == "__main__":
+    unittest.main()
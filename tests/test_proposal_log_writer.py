@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from core.proposal_log_writer import ProposalLogWriter, FileSink, create_log_writer
+from core.inproc_nats import get_broker, remove_broker
+from core import inproc_nats
+from core.proposal_codec import decode_payload
+from core.neural_engine_impl import NeuralEngineV1
+from benchmark.feature_extraction_benchmark import make_contexts
+from shared.models import Proposal, ActuatorCommand
+
+
+class ListSink:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def write(self, records, lines):
+        self.batches.append(list(lines))
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def records(self):
+        return [json.loads(line) for batch in self.batches for line in batch]
+
+
+def proposal(name="HOLD_POSITION"):
+    return Proposal("ne_0", "NeuralEngineV1", 0.9, 0.5, "test", [ActuatorCommand(name, {})])
+
+
+class TestProposalLogWriter(unittest.TestCase):
+    def test_records_are_batched_and_serialized(self):
+        sink = ListSink()
+        writer = ProposalLogWriter([sink], batch_size=4, flush_interval_s=60.0)
+        for i in range(10):
+            writer.enqueue(float(i), "ACTIVE", True, [proposal()])
+        writer.close()
+        self.assertTrue(sink.closed)
+        self.assertEqual(sum(len(b) for b in sink.batches), 10)
+        self.assertTrue(all(len(b) <= 4 for b in sink.batches))
+        record = sink.records[0]
+        self.assertEqual(record["fsm_state"], "ACTIVE")
+        self.assertEqual(record["proposals"][0], {"id": "ne_0", "confidence": 0.9, "priority": 0.5,
+                                                  "action": "HOLD_POSITION"})
+        self.assertEqual(writer.written, 10)
+
+    def test_drop_oldest_when_full(self):
+        sink = ListSink()
+        writer = ProposalLogWriter([sink], max_queue=3, batch_size=100, flush_interval_s=60.0)
+        for i in range(5):
+            writer.enqueue(float(i), "ACTIVE", True, [])
+        self.assertEqual(writer.dropped, 2)
+        writer.close()
+        self.assertEqual([r["timestamp"] for r in sink.records], [2.0, 3.0, 4.0])
+
+    def test_sample_when_full(self):
+        sink = ListSink()
+        writer = ProposalLogWriter([sink], max_queue=2, batch_size=100, flush_interval_s=60.0,
+                                   full_policy="sample", sample_every=3)
+        for i in range(8):
+            writer.enqueue(float(i), "ACTIVE", True, [])
+        # Переполнение на 6 записях: принята каждая 3-я (4.0 и 7.0), каждая вытеснила самую старую
+        self.assertEqual(writer.dropped, 6)
+        writer.close()
+        self.assertEqual([r["timestamp"] for r in sink.records], [4.0, 7.0])
+
+    def test_unknown_policy_and_sink_raise(self):
+        with self.assertRaises(ValueError):
+            ProposalLogWriter([], full_policy="block")
+        with self.assertRaises(ValueError):
+            create_log_writer({"proposal_log": {"sinks": ["kafka"]}}, None)
+
+    def test_file_sink_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "proposals.jsonl")
+            writer = ProposalLogWriter([FileSink(path)], flush_interval_s=0.01)
+            writer.enqueue(1.0, "IDLE", False, [proposal("COOLING_BOOST")])
+            writer.close()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(lines[0]["proposals"][0]["action"], "COOLING_BOOST")
+        self.assertFalse(lines[0]["bios_ok"])
+
+    def test_engine_tick_only_enqueues(self):
+        config = {
+            "window": 16, "in_dim": 32, "num_classes": 6, "param_dim": 4, "topk": 3,
+            "min_confidence": 0.0, "time_budget_ms": 1000, "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"A{i}", "params": {}} for i in range(6)]},
+            "proposal_log": {"sinks": [], "flush_interval_s": 60.0}
+        }
+        engine = NeuralEngineV1(config)
+        sink = ListSink()
+        engine.log_writer.sinks.append(sink)
+        engine.generate_proposals(make_contexts(1)[0])
+        self.assertEqual(len(engine.log_writer), 1)
+        self.assertEqual(sink.batches, [])
+        engine.close()
+        self.assertEqual(len(sink.records[0]["proposals"]), 3)
+
+    def test_engine_records_survive_nats_outage(self):
+        remove_broker("outage")
+        broker = get_broker("outage")
+        broker.down = True
+        config = {
+            "window": 16, "in_dim": 32, "num_classes": 6, "param_dim": 4, "topk": 3,
+            "min_confidence": 0.0, "time_budget_ms": 1000, "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"A{i}", "params": {}} for i in range(6)]},
+            "proposal_log": {"sinks": ["nats"], "flush_interval_s": 0.01},
+            "nats": {"nats_url": "inproc://outage", "max_buffer": 2, "flush_interval_s": 0.01,
+                     "reconnect_interval_s": 0.01, "max_reconnect_interval_s": 0.01}
+        }
+
+        async def run_test():
+            engine = NeuralEngineV1(config)
+            contexts = make_contexts(3)
+            # Брокер недоступен с запуска: записи копятся в буфере NATSLogger, лишние — в dropped
+            engine.generate_proposals_batch(contexts)
+            await asyncio.sleep(0.1)
+            stats = engine.nats_logger.stats()
+            self.assertEqual(stats, {"published": 0, "buffered": 2, "dropped": 1})
+
+            broker.down = False
+            consumer = await inproc_nats.connect("inproc://outage")
+            sub = await consumer.subscribe("qiki.neural.proposals")
+            await asyncio.sleep(0.1)
+            records = []
+            while sub.pending:
+                records += decode_payload((await sub.next_msg()).data, "json")
+            engine.close()
+            await engine.nats_logger.close()
+            await consumer.close()
+            return records
+
+        try:
+            records = asyncio.run(run_test())
+        finally:
+            remove_broker("outage")
+        self.assertEqual(len(records), 2)
+        self.assertTrue(all(len(r["proposals"]) == 3 for r in records))
+
+if __name__ == "__main__":
+    unittest.main()
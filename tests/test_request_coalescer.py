@@ -0,0 +1,117 @@
+import time
+import unittest
+import asyncio
+import threading
+from core.request_coalescer import RequestCoalescer
+from core.metrics import COALESCER_BATCH_SIZE, COALESCER_QUEUE_WAIT
+
+
+class FakeEngine:
+    def __init__(self):
+        self.batches = []
+
+    def generate_proposals_batch(self, contexts):
+        self.batches.append(list(contexts))
+        return [[f"proposal_for_{c}"] for c in contexts]
+
+
+class SlowEngine(FakeEngine):
+    def __init__(self, delay_s):
+        super().__init__()
+        self.delay_s = delay_s
+        self.threads = []
+
+    def generate_proposals_batch(self, contexts):
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay_s)
+        return super().generate_proposals_batch(contexts)
+
+
+class FailingEngine:
+    def generate_proposals_batch(self, contexts):
+        raise RuntimeError("engine down")
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def test_concurrent_requests_share_one_batch(self):
+        engine = FakeEngine()
+        coalescer = RequestCoalescer(engine, window_ms=5.0, max_batch_size=64)
+        self.addCleanup(coalescer.close)
+
+        async def run_test():
+            return await asyncio.gather(*(coalescer.generate_proposals(i) for i in range(10)))
+
+        results = asyncio.run(run_test())
+        self.assertEqual(len(engine.batches), 1)
+        self.assertEqual(engine.batches[0], list(range(10)))
+        self.assertEqual(results, [[f"proposal_for_{i}"] for i in range(10)])
+
+    def test_max_batch_size_flushes_early(self):
+        engine = FakeEngine()
+        coalescer = RequestCoalescer(engine, window_ms=1000.0, max_batch_size=4)
+        self.addCleanup(coalescer.close)
+
+        async def run_test():
+            return await asyncio.wait_for(
+                asyncio.gather(*(coalescer.generate_proposals(i) for i in range(8))), timeout=0.5
+            )
+
+        asyncio.run(run_test())
+        self.assertEqual([len(b) for b in engine.batches], [4, 4])
+
+    def test_batch_size_histogram_observed(self):
+        coalescer = RequestCoalescer(FakeEngine(), window_ms=1.0)
+        self.addCleanup(coalescer.close)
+        before = COALESCER_BATCH_SIZE._sum.get()
+
+        async def run_test():
+            await asyncio.gather(*(coalescer.generate_proposals(i) for i in range(3)))
+
+        asyncio.run(run_test())
+        self.assertEqual(COALESCER_BATCH_SIZE._sum.get(), before + 3)
+
+    def test_engine_error_propagates_to_callers(self):
+        coalescer = RequestCoalescer(FailingEngine(), window_ms=1.0)
+        self.addCleanup(coalescer.close)
+
+        async def run_test():
+            await coalescer.generate_proposals("ctx")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_test())
+
+    def test_batch_does_not_block_event_loop(self):
+        engine = SlowEngine(delay_s=0.2)
+        coalescer = RequestCoalescer(engine, window_ms=1.0)
+        self.addCleanup(coalescer.close)
+        ticks = []
+
+        async def ticker():
+            for _ in range(10):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        async def run_test():
+            results = await asyncio.gather(coalescer.generate_proposals("ctx"), ticker())
+            return results[0]
+
+        self.assertEqual(asyncio.run(run_test()), ["proposal_for_ctx"])
+        self.assertIsNot(engine.threads[0], threading.main_thread())
+        # Тикер продолжал работать, пока движок считал батч
+        self.assertEqual(len(ticks), 10)
+        self.assertLess(ticks[-1] - ticks[0], 0.19)
+
+    def test_queue_wait_includes_wait_behind_previous_batch(self):
+        coalescer = RequestCoalescer(SlowEngine(delay_s=0.1), window_ms=1000.0, max_batch_size=1)
+        self.addCleanup(coalescer.close)
+        before = COALESCER_QUEUE_WAIT._sum.get()
+
+        async def run_test():
+            await asyncio.gather(coalescer.generate_proposals("a"), coalescer.generate_proposals("b"))
+
+        asyncio.run(run_test())
+        # Второй батч ждал в executor, пока считался первый
+        self.assertGreaterEqual(COALESCER_QUEUE_WAIT._sum.get() - before, 0.1)
+
+if __name__ == "__main__":
+    unittest.main()
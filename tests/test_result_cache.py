@@ -0,0 +1,135 @@
+import unittest
+import torch
+from prometheus_client import REGISTRY
+from core.result_cache import InferenceCache
+from core.neural_engine_impl import NeuralEngineV1
+from dataclasses import dataclass
+
+
+@dataclass
+class MockBiosStatus:
+    ok: bool = True
+    temperature: float = 50.0
+    power_draw: float = 50.0
+    utilization: float = 50.0
+
+
+@dataclass
+class MockContext:
+    bios_status: MockBiosStatus
+    fsm_state: str
+    sensor_data: dict = None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInferenceCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = InferenceCache(max_size=2, ttl_s=1.0, quant_step=0.1, clock=self.clock)
+        self.mask = torch.ones(1, 6).bool()
+
+    def test_quantized_keys(self):
+        a = self.cache.keys(torch.full((1, 4, 3), 0.50), self.mask)[0]
+        b = self.cache.keys(torch.full((1, 4, 3), 0.52), self.mask)[0]
+        c = self.cache.keys(torch.full((1, 4, 3), 0.70), self.mask)[0]
+        d = self.cache.keys(torch.full((1, 4, 3), 0.50), torch.zeros(1, 6).bool())[0]
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(a, d)
+
+    def test_lru_eviction(self):
+        self.cache.put(b"a", 1)
+        self.cache.put(b"b", 2)
+        self.assertEqual(self.cache.get(b"a"), 1)
+        self.cache.put(b"c", 3)
+        self.assertIsNone(self.cache.get(b"b"))
+        self.assertEqual(self.cache.get(b"a"), 1)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_ttl_expiry(self):
+        self.cache.put(b"a", 1)
+        self.clock.now = 0.5
+        self.assertEqual(self.cache.get(b"a"), 1)
+        self.clock.now = 1.5
+        self.assertIsNone(self.cache.get(b"a"))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.evictions, 1)
+
+
+class TestEngineCache(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "window": 16,
+            "in_dim": 32,
+            "num_classes": 6,
+            "param_dim": 4,
+            "topk": 3,
+            "min_confidence": 0.0,
+            "time_budget_ms": 10000,
+            "cache": {"enabled": True, "max_size": 16, "ttl_s": 60.0, "quant_step": 0.01},
+            "calibration": {"temperature": 1.2},
+            "action_catalog": {"actions": [{"name": f"ACTION_{i}", "params": {}} for i in range(6)]}
+        }
+        self.engine = NeuralEngineV1(self.config)
+        self.calls = []
+        run = self.engine.backend.run
+
+        def counting_run(tensor, mask):
+            self.calls.append(tensor.size(0))
+            return run(tensor, mask)
+        self.engine.backend.run = counting_run
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_idle_ticks_hit_cache(self):
+        context = MockContext(bios_status=MockBiosStatus(), fsm_state="IDLE")
+        first = self.engine.generate_proposals(context)
+        second = self.engine.generate_proposals(context)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(self.engine.cache.hits, 1)
+        self.assertEqual([p.confidence for p in first], [p.confidence for p in second])
+
+    def test_batch_runs_forward_only_for_misses(self):
+        contexts = [MockContext(bios_status=MockBiosStatus(temperature=10.0 * i), fsm_state="ACTIVE")
+                    for i in range(4)]
+        for i, context in enumerate(contexts):
+            context.agent_id = f"agent_{i}"
+        self.engine.generate_proposals_batch(contexts[:2])
+        self.engine.generate_proposals_batch(contexts)
+        self.assertEqual(self.calls, [2, 2])
+
+    def test_safety_runs_on_cache_hit(self):
+        self.engine.generate_proposals(MockContext(bios_status=MockBiosStatus(), fsm_state="ACTIVE"))
+        error_context = MockContext(bios_status=MockBiosStatus(ok=False), fsm_state="ACTIVE")
+        self.assertEqual(self.engine.generate_proposals(error_context), [])
+        self.assertEqual(self.calls, [1])
+
+    def test_cache_metrics_go_through_engine_recorder(self):
+        engine = NeuralEngineV1(dict(self.config, metrics={"mode": "accumulate", "flush_interval_s": 60.0}))
+        self.assertIs(engine.cache.recorder, engine.recorder)
+        before = REGISTRY.get_sample_value('ne_cache_hits_total') or 0.0
+        context = MockContext(bios_status=MockBiosStatus(), fsm_state="IDLE")
+        engine.generate_proposals(context)
+        engine.generate_proposals(context)
+        self.assertEqual(engine.cache.hits, 1)
+        # Worker инференса только копит обновления; в Prometheus они попадают при flush recorder
+        self.assertEqual(REGISTRY.get_sample_value('ne_cache_hits_total'), before)
+        engine.recorder.flush()
+        self.assertEqual(REGISTRY.get_sample_value('ne_cache_hits_total'), before + 1)
+        engine.close()
+
+    def test_cache_rejected_in_streaming_mode(self):
+        with self.assertRaises(ValueError):
+            NeuralEngineV1(dict(self.config, streaming=True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from benchmark.tick_benchmark import benchmark_tick, load_config, make_streams, STAGES
+
+
+class TestTickBenchmark(unittest.TestCase):
+    def test_streams_follow_agent_context_schema(self):
+        streams = make_streams(n_agents=3, ticks=5)
+        self.assertEqual(len(streams), 5)
+        for tick in streams:
+            self.assertEqual([c.agent_id for c in tick], ["agent_0", "agent_1", "agent_2"])
+            for context in tick:
+                self.assertIsInstance(context.bios_status.ok, bool)
+                self.assertIsInstance(context.fsm_state, str)
+                self.assertIsInstance(context.sensor_data, dict)
+
+    def test_report_has_stage_breakdown(self):
+        config = dict(load_config(), warmup={"iterations": 1})
+        report = benchmark_tick(config, n_agents=4, ticks=10, warmup=2, alloc_ticks=3)
+        self.assertEqual(set(report["stages"]), set(STAGES))
+        stage_sum = sum(report["stages"][stage]["mean"] for stage in STAGES)
+        self.assertAlmostEqual(stage_sum, report["total"]["mean"], places=6)
+        # Разбивка снята с настоящего пути engine через recorder
+        for stage in ("extract", "forward", "topk", "log", "safety"):
+            self.assertGreater(report["stages"][stage]["p50"], 0.0)
+        self.assertGreater(report["alloc_peak_kb_per_tick"], 0.0)
+        self.assertEqual(report["time_budget_ms"], config["time_budget_ms"])
+        self.assertGreaterEqual(report["over_budget"], 0.0)
+
+if __name__ == "__main__":
+    unittest.main()